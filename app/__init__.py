@@ -3,6 +3,8 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from tortoise import Tortoise
 
+from app.core.audit import audit_log_archiver, audit_log_writer
+from app.core.bgtask import BgTasks
 from app.core.exceptions import SettingNotFound
 from app.core.init_app import (
     init_data,
@@ -10,6 +12,8 @@ from app.core.init_app import (
     register_exceptions,
     register_routers,
 )
+from app.core.jobs import job_queue
+from app.utils.password import password_executor
 
 try:
     from app.settings.config import settings
@@ -20,8 +24,18 @@ except ImportError:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    password_executor.start()
     await init_data()
+    audit_log_writer.start()
+    audit_log_archiver.start()
+    await BgTasks.start()
+    job_queue.start()
     yield
+    await job_queue.stop()
+    await BgTasks.stop()
+    await audit_log_archiver.stop()
+    await audit_log_writer.stop()
+    password_executor.stop()
     await Tortoise.close_connections()
 
 
@@ -13,6 +13,7 @@ from .transactions import transactions_router
 from .totals import totals_router
 from .field_work import field_work_router
 from .duty_staff import duty_staff_router
+from .jobs import jobs_router
 
 v1_router = APIRouter()
 
@@ -27,3 +28,4 @@ v1_router.include_router(transactions_router, prefix="/transactions", dependenci
 v1_router.include_router(totals_router, prefix="/total", dependencies=[DependPermisson]) 
 v1_router.include_router(field_work_router, prefix="/field_work", dependencies=[DependPermisson])
 v1_router.include_router(duty_staff_router, prefix="/duty_staff", dependencies=[DependPermisson])
+v1_router.include_router(jobs_router, prefix="/job", dependencies=[DependPermisson])
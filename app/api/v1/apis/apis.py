@@ -12,6 +12,8 @@ router = APIRouter()
 async def list_api(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
+    cursor: str = Query(None, description="游标，传入时按创建时间倒序游标翻页并忽略page，第一页传空字符串"),
     path: str = Query(None, description="API路径"),
     summary: str = Query(None, description="API简介"),
     tags: str = Query(None, description="API模块"),
@@ -23,9 +25,12 @@ async def list_api(
         q &= Q(summary__contains=summary)
     if tags:
         q &= Q(tags__contains=tags)
-    total, api_objs = await api_controller.list(page=page, page_size=page_size, search=q, order=["tags", "id"])
-    data = [await obj.to_dict() for obj in api_objs]
-    return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+    total, api_objs = await api_controller.list(
+        page=page, page_size=page_size, search=q, order=["tags", "id"], with_total=with_total, cursor=cursor
+    )
+    data = api_controller.serialize(api_objs)
+    next_cursor = api_controller.next_cursor(api_objs, page_size) if cursor is not None else None
+    return SuccessExtra(data=data, total=total, page=page, page_size=page_size, next_cursor=next_cursor)
 
 
 @router.get("/get", summary="查看Api")
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, Query
+import heapq
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi import APIRouter, HTTPException, Query
 from tortoise.expressions import Q
 
+from app.core.audit import audit_log_archiver, audit_log_sort_key
+from app.core.crud import decode_cursor, encode_cursor, keyset_filter
 from app.models.admin import AuditLog
 from app.schemas import SuccessExtra
 from app.schemas.apis import *
@@ -19,6 +25,8 @@ async def get_audit_log_list(
     status: int = Query(None, description="状态码"),
     start_time: str = Query("", description="开始时间"),
     end_time: str = Query("", description="结束时间"),
+    cursor: str = Query(None, description="游标，传入上一页返回的next_cursor时按游标翻页，忽略page"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
 ):
     q = Q()
     if username:
@@ -38,7 +46,76 @@ async def get_audit_log_list(
     elif end_time:
         q &= Q(created_at__lte=end_time)
 
-    audit_log_objs = await AuditLog.filter(q).offset((page - 1) * page_size).limit(page_size).order_by("-created_at")
-    total = await AuditLog.filter(q).count()
-    data = [await audit_log.to_dict() for audit_log in audit_log_objs]
-    return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+    start, end = parse_time(start_time), parse_time(end_time)
+    query = AuditLog.filter(q).order_by("-created_at", "-id")
+    offset, position = 0, None
+    if cursor:
+        query = query.filter(keyset_filter(cursor))
+        position = decode_cursor(cursor)
+    else:
+        offset = (page - 1) * page_size
+
+    archived, archived_total = [], 0
+    if audit_log_archiver.reaches_archive(start, end):
+        if len(audit_log_archiver.archive_files(start, end)) > audit_log_archiver.max_months:
+            raise HTTPException(
+                status_code=400, detail=f"查询归档日志的时间区间不能超过{audit_log_archiver.max_months}个月"
+            )
+        # 归档记录只需取到本页末尾
+        archived, archived_total = await audit_log_archiver.read(
+            start,
+            end,
+            archive_match(username=username, module=module, method=method, summary=summary, status=status),
+            before=position,
+            limit=offset + page_size + 1,
+            with_total=with_total,
+        )
+
+    if archived:
+        # 未归档的过期记录与归档记录可能交错，热表从头取到本页末尾，与归档记录合并后再分页
+        hot = await query.limit(offset + page_size + 1).values()
+        hot_ids = {row["id"] for row in hot}
+        rows = list(
+            heapq.merge(
+                hot,
+                [row for row in archived if row["id"] not in hot_ids],
+                key=audit_log_sort_key,
+                reverse=True,
+            )
+        )[offset : offset + page_size + 1]
+    else:
+        # 多取一条用于判断是否还有下一页
+        rows = await query.offset(offset).limit(page_size + 1).values()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+    total = await AuditLog.filter(q).count() + archived_total if with_total else -1
+    data = AuditLog.serializer().many(rows)
+    return SuccessExtra(
+        data=data, total=total, page=page, page_size=page_size, next_cursor=next_cursor, has_more=has_more
+    )
+
+
+def parse_time(value: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的时间")
+
+
+def archive_match(username: str, module: str, method: str, summary: str, status: Optional[int]) -> Callable:
+    """与列表查询相同的过滤条件，作用于归档记录"""
+    contains = {
+        key: value.lower()
+        for key, value in (("username", username), ("module", module), ("method", method), ("summary", summary))
+        if value
+    }
+
+    def match(row: dict) -> bool:
+        if status and row["status"] != status:
+            return False
+        return all(value in (row[key] or "").lower() for key, value in contains.items())
+
+    return match
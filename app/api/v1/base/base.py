@@ -2,6 +2,8 @@ from datetime import datetime, timedelta, timezone
 
 from fastapi import APIRouter
 
+from app.controllers.api import api_controller
+from app.controllers.menu import menu_controller
 from app.controllers.user import user_controller
 from app.core.ctx import CTX_USER_ID
 from app.core.dependency import DependAuth
@@ -11,7 +13,7 @@ from app.schemas.login import *
 from app.schemas.users import UpdatePassword
 from app.settings import settings
 from app.utils.jwt import create_access_token
-from app.utils.password import get_password_hash, verify_password
+from app.utils.password import get_password_hash_async, verify_password_async
 
 router = APIRouter()
 
@@ -49,45 +51,47 @@ async def get_userinfo():
 @router.get("/usermenu", summary="查看用户菜单", dependencies=[DependAuth])
 async def get_user_menu():
     user_id = CTX_USER_ID.get()
-    user_obj = await User.filter(id=user_id).first()
-    menus: list[Menu] = []
-    if user_obj.is_superuser:
-        menus = await Menu.all()
-    else:
-        role_objs: list[Role] = await user_obj.roles
-        for role_obj in role_objs:
-            menu = await role_obj.menus
-            menus.extend(menu)
-        menus = list(set(menus))
-    parent_menus: list[Menu] = []
-    for menu in menus:
-        if menu.parent_id == 0:
-            parent_menus.append(menu)
-    res = []
-    for parent_menu in parent_menus:
-        parent_menu_dict = await parent_menu.to_dict()
-        parent_menu_dict["children"] = []
-        for menu in menus:
-            if menu.parent_id == parent_menu.id:
-                parent_menu_dict["children"].append(await menu.to_dict())
-        res.append(parent_menu_dict)
+
+    async def load_user_menu():
+        user_obj = await User.filter(id=user_id).first()
+        menus: list[Menu] = []
+        if user_obj.is_superuser:
+            menus = await Menu.all()
+        else:
+            role_objs: list[Role] = await user_obj.roles.all().prefetch_related("menus")
+            for role_obj in role_objs:
+                menus.extend(role_obj.menus)
+            menus = list(set(menus))
+        serializer = Menu.serializer()
+        res = []
+        for parent_menu in menus:
+            if parent_menu.parent_id != 0:
+                continue
+            parent_menu_dict = serializer(parent_menu)
+            parent_menu_dict["children"] = [serializer(menu) for menu in menus if menu.parent_id == parent_menu.id]
+            res.append(parent_menu_dict)
+        return res
+
+    res = await menu_controller.cached(("usermenu", user_id), load_user_menu, deps=[Role, User])
     return Success(data=res)
 
 
 @router.get("/userapi", summary="查看用户API", dependencies=[DependAuth])
 async def get_user_api():
     user_id = CTX_USER_ID.get()
-    user_obj = await User.filter(id=user_id).first()
-    if user_obj.is_superuser:
-        api_objs: list[Api] = await Api.all()
-        apis = [api.method.lower() + api.path for api in api_objs]
-        return Success(data=apis)
-    role_objs: list[Role] = await user_obj.roles
-    apis = []
-    for role_obj in role_objs:
-        api_objs: list[Api] = await role_obj.apis
-        apis.extend([api.method.lower() + api.path for api in api_objs])
-    apis = list(set(apis))
+
+    async def load_user_api():
+        user_obj = await User.filter(id=user_id).first()
+        if user_obj.is_superuser:
+            api_objs: list[Api] = await Api.all()
+            return [api.method.lower() + api.path for api in api_objs]
+        role_objs: list[Role] = await user_obj.roles.all().prefetch_related("apis")
+        apis = []
+        for role_obj in role_objs:
+            apis.extend([api.method.lower() + api.path for api in role_obj.apis])
+        return list(set(apis))
+
+    apis = await api_controller.cached(("userapi", user_id), load_user_api, deps=[Role, User])
     return Success(data=apis)
 
 
@@ -95,9 +99,9 @@ async def get_user_api():
 async def update_user_password(req_in: UpdatePassword):
     user_id = CTX_USER_ID.get()
     user = await user_controller.get(user_id)
-    verified = verify_password(req_in.old_password, user.password)
+    verified = await verify_password_async(req_in.old_password, user.password)
     if not verified:
         return Fail(msg="旧密码验证错误！")
-    user.password = get_password_hash(req_in.new_password)
+    user.password = await get_password_hash_async(req_in.new_password)
     await user.save()
     return Success(msg="修改成功")
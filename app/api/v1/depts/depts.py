@@ -11,7 +11,7 @@ router = APIRouter()
 async def list_dept(
     name: str = Query(None, description="部门名称"),
 ):
-    dept_tree = await dept_controller.get_dept_tree(name)
+    dept_tree = await dept_controller.cached(("tree", name), lambda: dept_controller.get_dept_tree(name))
     return Success(data=dept_tree)
 
 
@@ -1,26 +1,62 @@
+from datetime import datetime
+from typing import Optional
+
 from fastapi import APIRouter, Query
 from tortoise.expressions import Q
 from app.controllers.field_work import field_work_record_controller
+from app.core.audit import AuditLevel, audit_policy
+from app.core.crud import date_range_filter
+from app.core.export import export_response
+from app.models.enums import ExportFormat
 from app.schemas import Success, SuccessExtra
 from app.schemas.field_work import FieldWorkRecordCreate, FieldWorkRecordUpdate
 
 router = APIRouter()
 
+
+def field_work_search(
+    date: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    name: Optional[str] = None,
+) -> Q:
+    """外勤数据列表和导出共用的查询条件"""
+    q = date_range_filter("date", date, date_from, date_to)
+    if name:
+        q &= Q(name__contains=name)
+    return q
+
+
 @router.get("/list", summary="查看外勤数据列表")
 async def list_field_works(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
-    date: str = Query(None, description="日期"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
+    cursor: str = Query(None, description="游标，传入时按创建时间倒序游标翻页并忽略page，第一页传空字符串"),
+    date: str = Query(None, description="日期，支持年、年-月、年-月-日等前缀，按时间范围查询"),
+    date_from: datetime = Query(None, description="开始时间（含）"),
+    date_to: datetime = Query(None, description="结束时间（不含）"),
     name: str = Query(None, description="外勤名称"),
 ):
-    q = Q()
-    if date:
-        q &= Q(date__contains=date)
-    if name:
-        q &= Q(name__contains=name)
-    field_work, field_work_objs = await field_work_record_controller.list(page=page, page_size=page_size, search=q)
-    data = [await obj.to_dict() for obj in field_work_objs]
-    return SuccessExtra(data=data, field_work=field_work, page=page, page_size=page_size)
+    q = field_work_search(date, date_from, date_to, name)
+    field_work, field_work_objs = await field_work_record_controller.list(
+        page=page, page_size=page_size, search=q, with_total=with_total, cursor=cursor
+    )
+    data = field_work_record_controller.serialize(field_work_objs)
+    next_cursor = field_work_record_controller.next_cursor(field_work_objs, page_size) if cursor is not None else None
+    return SuccessExtra(data=data, field_work=field_work, page=page, page_size=page_size, next_cursor=next_cursor)
+
+@router.get("/export", summary="导出外勤数据")
+@audit_policy(level=AuditLevel.ARGS)
+async def export_field_works(
+    format: ExportFormat = Query(ExportFormat.CSV, description="导出格式"),
+    date: str = Query(None, description="日期，支持年、年-月、年-月-日等前缀，按时间范围查询"),
+    date_from: datetime = Query(None, description="开始时间（含）"),
+    date_to: datetime = Query(None, description="结束时间（不含）"),
+    name: str = Query(None, description="外勤名称"),
+):
+    q = field_work_search(date, date_from, date_to, name)
+    return export_response(field_work_record_controller, q, format, "field_work_record")
 
 @router.get("/get", summary="查看单条外勤数据")
 async def get_field_work(
@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+
+from .jobs import router
+
+jobs_router = APIRouter()
+jobs_router.include_router(router, tags=["任务模块"])
+
+__all__ = ["jobs_router"]
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Query
+
+from app.core.cache import UserSnapshot
+from app.core.dependency import DependAuth
+from app.models.admin import Job
+from app.schemas import Success
+
+router = APIRouter()
+
+
+@router.get("/get", summary="查看任务状态")
+async def get_job(
+    id: int = Query(..., description="任务ID"),
+    current_user: UserSnapshot = DependAuth,
+):
+    # 任务结果可能包含业务数据，非超级用户只能查看自己提交的任务
+    filters = {} if current_user.is_superuser else {"user_id": current_user.id}
+    job_obj = await Job.get(id=id, **filters)
+    data = await job_obj.to_dict(exclude_fields=["payload"])
+    return Success(data=data)
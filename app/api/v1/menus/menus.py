@@ -16,15 +16,18 @@ async def list_menu(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
 ):
-    async def get_menu_with_children(menu_id: int):
-        menu = await menu_controller.model.get(id=menu_id)
-        menu_dict = await menu.to_dict()
-        child_menus = await menu_controller.model.filter(parent_id=menu_id).order_by("order")
-        menu_dict["children"] = [await get_menu_with_children(child.id) for child in child_menus]
-        return menu_dict
-
-    parent_menus = await menu_controller.model.filter(parent_id=0).order_by("order")
-    res_menu = [await get_menu_with_children(menu.id) for menu in parent_menus]
+    async def load_menu_tree():
+        menus = await menu_controller.model.all().order_by("order")
+        serializer = menu_controller.model.serializer()
+
+        def get_menu_with_children(menu):
+            menu_dict = serializer(menu)
+            menu_dict["children"] = [get_menu_with_children(child) for child in menus if child.parent_id == menu.id]
+            return menu_dict
+
+        return [get_menu_with_children(menu) for menu in menus if menu.parent_id == 0]
+
+    res_menu = await menu_controller.cached("tree", load_menu_tree)
     return SuccessExtra(data=res_menu, total=len(res_menu), page=page, page_size=page_size)
 
 
@@ -21,8 +21,12 @@ async def list_role(
     q = Q()
     if role_name:
         q = Q(name__contains=role_name)
-    total, role_objs = await role_controller.list(page=page, page_size=page_size, search=q)
-    data = [await obj.to_dict() for obj in role_objs]
+
+    async def load_roles():
+        total, role_objs = await role_controller.list(page=page, page_size=page_size, search=q)
+        return total, role_controller.serialize(role_objs)
+
+    total, data = await role_controller.cached(("list", page, page_size, role_name), load_roles)
     return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
 
 
@@ -1,70 +1,118 @@
+from datetime import date, datetime
+from typing import Optional
+
 from fastapi import APIRouter, Query
 from tortoise.expressions import Q
-from app.controllers.total import total_record_controller, total_record_yyfs_controller, total_record_controller_bs
+from app.controllers.total import (
+    TOTAL_EXPORT_FIELDS,
+    TOTAL_OB_FIELDS,
+    TOTAL_YY_FIELDS,
+    total_record_controller,
+    total_record_controller_bs,
+    total_record_yyfs_controller,
+)
+from app.controllers.total_rollup import total_record_rollup_controller
 from app.controllers.user import user_controller
+from app.core.audit import AuditLevel, audit_policy
+from app.core.crud import date_range_filter
+from app.core.ctx import CTX_USER_ID
+from app.core.export import export_response
+from app.core.jobs import job_queue
+from app.models.enums import ExportFormat, RollupDimension
 from app.schemas import Success, SuccessExtra
 from app.schemas.total import TotalRecordCreate, TotalRecordUpdate
 
 router = APIRouter()
 
 
+async def total_search(
+    date: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    plate: Optional[str] = None,
+    business: Optional[str] = None,
+    field_staff: Optional[str] = None,
+    company: Optional[str] = None,
+) -> Q:
+    """总表列表和导出共用的查询条件"""
+    q = date_range_filter("date", date, date_from, date_to)
+    if plate:
+        q &= await total_record_controller.contains_filter("plate", plate)
+    if business:
+        q &= await total_record_controller.contains_filter("business", business)
+    if field_staff:
+        q &= await total_record_controller.contains_filter("field_staff", field_staff)
+    if company:
+        q &= await total_record_controller.contains_filter("company", company)
+    return q
+
+
 @router.get("/list", summary="查看总表数据列表")
+# 高频查询接口只抽样记录元数据；/list/yy 等其他列表接口仍按默认策略完整记录
+@audit_policy(level=AuditLevel.METADATA, sample_rate=0.01)
 async def list_totals(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
-    date: str = Query(None, description="日期"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
+    cursor: str = Query(None, description="游标，传入时按创建时间倒序游标翻页并忽略page，第一页传空字符串"),
+    date: str = Query(None, description="日期，支持年、年-月、年-月-日等前缀，按时间范围查询"),
+    date_from: datetime = Query(None, description="开始时间（含）"),
+    date_to: datetime = Query(None, description="结束时间（不含）"),
     plate: str = Query(None, description="车牌"),
     business: str = Query(None, description="业务"),
     field_staff: str = Query(None, description="外勤"),
     company: str = Query(None, description="公司"),
 ):
-    q = Q()
-    if date:
-        q &= Q(date__contains=date)
-    if plate:
-        q &= Q(plate__contains=plate)
-    if business:
-        q &= Q(business__contains=business)
-    if field_staff:
-        q &= Q(field_staff__contains=field_staff)
-    if company:
-        q &= Q(company__contains=company)
-    total, total_objs = await total_record_controller.list(page=page, page_size=page_size, search=q)
-    data = [await obj.to_dict() for obj in total_objs]
-    return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+    q = await total_search(date, date_from, date_to, plate, business, field_staff, company)
+    total, total_objs = await total_record_controller.list(
+        page=page, page_size=page_size, search=q, with_total=with_total, cursor=cursor, count_cache_ttl=10
+    )
+    data = total_record_controller.serialize(total_objs)
+    next_cursor = total_record_controller.next_cursor(total_objs, page_size) if cursor is not None else None
+    return SuccessExtra(data=data, total=total, page=page, page_size=page_size, next_cursor=next_cursor)
 
 @router.get("/list/yy", summary="查看总表数据列表-yy专用")
 async def list_totals(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
-    date: str = Query(None, description="日期"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
+    cursor: str = Query(None, description="游标，传入时按创建时间倒序游标翻页并忽略page，第一页传空字符串"),
+    date: str = Query(None, description="日期，支持年、年-月、年-月-日等前缀，按时间范围查询"),
+    date_from: datetime = Query(None, description="开始时间（含）"),
+    date_to: datetime = Query(None, description="结束时间（不含）"),
     plate: str = Query(None, description="车牌"),
     business: str = Query(None, description="业务"),
     field_staff: str = Query(None, description="外勤"),
     company: str = Query(None, description="公司"),
 ):
-    q = Q()
-    if date:
-        q &= Q(date__contains=date)
-    if plate:
-        q &= Q(plate__contains=plate)
-    if business:
-        q &= Q(business__contains=business)
-    if field_staff:
-        q &= Q(field_staff__contains=field_staff)
-    if company:
-        q &= Q(company__contains=company)
-
-    total, total_objs = await total_record_controller.list(page=page, page_size=page_size, search=q)
-    data = [
-        {
-            key: obj[key]
-            for key in obj.keys()
-            if key != "income"
-        }
-        for obj in [await obj.to_dict() for obj in total_objs]
-    ]
-    return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+    q = await total_search(date, date_from, date_to, plate, business, field_staff, company)
+
+    total, data = await total_record_controller.list(
+        page=page,
+        page_size=page_size,
+        search=q,
+        with_total=with_total,
+        cursor=cursor,
+        count_cache_ttl=10,
+        fields=TOTAL_YY_FIELDS,
+    )
+    next_cursor = total_record_controller.next_cursor(data, page_size) if cursor is not None else None
+    return SuccessExtra(data=data, total=total, page=page, page_size=page_size, next_cursor=next_cursor)
+
+@router.get("/export", summary="导出总表数据")
+@audit_policy(level=AuditLevel.ARGS)
+async def export_totals(
+    format: ExportFormat = Query(ExportFormat.CSV, description="导出格式"),
+    date: str = Query(None, description="日期，支持年、年-月、年-月-日等前缀，按时间范围查询"),
+    date_from: datetime = Query(None, description="开始时间（含）"),
+    date_to: datetime = Query(None, description="结束时间（不含）"),
+    plate: str = Query(None, description="车牌"),
+    business: str = Query(None, description="业务"),
+    field_staff: str = Query(None, description="外勤"),
+    company: str = Query(None, description="公司"),
+):
+    q = await total_search(date, date_from, date_to, plate, business, field_staff, company)
+    return export_response(total_record_controller, q, format, "total_record", fields=TOTAL_EXPORT_FIELDS)
 
 # @router.get("/list/yyfs", summary="查看外勤数据列表yy外勤")
 # async def list_totals_yyfs(
@@ -90,50 +138,61 @@ async def list_totals_bs(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
     business: str = Query(None, description="业务"),
+    date_from: datetime = Query(None, description="开始日期（含）"),
+    date_to: datetime = Query(None, description="结束日期（不含）"),
 ):
-    total_count = 0
-    total_expected_expenditure_sum = 0
-    total_income_sum = 0
-
-    q = Q()
     if business:
-        q &= Q(business__contains=business)
-
-        total, total_objs = await total_record_controller_bs.list(page=1, page_size=9999, search=q)
-        business_data = [await obj.to_dict() for obj in total_objs]
-        data = [{
-            'business': business,
-            'count': total,
-            'expected_expenditure': sum(item['expected_expenditure'] for item in business_data),
-            'income': sum(item['income'] for item in business_data),
-        }]
-
-        total_count = data[0]['count']
-        total_expected_expenditure_sum = data[0]['expected_expenditure']
-        total_income_sum = data[0]['income']
-        
+        summary = await total_record_controller_bs.summarize(business, date_from, date_to)
+        data = [{"business": business, **summary}]
     else:
-        total_business = await user_controller.list(page=page, page_size=page_size)
-        business_list = [item.username for item in total_business[1] if item.dept_id == 5]
-        data = []
-
-        for business in business_list:
-            q = Q(business=business)
-            _, total_objs = await total_record_controller_bs.list(page=1, page_size=9999, search=q)
-            business_data = [await obj.to_dict() for obj in total_objs]
-            data.append({
-                'business': business,
-                'count': len(business_data),
-                'expected_expenditure': sum(item['expected_expenditure'] for item in business_data),
-                'income': sum(item['income'] for item in business_data),
-            })
-
-        total_count = sum(item['count'] for item in data)
-        total_expected_expenditure_sum = sum(item['expected_expenditure'] for item in data)
-        total_income_sum = sum(item['income'] for item in data)
+        _, users = await user_controller.list(
+            page=page, page_size=page_size, with_total=False, fields=["username", "dept_id"]
+        )
+        business_list = [item["username"] for item in users if item["dept_id"] == 5]
+        data = await total_record_controller_bs.summarize_by_business(business_list, date_from, date_to)
+
+    total_count = sum(item['count'] for item in data)
+    total_expected_expenditure_sum = sum(item['expected_expenditure'] for item in data)
+    total_income_sum = sum(item['income'] for item in data)
 
     return SuccessExtra(data=data, total=len(data), page=page, page_size=page_size, count_sum=total_count, expected_expenditure_sum=total_expected_expenditure_sum, income_sum=total_income_sum)
 
+@router.get("/rollup", summary="查看按天汇总统计")
+async def list_totals_rollup(
+    dimension: RollupDimension = Query(RollupDimension.BUSINESS, description="统计维度"),
+    value: str = Query(None, description="维度取值"),
+    date_from: date = Query(None, description="开始日期（含）"),
+    date_to: date = Query(None, description="结束日期（含）"),
+    by_day: bool = Query(False, description="是否按天分组"),
+):
+    data = await total_record_rollup_controller.summary(
+        dimension=dimension, date_from=date_from, date_to=date_to, value=value, by_day=by_day
+    )
+    return SuccessExtra(
+        data=data,
+        total=len(data),
+        page=1,
+        page_size=len(data),
+        count_sum=sum(item["count"] for item in data),
+        expected_expenditure_sum=sum(item["expected_expenditure"] for item in data),
+        income_sum=sum(item["income"] for item in data),
+        completed_count_sum=sum(item["completed_count"] for item in data),
+    )
+
+
+@router.post("/rollup/check", summary="校验按天汇总数据")
+async def check_totals_rollup():
+    # 校验要扫描全部原始记录，提交任务后通过 /job/get 查看结果；已有未完成的校验任务时返回该任务
+    job = await total_record_rollup_controller.submit_check(user_id=CTX_USER_ID.get())
+    return Success(data={"job_id": job.id})
+
+
+@router.post("/rollup/rebuild", summary="重建按天汇总数据")
+async def rebuild_totals_rollup():
+    job = await job_queue.submit("total_record_rollup_rebuild", user_id=CTX_USER_ID.get())
+    return Success(data={"job_id": job.id})
+
+
 @router.get("/get", summary="查看单条总表数据")
 async def get_total(id: int = Query(..., description="记录ID")):
     total_obj = await total_record_controller.get(id=id)
@@ -161,45 +220,40 @@ async def delete_total(id: int = Query(..., description="记录ID")):
 async def list_totals(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
-    date: str = Query(None, description="日期"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
+    cursor: str = Query(None, description="游标，传入时按创建时间倒序游标翻页并忽略page，第一页传空字符串"),
+    date: str = Query(None, description="日期，支持年、年-月、年-月-日等前缀，按时间范围查询"),
+    date_from: datetime = Query(None, description="开始时间（含）"),
+    date_to: datetime = Query(None, description="结束时间（不含）"),
     plate: str = Query(None, description="车牌"),
     business: str = Query(None, description="业务"),
     docking_time_not_null: bool = Query(False, description="是否对接"),
     is_completed: bool = Query(None, description="是否完成"),
     company: str = Query(None, description="公司"),
 ):
-    q = Q()
-    if date:
-        q &= Q(date__contains=date)
+    q = date_range_filter("date", date, date_from, date_to)
     if plate:
-        q &= Q(plate__contains=plate)
+        q &= await total_record_controller.contains_filter("plate", plate)
     if business:
-        q &= Q(business__contains=business)
+        q &= await total_record_controller.contains_filter("business", business)
     if company:
-        q &= Q(company__contains=company)
+        q &= await total_record_controller.contains_filter("company", company)
     if docking_time_not_null:
         q &= Q(docking_time__not_isnull=True)
     if is_completed is not None:
         q &= Q(is_completed=is_completed)
 
-    total, total_objs = await total_record_controller.list(page=page, page_size=page_size, search=q)
-    data = [
-        {
-            "id": obj["id"],
-            "date": obj["date"],
-            "plate": obj["plate"],
-            "region": obj["region"],
-            "company": obj["company"],
-            "business": obj["business"],
-            "income": obj["income"],
-            "remark": obj["remark"],
-            "docking_time": obj["docking_time"],
-            "handover_time": obj["handover_time"],
-            "is_completed": obj["is_completed"],
-        }
-        for obj in [await obj.to_dict() for obj in total_objs]
-    ]
-    return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+    total, data = await total_record_controller.list(
+        page=page,
+        page_size=page_size,
+        search=q,
+        with_total=with_total,
+        cursor=cursor,
+        count_cache_ttl=10,
+        fields=TOTAL_OB_FIELDS,
+    )
+    next_cursor = total_record_controller.next_cursor(data, page_size) if cursor is not None else None
+    return SuccessExtra(data=data, total=total, page=page, page_size=page_size, next_cursor=next_cursor)
 
 @router.post("/update/ob", summary="更新我的数据")
 async def update_total(total_in: TotalRecordUpdate):
@@ -1,32 +1,70 @@
 from fastapi import APIRouter, Query
 from tortoise.expressions import Q
-from datetime import datetime
+from datetime import datetime, time
+from typing import Optional
 
 from app.controllers.transaction import api_controller
+from app.core.audit import AuditLevel, audit_policy
+from app.core.crud import date_range_filter
+from app.core.export import export_response
+from app.models.enums import ExportFormat
 from app.schemas import Success, SuccessExtra
 from app.schemas.transactions import *
 
 router = APIRouter()
 
+
+async def transaction_search(
+    payment_time: Optional[datetime] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    payment_amount: Optional[float] = None,
+    recipient: Optional[str] = None,
+) -> Q:
+    """交易记录列表和导出共用的查询条件"""
+    prefix = None
+    if payment_time:
+        prefix = payment_time.strftime("%Y-%m-%d" if payment_time.time() == time.min else "%Y-%m-%d %H:%M:%S")
+    q = date_range_filter("payment_time", prefix, date_from, date_to)
+    if payment_amount:
+        q &= Q(payment_amount__contains=payment_amount)
+    if recipient:
+        q &= await api_controller.contains_filter("recipient", recipient)
+    return q
+
+
 @router.get("/list", summary="查看交易记录列表")
 async def list_transactions(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
-    payment_time: datetime = Query(None, description="支付时间"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
+    cursor: str = Query(None, description="游标，传入时按创建时间倒序游标翻页并忽略page，第一页传空字符串"),
+    payment_time: datetime = Query(None, description="支付时间，只传日期时查询当天"),
+    date_from: datetime = Query(None, description="支付开始时间（含）"),
+    date_to: datetime = Query(None, description="支付结束时间（不含）"),
     payment_amount: float = Query(None, description="支付金额"),
     recipient: str = Query(None, description="收款人"),
 ):
-    q = Q()
-    if payment_time:
-        q &= Q(payment_time__contains=payment_time)
-    if payment_amount:
-        q &= Q(payment_amount__contains=payment_amount)
-    if recipient:
-        q &= Q(recipient__contains=recipient)
-    total, transaction_objs = await api_controller.list(page=page, page_size=page_size, search=q, order=["payment_time", "id"])
-    data = [await obj.to_dict() for obj in transaction_objs]
-    data = [{**transaction, 'payment_amount': float(transaction['payment_amount'])} for transaction in data]
-    return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+    q = await transaction_search(payment_time, date_from, date_to, payment_amount, recipient)
+    total, transaction_objs = await api_controller.list(
+        page=page, page_size=page_size, search=q, order=["payment_time", "id"], with_total=with_total, cursor=cursor
+    )
+    data = api_controller.serialize(transaction_objs)
+    next_cursor = api_controller.next_cursor(transaction_objs, page_size) if cursor is not None else None
+    return SuccessExtra(data=data, total=total, page=page, page_size=page_size, next_cursor=next_cursor)
+
+@router.get("/export", summary="导出交易记录")
+@audit_policy(level=AuditLevel.ARGS)
+async def export_transactions(
+    format: ExportFormat = Query(ExportFormat.CSV, description="导出格式"),
+    payment_time: datetime = Query(None, description="支付时间，只传日期时查询当天"),
+    date_from: datetime = Query(None, description="支付开始时间（含）"),
+    date_to: datetime = Query(None, description="支付结束时间（不含）"),
+    payment_amount: float = Query(None, description="支付金额"),
+    recipient: str = Query(None, description="收款人"),
+):
+    q = await transaction_search(payment_time, date_from, date_to, payment_amount, recipient)
+    return export_response(api_controller, q, format, "transaction_record")
 
 @router.get("/get", summary="查看交易记录")
 async def get_transaction(
@@ -3,8 +3,8 @@ import logging
 from fastapi import APIRouter, Body, Query
 from tortoise.expressions import Q
 
-from app.controllers.dept import dept_controller
 from app.controllers.user import user_controller
+from app.models.admin import Dept
 from app.schemas.base import Fail, Success, SuccessExtra
 from app.schemas.users import *
 
@@ -17,6 +17,8 @@ router = APIRouter()
 async def list_user(
     page: int = Query(1, description="页码"),
     page_size: int = Query(10, description="每页数量"),
+    with_total: bool = Query(True, description="是否统计总数，为false时total返回-1"),
+    cursor: str = Query(None, description="游标，传入时按创建时间倒序游标翻页并忽略page，第一页传空字符串"),
     username: str = Query(None, description="用户名称，用于搜索"),
     email: str = Query(None, description="邮箱地址"),
     dept_id: int = Query(None, description="部门ID"),
@@ -28,13 +30,15 @@ async def list_user(
         q &= Q(email__contains=email)
     if dept_id is not None:
         q &= Q(dept_id=dept_id)
-    total, user_objs = await user_controller.list(page=page, page_size=page_size, search=q)
-    data = [await obj.to_dict(m2m=True, exclude_fields=["password"]) for obj in user_objs]
-    for item in data:
-        dept_id = item.pop("dept_id", None)
-        item["dept"] = await (await dept_controller.get(id=dept_id)).to_dict() if dept_id else {}
-
-    return SuccessExtra(data=data, total=total, page=page, page_size=page_size)
+    total, user_objs = await user_controller.list(
+        page=page, page_size=page_size, search=q, with_total=with_total, cursor=cursor
+    )
+    data = await user_controller.serialize_related(
+        user_objs, exclude=["password"], m2m=["roles"], refs={"dept_id": ("dept", Dept)}
+    )
+
+    next_cursor = user_controller.next_cursor(user_objs, page_size) if cursor is not None else None
+    return SuccessExtra(data=data, total=total, page=page, page_size=page_size, next_cursor=next_cursor)
 
 
 @router.get("/get", summary="查看用户")
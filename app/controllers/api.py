@@ -1,5 +1,6 @@
 from fastapi.routing import APIRoute
 
+from app.core.cache import permission_index
 from app.core.crud import CRUDBase
 from app.log import logger
 from app.models.admin import Api
@@ -10,6 +11,15 @@ class ApiController(CRUDBase[Api, ApiCreate, ApiUpdate]):
     def __init__(self):
         super().__init__(model=Api)
 
+    async def update(self, id: int, obj_in: ApiUpdate) -> Api:
+        obj = await super().update(id=id, obj_in=obj_in)
+        permission_index.invalidate()
+        return obj
+
+    async def remove(self, id: int) -> None:
+        await super().remove(id=id)
+        permission_index.invalidate()
+
     async def refresh_api(self):
         from app import app
 
@@ -40,6 +50,8 @@ class ApiController(CRUDBase[Api, ApiCreate, ApiUpdate]):
                 else:
                     logger.debug(f"API Created {method} {path}")
                     await Api.create(**dict(method=method, path=path, summary=summary, tags=tags))
+        permission_index.invalidate()
+        self.invalidate_cache()
 
 
 api_controller = ApiController()
@@ -1,7 +1,7 @@
 from tortoise.expressions import Q
-from tortoise.transactions import atomic
 
 from app.core.crud import CRUDBase
+from app.core.transactions import atomic
 from app.models.admin import Dept, DeptClosure
 from app.schemas.depts import DeptCreate, DeptUpdate
 
@@ -72,6 +72,7 @@ class DeptController(CRUDBase[Dept, DeptCreate, DeptUpdate]):
         # 更新部门信息
         dept_obj.update_from_dict(obj_in.model_dump(exclude_unset=True))
         await dept_obj.save()
+        self.invalidate_cache()
 
     @atomic()
     async def delete_dept(self, dept_id: int):
@@ -81,6 +82,7 @@ class DeptController(CRUDBase[Dept, DeptCreate, DeptUpdate]):
         await obj.save()
         # 删除关系
         await DeptClosure.filter(descendant=dept_id).delete()
+        self.invalidate_cache()
 
 
 dept_controller = DeptController()
@@ -1,9 +1,49 @@
-from app.core.crud import CRUDBase
+import asyncio
+from typing import List, Tuple
+
+from tortoise.expressions import Q, Subquery
+from tortoise.functions import Count, Sum
+
+from app.core.crud import CRUDBase, Total
 from app.models.admin import DutyStaff
+from app.models.enums import RollupDimension
 from app.schemas.duty_staff import DutyStaffCreate, DutyStaffUpdate
 
+from .total_rollup import total_record_rollup_controller
+
 class DutyStaffController(CRUDBase[DutyStaff, DutyStaffCreate, DutyStaffUpdate]):
     def __init__(self):
         super().__init__(model=DutyStaff)
 
-duty_staff_controller = DutyStaffController()
\ No newline at end of file
+    async def list_with_stats(self, page: int, page_size: int, search: Q = Q()) -> Tuple[Total, List[dict], dict]:
+        """
+        分页查询勤务人员，并按 TotalRecord.field_staff 统计台数和预期支出
+        固定3次查询，与人员数、记录数无关：当前页、人员总数及实际支出合计、按外勤维度读取按天汇总表
+        （汇总表不可用时改为在原始记录上按外勤 GROUP BY，仍是一次查询；另有可用性检查，结果缓存）
+        返回 (总数, 当前页数据, 全部符合条件人员的合计)
+        """
+        staff_query = self.model.filter(search)
+        page_query = staff_query.offset((page - 1) * page_size).limit(page_size).order_by("-created_at")
+        staff_summary_query = staff_query.annotate(
+            staff_count=Count("id"), actual_expenditure_sum=Sum("actual_expenditure", _filter=~Q(name=""))
+        ).values("staff_count", "actual_expenditure_sum")
+        record_stats_query = total_record_rollup_controller.summary(
+            RollupDimension.FIELD_STAFF, values=Subquery(staff_query.filter(~Q(name="")).values("name"))
+        )
+        staff_objs, staff_summary, record_stats = await asyncio.gather(
+            page_query, staff_summary_query, record_stats_query
+        )
+        stats = {row["value"]: (row["count"], row["expected_expenditure"]) for row in record_stats}
+
+        data = self.serialize(staff_objs)
+        for item in data:
+            if item["name"]:
+                item["count"], item["expected_expenditure_sum"] = stats.get(item["name"], (0, 0))
+        summary = {
+            "total_count": sum(count for count, _ in stats.values()),
+            "total_expected_expenditure_sum": sum(expenditure for _, expenditure in stats.values()),
+            "total_actual_expenditure": int(staff_summary[0]["actual_expenditure_sum"] or 0),
+        }
+        return Total(staff_summary[0]["staff_count"]), data, summary
+
+duty_staff_controller = DutyStaffController()
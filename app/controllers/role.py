@@ -1,5 +1,6 @@
 from typing import List
 
+from app.core.cache import permission_index, user_cache
 from app.core.crud import CRUDBase
 from app.models.admin import Api, Menu, Role
 from app.schemas.roles import RoleCreate, RoleUpdate
@@ -22,6 +23,13 @@ class RoleController(CRUDBase[Role, RoleCreate, RoleUpdate]):
         for item in api_infos:
             api_obj = await Api.filter(path=item.get("path"), method=item.get("method")).first()
             await role.apis.add(api_obj)
+        permission_index.invalidate(role.id)
+        self.invalidate_cache()
+
+    async def remove(self, id: int) -> None:
+        await super().remove(id=id)
+        permission_index.invalidate(id)
+        user_cache.invalidate()
 
 
 role_controller = RoleController()
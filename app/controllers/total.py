@@ -1,19 +1,140 @@
-from app.core.crud import CRUDBase
+from datetime import datetime
+from typing import List, Optional
+
+from tortoise.expressions import Q
+from tortoise.functions import Count, Sum
+
+from app.core.crud import CRUDBase, date_range_filter
+from app.core.search import ngram_index
+from app.core.transactions import atomic
 from app.models.admin import TotalRecord
+from app.models.enums import RollupDimension
+
+from .total_rollup import ROLLUP_SOURCE_FIELDS, rollup_day_range, total_record_rollup_controller
 from app.schemas.total import TotalRecordCreate, TotalRecordUpdate, TotalRecordYyfsCreate, TotalRecordYyfsUpdate, TotalRecordBsCreate, TotalRecordBsUpdate
 
+# 各列表接口返回的字段，list 时只查询这些列
+TOTAL_YY_FIELDS = tuple(field for field in TotalRecord._meta.fields_db_projection if field != "income")
+TOTAL_OB_FIELDS = (
+    "id",
+    "date",
+    "plate",
+    "region",
+    "company",
+    "business",
+    "income",
+    "remark",
+    "docking_time",
+    "handover_time",
+    "is_completed",
+)
+# 导出的字段，不导出密码
+TOTAL_EXPORT_FIELDS = tuple(
+    field
+    for field in TotalRecord._meta.fields_db_projection
+    if field not in ("password", "created_at", "updated_at")
+)
+
 class TotalRecordController(CRUDBase[TotalRecord, TotalRecordCreate, TotalRecordUpdate]):
+    """增删改在同一事务内同步更新按天汇总表和搜索索引"""
+
     def __init__(self):
-        super().__init__(model=TotalRecord)
+        super().__init__(
+            model=TotalRecord, search_index=ngram_index(TotalRecord, ("plate", "company", "business", "field_staff"))
+        )
+
+    async def _rollup_row(self, id: int) -> dict:
+        # 从数据库读回，保证与 rebuild 使用相同的取值（如日期时区）
+        return await self.model.get(id=id).values(*ROLLUP_SOURCE_FIELDS)
+
+    @atomic()
+    async def create(self, obj_in: TotalRecordCreate) -> TotalRecord:
+        obj = await super().create(obj_in)
+        await total_record_rollup_controller.apply(await self._rollup_row(obj.id), 1)
+        return obj
+
+    @atomic()
+    async def update(self, id: int, obj_in: TotalRecordUpdate) -> TotalRecord:
+        await total_record_rollup_controller.apply(await self._rollup_row(id), -1)
+        obj = await super().update(id=id, obj_in=obj_in)
+        await total_record_rollup_controller.apply(await self._rollup_row(id), 1)
+        return obj
+
+    @atomic()
+    async def remove(self, id: int) -> None:
+        await total_record_rollup_controller.apply(await self._rollup_row(id), -1)
+        await super().remove(id=id)
         
 class TotalRecordYyfsController(CRUDBase[TotalRecord, TotalRecordYyfsCreate, TotalRecordYyfsUpdate]):
     def __init__(self):
         super().__init__(model=TotalRecord)
         
 class TotalRecordBsController(CRUDBase[TotalRecord, TotalRecordBsCreate, TotalRecordBsUpdate]):
+    """
+    业务员维度统计，时间区间 [date_from, date_to) 按天对齐（或不限）时读按天汇总表，与原始记录行数无关
+    区间边界不在零点时汇总表无法表示，汇总表不可用（未重建或不完整）时也不能读，回退为在原始记录上聚合
+    """
+
     def __init__(self):
         super().__init__(model=TotalRecord)
 
+    @staticmethod
+    def _summary_row(row: dict) -> dict:
+        # 没有记录时 SUM 为 NULL；部分数据库 SUM 返回 Decimal
+        return {
+            "count": row["count"] or 0,
+            "expected_expenditure": int(row["expected_expenditure_sum"] or 0),
+            "income": int(row["income_sum"] or 0),
+        }
+
+    @staticmethod
+    def _rollup_row(row: dict) -> dict:
+        return {"count": row["count"], "expected_expenditure": row["expected_expenditure"], "income": row["income"]}
+
+    def _aggregate(self, search: Q):
+        return self.model.filter(search).annotate(
+            count=Count("id"), expected_expenditure_sum=Sum("expected_expenditure"), income_sum=Sum("income")
+        )
+
+    async def summarize(
+        self, business: str, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None
+    ) -> dict:
+        """统计业务员名包含 business 的记录条数、预期支出和收入合计"""
+        days = rollup_day_range(date_from, date_to)
+        if days is not None and await total_record_rollup_controller.is_ready():
+            rows = await total_record_rollup_controller.summary(
+                RollupDimension.BUSINESS, *days, value_contains=business
+            )
+            return {key: sum(row[key] for row in rows) for key in ("count", "expected_expenditure", "income")}
+        search = date_range_filter("date", date_from=date_from, date_to=date_to)
+        search &= await total_record_controller.contains_filter("business", business)
+        rows = await self._aggregate(search).values("count", "expected_expenditure_sum", "income_sum")
+        return self._summary_row(rows[0])
+
+    async def summarize_by_business(
+        self, businesses: List[str], date_from: Optional[datetime] = None, date_to: Optional[datetime] = None
+    ) -> List[dict]:
+        """
+        按业务员统计条数、预期支出和收入，一次查询完成
+        结果与 businesses 顺序一致，没有记录的业务员各项为0
+        """
+        if not businesses:
+            return []
+        days = rollup_day_range(date_from, date_to)
+        if days is not None and await total_record_rollup_controller.is_ready():
+            rows = await total_record_rollup_controller.summary(RollupDimension.BUSINESS, *days, values=businesses)
+            summaries = {row["value"]: self._rollup_row(row) for row in rows}
+        else:
+            search = date_range_filter("date", date_from=date_from, date_to=date_to) & Q(business__in=businesses)
+            rows = (
+                await self._aggregate(search)
+                .group_by("business")
+                .values("business", "count", "expected_expenditure_sum", "income_sum")
+            )
+            summaries = {row["business"]: self._summary_row(row) for row in rows}
+        empty = {"count": 0, "expected_expenditure": 0, "income": 0}
+        return [{"business": business, **summaries.get(business, empty)} for business in businesses]
+
 total_record_controller = TotalRecordController()
 total_record_yyfs_controller = TotalRecordYyfsController()
 total_record_controller_bs = TotalRecordBsController()
\ No newline at end of file
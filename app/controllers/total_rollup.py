@@ -0,0 +1,412 @@
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, Union
+
+from pypika import functions
+from tortoise import Tortoise, timezone
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F, Q, Subquery
+from tortoise.functions import Count, Function, Sum
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+from app.core.jobs import job_queue
+from app.log import logger
+from app.models.admin import Job, RollupState, TotalRecord, TotalRecordDailyRollup
+from app.models.enums import JobStatus, RollupDimension
+from app.settings import settings
+
+# 计算汇总需要的原始字段
+ROLLUP_SOURCE_FIELDS = (
+    "id",
+    "date",
+    "business",
+    "field_staff",
+    "company",
+    "expected_expenditure",
+    "income",
+    "is_completed",
+)
+ROLLUP_METRICS = ("count", "expected_expenditure", "income", "completed_count")
+# 各维度对应的原始字段，all 维度的取值固定为空字符串
+ROLLUP_DIMENSION_FIELDS = {
+    RollupDimension.BUSINESS: "business",
+    RollupDimension.FIELD_STAFF: "field_staff",
+    RollupDimension.COMPANY: "company",
+}
+
+
+class RecordDay(Function):
+    """DATE(字段)，SQLite 返回 YYYY-MM-DD 字符串，PG/MySQL 返回日期"""
+
+    database_func = functions.Date
+
+
+def rollup_day(value: datetime) -> date:
+    if timezone.is_naive(value):
+        return value.date()
+    return timezone.localtime(value).date()
+
+
+def rollup_day_range(
+    date_from: Optional[datetime], date_to: Optional[datetime]
+) -> Optional[Tuple[Optional[date], Optional[date]]]:
+    """
+    把原始记录的时间区间 [date_from, date_to) 转换为汇总表的天区间 (day_from, day_to)，两端均包含
+    边界不在当天零点时汇总表无法表示，返回 None
+    """
+    days = []
+    for value in (date_from, date_to):
+        if value is None:
+            days.append(None)
+            continue
+        local = value if timezone.is_naive(value) else timezone.localtime(value)
+        if local.time() != time(0):
+            return None
+        days.append(local.date())
+    day_from, day_to = days
+    return day_from, (day_to - timedelta(days=1) if day_to else None)
+
+
+def day_start(day: date) -> datetime:
+    """汇总表中某天对应的原始记录时间下界，与 rollup_day 的换算一致"""
+    value = datetime.combine(day, time(0))
+    return timezone.make_aware(value) if timezone.get_use_tz() else value
+
+
+def rollup_keys(row: dict) -> List[tuple]:
+    """一条 TotalRecord 会计入的汇总行 (day, dimension, value)"""
+    day = rollup_day(row["date"])
+    return [
+        (day, RollupDimension.ALL, ""),
+        (day, RollupDimension.BUSINESS, row["business"]),
+        (day, RollupDimension.FIELD_STAFF, row["field_staff"]),
+        (day, RollupDimension.COMPANY, row["company"]),
+    ]
+
+
+def rollup_metrics(row: dict, sign: int = 1) -> dict:
+    return {
+        "count": sign,
+        "expected_expenditure": sign * row["expected_expenditure"],
+        "income": sign * (row["income"] or 0),
+        "completed_count": sign if row["is_completed"] else 0,
+    }
+
+
+class TotalRecordRollupController:
+    """
+    TotalRecord 按天汇总表，维度为全部/业务员/外勤/公司
+    - total_record_controller 增删改时在同一事务内增量更新；rebuild 从原始记录全量重建，check 比对汇总表与原始记录
+    - rollup_state 记录是否已重建过；未重建，或汇总表 all 维度的记录数与原始记录数不一致（如批量导入、直接执行 SQL）时
+      summary 在原始记录上 GROUP BY 计算，并提交重建任务；检查结果缓存 coverage_ttl 秒
+    - 直接修改原始记录的字段不改变记录数，无法检测，需用 check 校验后 rebuild
+    """
+
+    def __init__(self, batch_size: int = 1000, coverage_ttl: float = 10) -> None:
+        self.model = TotalRecordDailyRollup
+        self.name = TotalRecordDailyRollup._meta.db_table
+        self.batch_size = batch_size
+        self.coverage_ttl = coverage_ttl
+        self._ready = False
+        self._checked_at = float("-inf")
+
+    def _state(self):
+        return RollupState.filter(name=self.name)
+
+    async def apply(self, row: dict, sign: int) -> None:
+        """把一条记录计入（sign=1）或移出（sign=-1）汇总表，需在写原始记录的事务中调用"""
+        # 重建期间持有状态行的锁，等重建提交后再累加，不会被重建覆盖
+        # 代价是 TotalRecord 的写事务在该行上串行（同一天的写入本就在当天的 all 维度行上串行）
+        await RollupState.select_for_update().filter(name=self.name).first()
+        metrics = rollup_metrics(row, sign)
+        increments = {key: F(key) + delta for key, delta in metrics.items()}
+        for day, dimension, value in rollup_keys(row):
+            query = self.model.filter(day=day, dimension=dimension, value=value)
+            if await query.update(**increments):
+                if sign < 0:
+                    await query.filter(count__lte=0).delete()
+                continue
+            try:
+                # 保存点内插入，唯一键冲突时只回滚这一条插入，不影响外层事务
+                async with in_transaction():
+                    await self.model.create(day=day, dimension=dimension, value=value, **metrics)
+            except IntegrityError:
+                # 并发事务已先插入同一 (day, dimension, value)，改为在其上累加
+                await query.update(**increments)
+
+    async def _iter_records(self, query: Optional[QuerySet] = None) -> AsyncIterator[List[dict]]:
+        query = TotalRecord.all() if query is None else query
+        last_id = 0
+        while True:
+            rows = (
+                await query.filter(id__gt=last_id).order_by("id").limit(self.batch_size).values(*ROLLUP_SOURCE_FIELDS)
+            )
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    async def compute(self, query: Optional[QuerySet] = None) -> dict[tuple, dict]:
+        """从原始记录（默认全部）分批计算汇总结果 {(day, dimension, value): metrics}，只用于 rebuild 和 check"""
+        rollups: dict[tuple, dict] = {}
+        async for rows in self._iter_records(query):
+            for row in rows:
+                metrics = rollup_metrics(row)
+                for key in rollup_keys(row):
+                    item = rollups.setdefault(key, dict.fromkeys(ROLLUP_METRICS, 0))
+                    for name, delta in metrics.items():
+                        item[name] += delta
+        return rollups
+
+    async def rebuild(self) -> int:
+        """
+        全量重建汇总表，返回汇总行数；用于回填或修复
+        事务的第一条语句更新状态行：PG/MySQL 上持有行锁，apply 等待重建提交，重建期间的写入在重建后累加；
+        SQLite 上提前取得写锁，计算期间其他写事务等待，不会在删除时因快照过期失败
+        """
+        await RollupState.get_or_create(name=self.name)
+        async with in_transaction():
+            await self._state().update(built_at=None)
+            rollups = await self.compute()
+            await self.model.all().delete()
+            await self.model.bulk_create(
+                [
+                    self.model(day=day, dimension=dimension, value=value, **metrics)
+                    for (day, dimension, value), metrics in rollups.items()
+                ],
+                batch_size=self.batch_size,
+            )
+            await self._state().update(built_at=timezone.now())
+        self._ready, self._checked_at = True, monotonic()
+        logger.info(f"TotalRecord rollup rebuilt, {len(rollups)} rows")
+        return len(rollups)
+
+    async def check(self) -> List[dict]:
+        """比对汇总表与原始记录，返回不一致的汇总行"""
+        expected = await self.compute()
+        actual = {
+            (row["day"], RollupDimension(row["dimension"]), row["value"]): {key: row[key] for key in ROLLUP_METRICS}
+            for row in await self.model.all().values("day", "dimension", "value", *ROLLUP_METRICS)
+        }
+        empty = dict.fromkeys(ROLLUP_METRICS, 0)
+        mismatches = []
+        for key in sorted(expected.keys() | actual.keys()):
+            if expected.get(key, empty) != actual.get(key, empty):
+                day, dimension, value = key
+                mismatches.append(
+                    {
+                        "day": day,
+                        "dimension": dimension,
+                        "value": value,
+                        "expected": expected.get(key, empty),
+                        "actual": actual.get(key, empty),
+                    }
+                )
+        return mismatches
+
+    async def submit_rebuild(self, built_at: Optional[datetime], record_count: int, rollup_count: int) -> None:
+        """
+        没有待执行的重建任务时提交一个；幂等键包含上次重建时间和两边的记录数，多个进程同时检查时只提交一次
+        相同幂等键的任务失败时重新执行
+        """
+        if await Job.filter(
+            name="total_record_rollup_rebuild", status__in=[JobStatus.PENDING, JobStatus.RUNNING]
+        ).exists():
+            return
+        built = int(built_at.timestamp()) if built_at else 0
+        await job_queue.submit(
+            "total_record_rollup_rebuild",
+            idempotency_key=f"total_record_rollup_rebuild:{built}:{record_count}:{rollup_count}",
+            retry_failed=True,
+        )
+
+    async def submit_check(self, user_id: Optional[int] = None) -> Job:
+        """提交校验任务；已有待执行或执行中的校验任务时直接返回该任务，重复提交不会叠加全表扫描"""
+        job = (
+            await Job.filter(name="total_record_rollup_check", status__in=[JobStatus.PENDING, JobStatus.RUNNING])
+            .order_by("id")
+            .first()
+        )
+        if job:
+            return job
+        return await job_queue.submit("total_record_rollup_check", user_id=user_id)
+
+    async def ensure_built(self) -> None:
+        """启动时检查汇总表是否可用（如首次部署、上次重建失败），不可用时提交重建任务"""
+        # 状态行先于任何写入存在，apply 才有行可锁
+        await RollupState.get_or_create(name=self.name)
+        self._checked_at = float("-inf")
+        await self.is_ready()
+
+    async def is_ready(self) -> bool:
+        """汇总表是否已重建且与原始记录数一致，不一致时提交重建任务"""
+        now = monotonic()
+        if now - self._checked_at < self.coverage_ttl:
+            return self._ready
+        # 状态行与两边的记录数在同一条语句中读取，是同一时刻的数据
+        row = (
+            await self._state()
+            .annotate(
+                rollup_count=Subquery(
+                    self.model.filter(dimension=RollupDimension.ALL).annotate(total=Sum("count")).values("total")
+                ),
+                record_count=Subquery(TotalRecord.all().annotate(total=Count("id")).values("total")),
+            )
+            .first()
+            .values("built_at", "rollup_count", "record_count")
+        )
+        if row is None:
+            row = {"built_at": None, "rollup_count": 0, "record_count": await TotalRecord.all().count()}
+        rollup_count = int(row["rollup_count"] or 0)
+        ready = row["built_at"] is not None and rollup_count == row["record_count"]
+        self._ready, self._checked_at = ready, now
+        if not ready:
+            logger.warning(
+                f"TotalRecord rollup not usable (built_at={row['built_at']}, {rollup_count} rollup records, "
+                f"{row['record_count']} records), reading raw records"
+            )
+            await self.submit_rebuild(row["built_at"], row["record_count"], rollup_count)
+        return ready
+
+    async def summary(
+        self,
+        dimension: RollupDimension,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        value: Optional[str] = None,
+        by_day: bool = False,
+        values: Optional[Union[Sequence[str], Subquery]] = None,
+        value_contains: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        读汇总表，按维度取值（by_day 时再按天）合计；date_from、date_to 均包含
+        value 精确匹配，values 为取值列表或子查询，value_contains 为子串匹配
+        汇总表不可用时从原始记录计算，结果相同
+        """
+        if not await self.is_ready():
+            return await self._summary_from_records(
+                dimension, date_from, date_to, value, by_day, values, value_contains
+            )
+        query = self.model.filter(dimension=dimension)
+        if date_from:
+            query = query.filter(day__gte=date_from)
+        if date_to:
+            query = query.filter(day__lte=date_to)
+        if value is not None:
+            query = query.filter(value=value)
+        if values is not None:
+            query = query.filter(value__in=values)
+        if value_contains:
+            query = query.filter(value__contains=value_contains)
+        group_by = ["day", "value"] if by_day else ["value"]
+        rows = (
+            await query.annotate(**{f"{key}_sum": Sum(key) for key in ROLLUP_METRICS})
+            .group_by(*group_by)
+            .order_by(*group_by)
+            .values(*group_by, *(f"{key}_sum" for key in ROLLUP_METRICS))
+        )
+        return [
+            {
+                **{key: row[key] for key in group_by},
+                **{key: int(row[f"{key}_sum"] or 0) for key in ROLLUP_METRICS},
+            }
+            for row in rows
+        ]
+
+    async def _summary_from_records(
+        self,
+        dimension: RollupDimension,
+        date_from: Optional[date],
+        date_to: Optional[date],
+        value: Optional[str],
+        by_day: bool,
+        values: Optional[Union[Sequence[str], Subquery]],
+        value_contains: Optional[str],
+    ) -> List[dict]:
+        """
+        按与汇总表相同的规则从原始记录计算 summary，在数据库中 GROUP BY 完成，一次查询
+        by_day 时按 DATE(date) 分组；启用 use_tz 时库中是 UTC 时间，改为按时间分组后换算成本地日期再合计
+        """
+        query = TotalRecord.all()
+        if date_from:
+            query = query.filter(date__gte=day_start(date_from))
+        if date_to:
+            query = query.filter(date__lt=day_start(date_to + timedelta(days=1)))
+        field = ROLLUP_DIMENSION_FIELDS.get(dimension)
+        if field is None:
+            # all 维度只有空字符串一个取值，按取值过滤时（取值子查询无法在此判断）视为不匹配
+            if value or value_contains or (values is not None and (isinstance(values, Subquery) or "" not in values)):
+                return []
+        else:
+            if value is not None:
+                query = query.filter(**{field: value})
+            if values is not None:
+                query = query.filter(**{f"{field}__in": values})
+            if value_contains:
+                query = query.filter(**{f"{field}__contains": value_contains})
+        group_by = [field] if field else []
+        if by_day:
+            if timezone.get_use_tz():
+                group_by.append("date")
+            else:
+                query = query.annotate(record_day=RecordDay("date"))
+                group_by.append("record_day")
+        query = query.annotate(
+            count_sum=Count("id"),
+            expected_expenditure_sum=Sum("expected_expenditure"),
+            income_sum=Sum("income"),
+            completed_count_sum=Count("id", _filter=Q(is_completed=True)),
+        )
+        if group_by:
+            query = query.group_by(*group_by)
+        rows = await query.values(*group_by, *(f"{key}_sum" for key in ROLLUP_METRICS))
+        totals: dict[tuple, dict] = {}
+        for row in rows:
+            if not row["count_sum"]:
+                # 没有分组时聚合空集也会返回一行
+                continue
+            key_value = row[field] if field else ""
+            if by_day:
+                day = rollup_day(row["date"]) if "date" in row else row["record_day"]
+                key = (date.fromisoformat(day) if isinstance(day, str) else day, key_value)
+            else:
+                key = (key_value,)
+            item = totals.setdefault(key, dict.fromkeys(ROLLUP_METRICS, 0))
+            for name in ROLLUP_METRICS:
+                item[name] += int(row[f"{name}_sum"] or 0)
+        keys = ["day", "value"] if by_day else ["value"]
+        return [{**dict(zip(keys, key)), **metrics} for key, metrics in sorted(totals.items())]
+
+
+total_record_rollup_controller = TotalRecordRollupController(
+    coverage_ttl=getattr(settings, "ROLLUP_COVERAGE_TTL", 10),
+)
+
+
+@job_queue.register("total_record_rollup_rebuild")
+async def rebuild_total_record_rollup(payload=None) -> int:
+    return await total_record_rollup_controller.rebuild()
+
+
+@job_queue.register("total_record_rollup_check")
+async def check_total_record_rollup(payload=None) -> dict:
+    """校验需要扫描全部原始记录，在任务中执行；结果只保留前 100 条不一致的汇总行"""
+    mismatches = await total_record_rollup_controller.check()
+    rows = [{**item, "day": item["day"].isoformat(), "dimension": item["dimension"].value} for item in mismatches[:100]]
+    return {"count": len(mismatches), "mismatches": rows}
+
+
+async def main(command: str) -> None:
+    """命令行入口，见根目录 rollup.py"""
+    await Tortoise.init(config=settings.TORTOISE_ORM)
+    try:
+        if command == "rebuild":
+            print(f"rebuilt {await total_record_rollup_controller.rebuild()} rollup rows")
+        else:
+            mismatches = await total_record_rollup_controller.check()
+            for item in mismatches:
+                print(item)
+            print(f"{len(mismatches)} mismatched rollup rows")
+    finally:
+        await Tortoise.close_connections()
@@ -1,6 +1,8 @@
 from fastapi.routing import APIRoute
 
 from app.core.crud import CRUDBase
+from app.core.search import ngram_index
+from app.core.transactions import atomic
 from app.log import logger
 from app.models.admin import TransactionRecord
 from app.schemas.transactions import TransactionCreate, TransactionUpdate
@@ -8,7 +10,19 @@ from app.schemas.transactions import TransactionCreate, TransactionUpdate
 
 class ApiController(CRUDBase[TransactionRecord, TransactionCreate, TransactionUpdate]):
     def __init__(self):
-        super().__init__(model=TransactionRecord)
+        super().__init__(model=TransactionRecord, search_index=ngram_index(TransactionRecord, ("recipient",)))
+
+    @atomic()
+    async def create(self, obj_in: TransactionCreate) -> TransactionRecord:
+        return await super().create(obj_in)
+
+    @atomic()
+    async def update(self, id: int, obj_in: TransactionUpdate) -> TransactionRecord:
+        return await super().update(id=id, obj_in=obj_in)
+
+    @atomic()
+    async def remove(self, id: int) -> None:
+        await super().remove(id=id)
 
 
 api_controller = ApiController()
@@ -0,0 +1,387 @@
+import asyncio
+import gzip
+import heapq
+import json
+import os
+import random
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Callable, Iterable, Iterator, Optional
+
+from tortoise import timezone
+
+from app.log import logger
+from app.models.admin import AuditLog
+from app.settings import settings
+
+
+class AuditLevel(IntEnum):
+    OFF = 0  # 不记录
+    METADATA = 1  # 只记录路径、状态码、耗时、用户等元数据
+    ARGS = 2  # 额外记录请求参数
+    FULL = 3  # 额外记录响应体
+
+
+@dataclass(frozen=True)
+class AuditPolicy:
+    level: AuditLevel = AuditLevel.FULL
+    sample_rate: float = 1.0
+    methods: Optional[frozenset[str]] = None  # 为空时对所有方法生效
+
+    def applies_to(self, method: str) -> bool:
+        return self.methods is None or method in self.methods
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+
+DEFAULT_AUDIT_POLICY = AuditPolicy()
+SKIP_AUDIT_POLICY = AuditPolicy(level=AuditLevel.OFF)
+
+
+def audit_policy(
+    level: AuditLevel = AuditLevel.FULL, sample_rate: float = 1.0, methods: Optional[Iterable[str]] = None
+) -> Callable:
+    """路由级审计策略装饰器，优先级高于按路径前缀配置的策略"""
+    policy = AuditPolicy(level=level, sample_rate=sample_rate, methods=frozenset(methods) if methods else None)
+
+    def decorator(func: Callable) -> Callable:
+        func.__audit_policy__ = policy
+        return func
+
+    return decorator
+
+
+class AuditPolicyMatcher:
+    """
+    启动时把排除路径和按前缀配置的策略编译为单个正则
+    前缀按长度倒序排列，保证最长前缀优先匹配；前缀只在路径段边界上匹配（/api/v1/total 不匹配 /api/v1/totals）
+    命中前缀但方法不在 methods 中时使用默认策略
+    """
+
+    def __init__(self, exclude_paths: list[str], policies: dict[str, AuditPolicy]) -> None:
+        self._exclude = re.compile("|".join(f"(?:{path})" for path in exclude_paths), re.I) if exclude_paths else None
+        self._policies: dict[str, AuditPolicy] = {}
+        patterns = []
+        for i, (prefix, policy) in enumerate(sorted(policies.items(), key=lambda item: len(item[0]), reverse=True)):
+            self._policies[f"p{i}"] = policy
+            patterns.append(f"(?P<p{i}>{re.escape(prefix.rstrip('/'))}(?:/|$))")
+        self._prefix = re.compile("|".join(patterns)) if patterns else None
+
+    def match(self, method: str, path: str, route_policy: Optional[AuditPolicy] = None) -> AuditPolicy:
+        if self._exclude is not None and self._exclude.search(path) is not None:
+            return SKIP_AUDIT_POLICY
+        if route_policy is not None and route_policy.applies_to(method):
+            return route_policy
+        if self._prefix is not None:
+            m = self._prefix.match(path)
+            if m is not None:
+                policy = self._policies[m.lastgroup]
+                if policy.applies_to(method):
+                    return policy
+        return DEFAULT_AUDIT_POLICY
+
+
+class AuditLogWriter:
+    """
+    审计日志批量异步写入
+    请求只负责入队，后台任务按数量或时间批量 bulk_create
+    队列满时 overflow="drop" 丢弃，overflow="inline" 退化为同步写入
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float, overflow: str = "drop") -> None:
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._queue: Optional[asyncio.Queue[Optional[dict]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """队列在 start 中创建，归属当前事件循环，多次启动 lifespan 时不会复用上一个循环的队列"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务，退出前写完队列中剩余的日志"""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def put(self, data: dict) -> None:
+        data.setdefault("created_at", timezone.now())
+        if self._task is None:
+            # 未启动后台任务（如未经过lifespan）时直接写入
+            await self._flush([data])
+        elif self._queue.qsize() < self.max_size:
+            self._queue.put_nowait(data)
+            self.queued += 1
+        elif self.overflow == "inline":
+            await self._flush([data])
+        else:
+            self.dropped += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch: list[dict] = []
+            item = await self._queue.get()
+            deadline = loop.time() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]) -> None:
+        try:
+            await AuditLog.bulk_create([AuditLog(**data) for data in batch])
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"AuditLog flush failed, {len(batch)} records lost: {repr(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "queued": self.queued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+audit_log_writer = AuditLogWriter(
+    max_size=getattr(settings, "AUDIT_LOG_QUEUE_SIZE", 10000),
+    batch_size=getattr(settings, "AUDIT_LOG_BATCH_SIZE", 100),
+    flush_interval=getattr(settings, "AUDIT_LOG_FLUSH_INTERVAL", 1.0),
+    overflow=getattr(settings, "AUDIT_LOG_OVERFLOW", "drop"),
+)
+
+
+_ARCHIVE_FILE_PATTERN = re.compile(r"auditlog-(\d{4}-\d{2})\.ndjson\.gz")
+
+
+def _comparable(value: datetime) -> datetime:
+    """统一为带时区的时间再比较，查询参数、数据库和归档文件中的时间不一定都带时区"""
+    return value if timezone.is_aware(value) else timezone.make_aware(value)
+
+
+def _month_end(month: str) -> datetime:
+    """归档文件 auditlog-{month} 中记录 created_at 的上界，放宽一天以兼容时区"""
+    year, mon = map(int, month.split("-"))
+    first = datetime(year + mon // 12, mon % 12 + 1, 1)
+    return _comparable(first + timedelta(days=1))
+
+
+def audit_log_sort_key(row: dict) -> tuple[datetime, int]:
+    """审计日志列表的排序键 (created_at, id)，用于合并热表与归档记录"""
+    return _comparable(row["created_at"]), row["id"]
+
+
+class AuditLogArchiver:
+    """
+    审计日志归档：热表只保留 retention_days 天内的记录
+    后台任务定期把过期记录按月追加写入 gzip 压缩的 NDJSON 文件，写入成功后再从热表删除
+    默认关闭，需同时配置 AUDIT_LOG_RETENTION_DAYS 和 AUDIT_LOG_ARCHIVE_DIR 才会启动
+    /auditlog/list 的时间区间早于保留期时，按月份读取对应的归档文件，与热表结果合并；容器部署时 archive_dir 应挂载到持久卷
+    单次查询最多读取 max_months 个月份的归档文件
+    """
+
+    def __init__(
+        self,
+        retention_days: int,
+        archive_dir: Optional[str],
+        interval: float,
+        batch_size: int = 1000,
+        max_months: int = 12,
+    ) -> None:
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_months = max_months
+        self._task: Optional[asyncio.Task] = None
+        self.archived = 0
+
+    def start(self) -> None:
+        if self._task is not None or self.retention_days <= 0:
+            return
+        if not self.archive_dir:
+            logger.warning("AuditLog archive disabled: AUDIT_LOG_RETENTION_DAYS is set without AUDIT_LOG_ARCHIVE_DIR")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                count = await self.archive()
+                if count:
+                    logger.info(f"AuditLog archived {count} records to {self.archive_dir}")
+            except Exception as e:
+                logger.error(f"AuditLog archive failed: {repr(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def archive(self) -> int:
+        """归档所有超过保留期的记录，返回归档条数"""
+        cutoff = timezone.now() - timedelta(days=self.retention_days)
+        count = 0
+        while True:
+            rows = await AuditLog.filter(created_at__lt=cutoff).order_by("id").limit(self.batch_size).values()
+            if not rows:
+                break
+            await asyncio.to_thread(self._write, rows)
+            await AuditLog.filter(id__in=[row["id"] for row in rows]).delete()
+            count += len(rows)
+            self.archived += len(rows)
+        return count
+
+    def _write(self, rows: list[dict]) -> None:
+        months: dict[str, list[str]] = {}
+        for row in rows:
+            line = json.dumps(row, ensure_ascii=False, default=str)
+            months.setdefault(row["created_at"].strftime("%Y-%m"), []).append(line)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for month, lines in months.items():
+            # gzip 支持多个成员拼接，可直接追加写入
+            with gzip.open(os.path.join(self.archive_dir, f"auditlog-{month}.ndjson.gz"), "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def reaches_archive(self, start: Optional[datetime], end: Optional[datetime]) -> bool:
+        """查询的时间区间是否早于保留期，需要读取归档文件；未指定时间区间的查询只读热表"""
+        if self.retention_days <= 0 or not self.archive_dir:
+            return False
+        if start is None:
+            return end is not None
+        return _comparable(start) < _comparable(timezone.now() - timedelta(days=self.retention_days))
+
+    def archive_files(self, start: Optional[datetime], end: Optional[datetime]) -> list[tuple[str, str]]:
+        """时间区间涉及的归档文件 (月份, 路径)，按月份倒序"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        # 文件按写入时 created_at 的月份划分，前后各放宽一天，避免时区不同时漏掉月初月末的记录
+        first = (start - timedelta(days=1)).strftime("%Y-%m") if start else ""
+        last = (end + timedelta(days=1)).strftime("%Y-%m") if end else "9999-99"
+        files = []
+        for name in os.listdir(self.archive_dir):
+            m = _ARCHIVE_FILE_PATTERN.fullmatch(name)
+            if m is not None and first <= m.group(1) <= last:
+                files.append((m.group(1), os.path.join(self.archive_dir, name)))
+        return sorted(files, reverse=True)
+
+    async def read(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        match: Callable[[dict], bool],
+        before: Optional[tuple[datetime, int]] = None,
+        limit: Optional[int] = None,
+        with_total: bool = False,
+    ) -> tuple[list[dict], int]:
+        """
+        读取 [start, end] 内满足 match、排序键 (created_at, id) 小于 before 的归档记录，按排序键倒序最多返回 limit 条
+        格式与 AuditLog .values() 相同；with_total 为 false 时总数返回 -1
+        从最新的月份开始读，不统计总数时凑够 limit 条且更早的月份不可能排在前面就停止，不再解压剩余文件
+        """
+        return await asyncio.to_thread(self._read, start, end, match, before, limit, with_total)
+
+    def _read(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        match: Callable[[dict], bool],
+        before: Optional[tuple[datetime, int]],
+        limit: Optional[int],
+        with_total: bool,
+    ) -> tuple[list[dict], int]:
+        files = self.archive_files(start, end)
+        start = _comparable(start) if start else None
+        end = _comparable(end) if end else None
+        before = (_comparable(before[0]), before[1]) if before else None
+        # 小顶堆只保留排序键最大的 limit 条，堆顶是其中最小的一条
+        heap: list[tuple[tuple[datetime, int], dict]] = []
+        total = 0
+        for month, path in files:
+            if not with_total and limit is not None and len(heap) >= limit and heap[0][0][0] >= _month_end(month):
+                break
+            for row in self._iter_file(path):
+                created_at = _comparable(row["created_at"])
+                if (start and created_at < start) or (end and created_at > end) or not match(row):
+                    continue
+                total += 1
+                key = audit_log_sort_key(row)
+                if before is not None and key >= before:
+                    continue
+                if limit is None or len(heap) < limit:
+                    heapq.heappush(heap, (key, row))
+                elif key > heap[0][0]:
+                    heapq.heapreplace(heap, (key, row))
+        rows = [row for _, row in sorted(heap, key=lambda item: item[0], reverse=True)]
+        return rows, total if with_total else -1
+
+    @staticmethod
+    def _iter_file(path: str) -> Iterator[dict]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    for key in ("created_at", "updated_at"):
+                        if row.get(key):
+                            row[key] = datetime.fromisoformat(row[key])
+                    yield row
+            except EOFError:
+                # 归档任务正在追加的最后一段还不完整，下次查询时再读
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "retention_days": self.retention_days,
+            "archive_dir": self.archive_dir,
+            "archived": self.archived,
+        }
+
+
+audit_log_archiver = AuditLogArchiver(
+    retention_days=getattr(settings, "AUDIT_LOG_RETENTION_DAYS", 0),
+    archive_dir=getattr(settings, "AUDIT_LOG_ARCHIVE_DIR", None),
+    interval=getattr(settings, "AUDIT_LOG_ARCHIVE_INTERVAL", 3600),
+    max_months=getattr(settings, "AUDIT_LOG_ARCHIVE_MAX_MONTHS", 12),
+)
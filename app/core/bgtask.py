@@ -1,31 +1,100 @@
-from starlette.background import BackgroundTasks
+import asyncio
+import contextvars
+import time
+from typing import Callable, Optional
 
-from .ctx import CTX_BG_TASKS
+from starlette.concurrency import run_in_threadpool
+
+from app.log import logger
+from app.settings import settings
 
 
 class BgTasks:
-    """后台任务统一管理"""
+    """
+    后台任务统一管理
+    lifespan 中启动常驻 worker 池，add_task 只负责入队，不再为每个请求创建 BackgroundTasks
+    """
+
+    concurrency: int = getattr(settings, "BG_TASK_CONCURRENCY", 4)
+    max_size: int = getattr(settings, "BG_TASK_QUEUE_SIZE", 1000)
+    shutdown_timeout: float = getattr(settings, "BG_TASK_SHUTDOWN_TIMEOUT", 10)
+
+    _queue: Optional[asyncio.Queue] = None
+    _workers: list[asyncio.Task] = []
+    running = 0
+    completed = 0
+    failed = 0
+    max_depth = 0
+
+    @classmethod
+    async def start(cls):
+        """启动 worker 池"""
+        if cls._queue is not None:
+            return
+        cls._queue = asyncio.Queue(maxsize=cls.max_size)
+        cls._workers = [asyncio.create_task(cls._worker()) for _ in range(cls.concurrency)]
+
+    @classmethod
+    async def stop(cls):
+        """等待队列中的任务执行完毕（最多 shutdown_timeout 秒），然后停止 worker"""
+        if cls._queue is None:
+            return
+        try:
+            await asyncio.wait_for(cls._queue.join(), cls.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"BgTasks shutdown timeout, {cls._queue.qsize()} tasks discarded")
+        for worker in cls._workers:
+            worker.cancel()
+        await asyncio.gather(*cls._workers, return_exceptions=True)
+        cls._queue = None
+        cls._workers = []
 
     @classmethod
-    async def init_bg_tasks_obj(cls):
-        """实例化后台任务，并设置到上下文"""
-        bg_tasks = BackgroundTasks()
-        CTX_BG_TASKS.set(bg_tasks)
+    async def add_task(cls, func: Callable, *args, **kwargs):
+        """添加后台任务，队列已满时等待空位"""
+        ctx = contextvars.copy_context()
+        if cls._queue is None:
+            # worker 池未启动（如未经过lifespan）时直接执行
+            await cls._execute(ctx, func, args, kwargs)
+            return
+        await cls._queue.put((ctx, func, args, kwargs))
+        cls.max_depth = max(cls.max_depth, cls._queue.qsize())
 
     @classmethod
-    async def get_bg_tasks_obj(cls):
-        """从上下文中获取后台任务实例"""
-        return CTX_BG_TASKS.get()
+    async def _worker(cls):
+        while True:
+            ctx, func, args, kwargs = await cls._queue.get()
+            try:
+                await cls._execute(ctx, func, args, kwargs)
+            finally:
+                cls._queue.task_done()
 
     @classmethod
-    async def add_task(cls, func, *args, **kwargs):
-        """添加后台任务"""
-        bg_tasks = await cls.get_bg_tasks_obj()
-        bg_tasks.add_task(func, *args, **kwargs)
+    async def _execute(cls, ctx: contextvars.Context, func: Callable, args: tuple, kwargs: dict):
+        """在提交任务时的上下文中执行，记录耗时和失败信息"""
+        name = getattr(func, "__qualname__", repr(func))
+        start_time = time.perf_counter()
+        cls.running += 1
+        try:
+            if asyncio.iscoroutinefunction(func):
+                await asyncio.create_task(func(*args, **kwargs), context=ctx)
+            else:
+                await run_in_threadpool(ctx.run, func, *args, **kwargs)
+            cls.completed += 1
+            logger.debug(f"BgTask {name} finished in {(time.perf_counter() - start_time) * 1000:.1f}ms")
+        except Exception as e:
+            cls.failed += 1
+            logger.error(f"BgTask {name} failed after {(time.perf_counter() - start_time) * 1000:.1f}ms: {repr(e)}")
+        finally:
+            cls.running -= 1
 
     @classmethod
-    async def execute_tasks(cls):
-        """执行后台任务，一般是请求结果返回之后执行"""
-        bg_tasks = await cls.get_bg_tasks_obj()
-        if bg_tasks.tasks:
-            await bg_tasks()
+    def stats(cls) -> dict:
+        return {
+            "concurrency": cls.concurrency,
+            "depth": cls._queue.qsize() if cls._queue is not None else 0,
+            "max_depth": cls.max_depth,
+            "running": cls.running,
+            "completed": cls.completed,
+            "failed": cls.failed,
+        }
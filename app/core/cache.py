@@ -0,0 +1,242 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+import orjson
+from tortoise.models import Model
+
+from app.models.admin import Role, User
+from app.settings import settings
+
+
+class PermissionIndex:
+    """
+    角色API权限索引：role_id -> frozenset((method, path))
+    进程内缓存，启动时构建，角色/API数据变更时按版本号失效
+    """
+
+    def __init__(self) -> None:
+        self._apis: dict[int, frozenset[tuple[str, str]]] = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def build(self) -> None:
+        """全量构建索引"""
+        version = self.version
+        roles = await Role.all().prefetch_related("apis")
+        apis = {role.id: frozenset((str(api.method), api.path) for api in role.apis) for role in roles}
+        # 构建期间发生过失效则放弃本次结果，避免写入过期数据
+        if version == self.version:
+            self._apis = apis
+
+    async def _load(self, role_id: int) -> frozenset[tuple[str, str]]:
+        version = self.version
+        role = await Role.filter(id=role_id).prefetch_related("apis").first()
+        apis = frozenset((str(api.method), api.path) for api in role.apis) if role else frozenset()
+        if version == self.version:
+            self._apis[role_id] = apis
+        return apis
+
+    async def get_apis(self, role_id: int) -> frozenset[tuple[str, str]]:
+        apis = self._apis.get(role_id)
+        if apis is not None:
+            self.hits += 1
+            return apis
+        self.misses += 1
+        return await self._load(role_id)
+
+    async def has_permission(self, role_ids: Iterable[int], method: str, path: str) -> bool:
+        for role_id in role_ids:
+            if (method, path) in await self.get_apis(role_id):
+                return True
+        return False
+
+    def invalidate(self, role_id: int | None = None) -> None:
+        """指定role_id时只失效该角色，否则清空整个索引"""
+        self.version += 1
+        if role_id is None:
+            self._apis = {}
+        else:
+            self._apis.pop(role_id, None)
+
+    def stats(self) -> dict:
+        return {"version": self.version, "size": len(self._apis), "hits": self.hits, "misses": self.misses}
+
+
+permission_index = PermissionIndex()
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    DependAuth 返回的已认证用户，只包含鉴权需要的字段，不是 User 模型实例
+    不能调用模型方法或作为 ORM 关联传入；需要完整用户数据时按 id（或 CTX_USER_ID）重新查询 User
+    """
+
+    id: int
+    username: str
+    is_superuser: bool
+    is_active: bool
+    role_ids: tuple[int, ...]
+
+
+class UserCache:
+    """
+    已认证用户快照缓存，带TTL和版本号，用户数据变更时失效
+    容量和过期时间可通过 USER_CACHE_MAX_ENTRIES / USER_CACHE_TTL 配置
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._users: OrderedDict[int, tuple[float, UserSnapshot]] = OrderedDict()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def _load(self, user_id: int) -> Optional[UserSnapshot]:
+        version = self.version
+        user = await User.filter(id=user_id).prefetch_related("roles").first()
+        if not user:
+            return None
+        snapshot = UserSnapshot(
+            id=user.id,
+            username=user.username,
+            is_superuser=user.is_superuser,
+            is_active=user.is_active,
+            role_ids=tuple(role.id for role in user.roles),
+        )
+        if version == self.version:
+            self._users[user_id] = (time.monotonic() + self.ttl, snapshot)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+        return snapshot
+
+    async def get(self, user_id: int) -> Optional[UserSnapshot]:
+        item = self._users.get(user_id)
+        if item is not None and item[0] > time.monotonic():
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return item[1]
+        self.misses += 1
+        return await self._load(user_id)
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        """指定user_id时只失效该用户，否则清空整个缓存"""
+        self.version += 1
+        if user_id is None:
+            self._users.clear()
+        else:
+            self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {"version": self.version, "size": len(self._users), "hits": self.hits, "misses": self.misses}
+
+
+user_cache = UserCache(
+    max_entries=getattr(settings, "USER_CACHE_MAX_ENTRIES", 1024),
+    ttl=getattr(settings, "USER_CACHE_TTL", 60),
+)
+
+
+class ReferenceCache:
+    """
+    参考数据（菜单、API、角色、部门等）的读穿透缓存
+    每个模型维护一个代数，写入时代数+1；缓存项记录加载时依赖模型的代数，读取时代数不一致即视为失效
+    按 LRU 淘汰，总条数和估算内存（序列化后的字节数）超过上限时淘汰最久未使用的缓存项
+    缓存值会被多个请求共享，调用方不能修改
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._generations: dict[str, int] = {}
+        # (依赖模型名, key) -> (依赖模型代数, 值, 字节数)
+        self._entries: OrderedDict[tuple, tuple[tuple[int, ...], Any, int]] = OrderedDict()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def _model_stats(self, name: str) -> dict[str, int]:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+        return stats
+
+    def _snapshot(self, names: tuple[str, ...]) -> tuple[int, ...]:
+        return tuple(self._generations.get(name, 0) for name in names)
+
+    async def get_or_load(
+        self, models: Iterable[type[Model]], key: Hashable, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        读取缓存，未命中或已失效时调用 loader 加载
+        models 为结果依赖的模型，第一个模型作为统计归属；其中任一模型发生写入都会使该缓存项失效
+        """
+        names = tuple(model.__name__ for model in models)
+        stats = self._model_stats(names[0])
+        entry_key = (names, key)
+        entry = self._entries.get(entry_key)
+        generations = self._snapshot(names)
+        if entry is not None and entry[0] == generations:
+            self._entries.move_to_end(entry_key)
+            stats["hits"] += 1
+            return entry[1]
+        stats["misses"] += 1
+        value = await loader()
+        # 加载期间发生过写入则不缓存本次结果，避免写入过期数据
+        if self._snapshot(names) == generations:
+            self._set(entry_key, generations, value)
+        return value
+
+    def _set(self, entry_key: tuple, generations: tuple[int, ...], value: Any) -> None:
+        size = len(orjson.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        self._pop(entry_key)
+        self._entries[entry_key] = (generations, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            evicted_key = next(iter(self._entries))
+            self._pop(evicted_key)
+            self._model_stats(evicted_key[0][0])["evictions"] += 1
+
+    def _pop(self, entry_key: tuple) -> None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def invalidate(self, model: type[Model]) -> None:
+        """模型数据变更，使依赖该模型的缓存项全部失效"""
+        name = model.__name__
+        self._generations[name] = self._generations.get(name, 0) + 1
+        self._model_stats(name)["invalidations"] += 1
+        for entry_key in [entry_key for entry_key in self._entries if name in entry_key[0]]:
+            self._pop(entry_key)
+
+    def stats(self) -> dict:
+        entries: dict[str, int] = {}
+        sizes: dict[str, int] = {}
+        for (names, _), (_, _, size) in self._entries.items():
+            entries[names[0]] = entries.get(names[0], 0) + 1
+            sizes[names[0]] = sizes.get(names[0], 0) + size
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "models": {
+                name: {
+                    **stats,
+                    "generation": self._generations.get(name, 0),
+                    "entries": entries.get(name, 0),
+                    "bytes": sizes.get(name, 0),
+                }
+                for name, stats in self._stats.items()
+            },
+        }
+
+
+reference_cache = ReferenceCache(
+    max_entries=getattr(settings, "REFERENCE_CACHE_MAX_ENTRIES", 1024),
+    max_bytes=getattr(settings, "REFERENCE_CACHE_MAX_BYTES", 16 * 1024 * 1024),
+)
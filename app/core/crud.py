@@ -1,29 +1,274 @@
-from typing import Any, Dict, Generic, List, NewType, Tuple, Type, TypeVar, Union
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    NewType,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
+from fastapi.exceptions import HTTPException
 from pydantic import BaseModel
 from tortoise.expressions import Q
 from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+from app.core.cache import reference_cache
+from app.core.search import NgramIndex
+from app.core.transactions import on_commit
 
 Total = NewType("Total", int)
 ModelType = TypeVar("ModelType", bound=Model)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+COUNT_CACHE_MAX_ENTRIES = 256
+# 按模型分组的总数缓存 {model: {count_sql: (expire_at, total)}}，经 CRUDBase 写入时整组失效
+_count_cache: Dict[Type[Model], Dict[str, Tuple[float, int]]] = {}
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """把 (created_at, id) 编码为不透明游标"""
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的游标")
+
+
+def keyset_filter(cursor: Optional[str]) -> Q:
+    """
+    按 (created_at, id) 倒序翻页时，取游标之后的记录
+    单独的 created_at <= 游标 作为索引范围上界，只有 OR 条件时 SQLite 会退化为扫描整个索引
+    """
+    if not cursor:
+        return Q()
+    created_at, id = decode_cursor(cursor)
+    return Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=id))
+
+
+# 日期前缀格式及对应的区间长度，None 表示按月/按年
+_DATE_PREFIX_FORMATS = (
+    ("%Y-%m-%d %H:%M:%S", timedelta(seconds=1)),
+    ("%Y-%m-%d %H:%M", timedelta(minutes=1)),
+    ("%Y-%m-%d %H", timedelta(hours=1)),
+    ("%Y-%m-%d", timedelta(days=1)),
+    ("%Y-%m", None),
+    ("%Y", None),
+)
+
+
+def date_prefix_range(value: str) -> Optional[Tuple[datetime, datetime]]:
+    """把日期前缀（年、年-月、年-月-日、精确到时/分/秒）转换为 [start, end) 区间，无法解析时返回None"""
+    value = value.strip().replace("T", " ")
+    for fmt, step in _DATE_PREFIX_FORMATS:
+        try:
+            start = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y":
+            return start, start.replace(year=start.year + 1)
+        if fmt == "%Y-%m":
+            return start, (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return start, start + step
+    return None
+
+
+def date_range_filter(
+    field: str,
+    prefix: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Q:
+    """
+    日期范围过滤，生成可以使用索引的 >= / < 条件，代替对时间字段的 __contains（LIKE '%...%'）
+    prefix 兼容原有的日期参数，按 date_prefix_range 转为区间，无法解析时仍使用 __contains
+    date_from 包含，date_to 不包含
+    """
+    q = Q()
+    if prefix:
+        date_range = date_prefix_range(prefix)
+        if date_range is None:
+            q &= Q(**{f"{field}__contains": prefix})
+        else:
+            q &= Q(**{f"{field}__gte": date_range[0], f"{field}__lt": date_range[1]})
+    if date_from:
+        q &= Q(**{f"{field}__gte": date_from})
+    if date_to:
+        q &= Q(**{f"{field}__lt": date_to})
+    return q
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+    def __init__(self, model: Type[ModelType], search_index: Optional[NgramIndex] = None):
         self.model = model
+        # 设置后增删改时同步子串搜索索引，contains_filter 可通过索引查询
+        self.search_index = search_index
 
-    async def get(self, id: int) -> ModelType:
+    async def get(self, id: int, fields: Optional[Sequence[str]] = None) -> ModelType:
+        """fields 不为空时只查询指定字段，返回格式化后的字典"""
+        if fields:
+            return self.model.serializer()(await self.model.get(id=id).values(*fields))
         return await self.model.get(id=id)
 
-    async def list(self, page: int, page_size: int, search: Q = Q(), order: list = []) -> Tuple[Total, List[ModelType]]:
-        if order is None:
-            order = ["-created_at"]  # 默认按 created_at 降序排序
-        elif not any("created_at" in field for field in order):
-            order.append("-created_at")  # 如果 order 里没有 created_at，则追加默认排序
+    async def list(
+        self,
+        page: int,
+        page_size: int,
+        search: Q = Q(),
+        order: list = [],
+        with_total: bool = True,
+        count_cache_ttl: float = 0,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[Total, List[ModelType]]:
+        """
+        分页查询，总数和当前页并发查询
+        with_total=False 时不统计总数，返回 -1；count_cache_ttl > 0 时按查询条件缓存总数
+        cursor 不为 None 时使用游标翻页：按 (created_at, id) 倒序，忽略 page 和 order，空字符串表示第一页
+        fields 不为空时只查询指定字段，不实例化模型，返回格式化后的字典
+        """
         query = self.model.filter(search)
-        return await query.count(), await query.offset((page - 1) * page_size).limit(page_size).order_by(*order)
+        if cursor is not None:
+            page_query = query.filter(keyset_filter(cursor)).limit(page_size).order_by("-created_at", "-id")
+        else:
+            order = [*order]
+            if not any("created_at" in field for field in order):
+                order.append("-created_at")  # 如果 order 里没有 created_at，则追加默认排序
+            page_query = query.offset((page - 1) * page_size).limit(page_size).order_by(*order)
+        if fields:
+            # 游标翻页时额外取出原始的 id 和 created_at，由 next_cursor 生成游标后移除
+            cursor_fields = {"_cursor_id": "id", "_cursor_created_at": "created_at"} if cursor is not None else {}
+            page_query = page_query.values(*fields, **cursor_fields)
+        if not with_total:
+            total, objs = Total(-1), await page_query
+        else:
+            total, objs = await asyncio.gather(self.count(query, count_cache_ttl), page_query)
+        if fields:
+            objs = self.model.serializer().many(objs)
+        return total, objs
+
+    def next_cursor(self, objs: List[ModelType], page_size: int) -> Optional[str]:
+        """游标翻页时下一页的游标，当前页不满时返回None；按 fields 查询的字典结果会移除辅助字段"""
+        position = None
+        for obj in objs:
+            if isinstance(obj, dict):
+                position = obj.pop("_cursor_created_at", None), obj.pop("_cursor_id", None)
+        if len(objs) < page_size or not objs:
+            return None
+        if position is None:
+            position = objs[-1].created_at, objs[-1].id
+        return encode_cursor(*position)
+
+    async def iter_values(
+        self, search: Q = Q(), fields: Sequence[str] = (), batch_size: int = 1000
+    ) -> AsyncIterator[List[dict]]:
+        """
+        按 id 分批遍历全部匹配记录，每批为格式化后的字典列表，用于导出等全量读取
+        使用 id 键集翻页，每批一次查询，内存占用只与 batch_size 有关
+        """
+        fields = tuple(fields) or tuple(self.model._meta.fields_db_projection)
+        last_id = 0
+        while True:
+            rows = (
+                await self.model.filter(search, id__gt=last_id)
+                .order_by("id")
+                .limit(batch_size)
+                .values(*fields, _batch_id="id")
+            )
+            if not rows:
+                return
+            last_id = rows[-1].pop("_batch_id")
+            for row in rows:
+                row.pop("_batch_id", None)
+            yield self.model.serializer().many(rows)
+
+    def serialize(self, objs: List[Union[ModelType, dict]], exclude: Sequence[str] = ()) -> List[dict]:
+        """同步序列化列表结果，代替逐条 await obj.to_dict()"""
+        return self.model.serializer(exclude).many(objs)
+
+    async def serialize_related(
+        self,
+        objs: List[ModelType],
+        exclude: Sequence[str] = (),
+        m2m: Sequence[str] = (),
+        refs: Optional[Dict[str, Tuple[str, Type[Model]]]] = None,
+    ) -> List[dict]:
+        """
+        序列化列表结果并批量加载关联数据，查询次数与行数无关
+        m2m: 多对多字段，整页一次 IN 查询
+        refs: {ID字段: (输出字段, 关联模型)}，如 {"dept_id": ("dept", Dept)}，整页一次 IN 查询，关联不存在时为 {}
+        """
+        if m2m:
+            await self.model.fetch_for_list(objs, *m2m)
+        data = self.serialize(objs, exclude)
+        for field in m2m:
+            related = self.model._meta.fields_map[field].related_model.serializer(exclude)
+            for item, obj in zip(data, objs):
+                item[field] = related.many(getattr(obj, field).related_objects)
+        for key, (name, model) in (refs or {}).items():
+            ids = {item[key] for item in data if item.get(key)}
+            serializer = model.serializer()
+            related = {obj.id: serializer(obj) for obj in await model.filter(id__in=ids)} if ids else {}
+            for item in data:
+                item[name] = related.get(item.pop(key, None), {})
+        return data
+
+    async def contains_filter(self, field: str, term: str) -> Q:
+        """子串搜索条件，字段有搜索索引时先从索引取候选ID，否则为 __contains"""
+        if self.search_index is not None and field in self.search_index.fields:
+            return await self.search_index.contains(field, term)
+        return Q(**{f"{field}__contains": term})
+
+    async def count(self, query: QuerySet, cache_ttl: float = 0) -> Total:
+        if cache_ttl <= 0:
+            return await query.count()
+        count_query = query.count()
+        # 缓存键需内联参数，否则不同过滤值的查询会生成相同的 SQL
+        key = count_query.sql(params_inline=True)
+        cache = _count_cache.setdefault(self.model, {})
+        item = cache.get(key)
+        if item is not None and item[0] > time.monotonic():
+            return item[1]
+        total = await count_query
+        if len(cache) >= COUNT_CACHE_MAX_ENTRIES:
+            cache.pop(next(iter(cache)))
+        cache[key] = (time.monotonic() + cache_ttl, total)
+        return total
+
+    async def cached(
+        self, key: Hashable, loader: Callable[[], Awaitable[Any]], deps: Sequence[Type[Model]] = ()
+    ) -> Any:
+        """读穿透缓存，本模型或 deps 中的模型经 invalidate_cache 失效后重新加载"""
+        return await reference_cache.get_or_load((self.model, *deps), key, loader)
+
+    def invalidate_cache(self) -> None:
+        """本模型数据变更后调用，使总数缓存和参考数据缓存失效；在 atomic 事务中时等提交后再失效"""
+        on_commit(self._invalidate_cache)
+
+    def _invalidate_cache(self) -> None:
+        _count_cache.pop(self.model, None)
+        reference_cache.invalidate(self.model)
 
     async def create(self, obj_in: CreateSchemaType) -> ModelType:
         if isinstance(obj_in, Dict):
@@ -32,6 +277,9 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             obj_dict = obj_in.model_dump()
         obj = self.model(**obj_dict)
         await obj.save()
+        if self.search_index is not None:
+            await self.search_index.index(obj, created=True)
+        self.invalidate_cache()
         return obj
 
     async def update(self, id: int, obj_in: Union[UpdateSchemaType, Dict[str, Any]]) -> ModelType:
@@ -42,8 +290,14 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj = await self.get(id=id)
         obj = obj.update_from_dict(obj_dict)
         await obj.save()
+        if self.search_index is not None:
+            await self.search_index.index(obj)
+        self.invalidate_cache()
         return obj
 
     async def remove(self, id: int) -> None:
         obj = await self.get(id=id)
         await obj.delete()
+        if self.search_index is not None:
+            await self.search_index.remove(id)
+        self.invalidate_cache()
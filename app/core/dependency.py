@@ -3,14 +3,24 @@ from typing import Optional
 import jwt
 from fastapi import Depends, Header, HTTPException, Request
 
+from app.core.cache import UserSnapshot, permission_index, user_cache
 from app.core.ctx import CTX_USER_ID
-from app.models import Role, User
+from app.models import User
 from app.settings import settings
 
 
 class AuthControl:
     @classmethod
-    async def is_authed(cls, token: str = Header(..., description="token验证")) -> Optional["User"]:
+    async def is_authed(
+        cls, request: Request, token: str = Header(..., description="token验证")
+    ) -> Optional[UserSnapshot]:
+        user = await cls.get_user_by_token(token)
+        # 记录到请求状态，供审计日志中间件复用，避免重复认证
+        request.state.user = user
+        return user
+
+    @classmethod
+    async def get_user_by_token(cls, token: str) -> Optional[UserSnapshot]:
         try:
             if token == "dev":
                 user = await User.filter().first()
@@ -18,7 +28,7 @@ class AuthControl:
             else:
                 decode_data = jwt.decode(token, settings.SECRET_KEY, algorithms=settings.JWT_ALGORITHM)
                 user_id = decode_data.get("user_id")
-            user = await User.filter(id=user_id).first()
+            user = await user_cache.get(int(user_id))
             if not user:
                 raise HTTPException(status_code=401, detail="Authentication failed")
             CTX_USER_ID.set(int(user_id))
@@ -33,19 +43,16 @@ class AuthControl:
 
 class PermissionControl:
     @classmethod
-    async def has_permission(cls, request: Request, current_user: User = Depends(AuthControl.is_authed)) -> None:
+    async def has_permission(
+        cls, request: Request, current_user: UserSnapshot = Depends(AuthControl.is_authed)
+    ) -> None:
         if current_user.is_superuser:
             return
         method = request.method
         path = request.url.path
-        roles: list[Role] = await current_user.roles
-        if not roles:
+        if not current_user.role_ids:
             raise HTTPException(status_code=403, detail="The user is not bound to a role")
-        apis = [await role.apis for role in roles]
-        permission_apis = list(set((api.method, api.path) for api in sum(apis, [])))
-        # path = "/api/v1/auth/userinfo"
-        # method = "GET"
-        if (method, path) not in permission_apis:
+        if not await permission_index.has_permission(current_user.role_ids, method, path):
             raise HTTPException(status_code=403, detail=f"Permission denied method:{method} path:{path}")
 
 
@@ -10,6 +10,8 @@ from app.api import api_router
 from app.controllers.api import api_controller
 from app.controllers.user import UserCreate, user_controller
 from app.controllers.dept import dept_controller, DeptCreate
+from app.controllers.total_rollup import total_record_rollup_controller
+from app.core.cache import permission_index
 from app.core.exceptions import (
     DoesNotExist,
     DoesNotExistHandle,
@@ -22,12 +24,14 @@ from app.core.exceptions import (
     ResponseValidationError,
     ResponseValidationHandle,
 )
+from app.core.routing import RouteIndex
+from app.core.search import search_indexes
 from app.log import logger
 from app.models.admin import Api, Menu, Role
 from app.schemas.menus import MenuType
 from app.settings.config import settings
 
-from .middlewares import BackGroundTaskMiddleware, HttpAuditLogMiddleware
+from .middlewares import HttpAuditLogMiddleware
 
 
 def make_middlewares():
@@ -39,7 +43,6 @@ def make_middlewares():
             allow_methods=settings.CORS_ALLOW_METHODS,
             allow_headers=settings.CORS_ALLOW_HEADERS,
         ),
-        Middleware(BackGroundTaskMiddleware),
         Middleware(
             HttpAuditLogMiddleware,
             methods=["GET", "POST", "PUT", "DELETE"],
@@ -63,6 +66,7 @@ def register_exceptions(app: FastAPI):
 
 def register_routers(app: FastAPI, prefix: str = "/api"):
     app.include_router(api_router, prefix=prefix)
+    app.state.route_index = RouteIndex(app.routes)
 
 
 async def init_superuser():
@@ -400,3 +404,7 @@ async def init_data():
     await init_menus()
     await init_apis()
     await init_roles()
+    await permission_index.build()
+    for search_index in search_indexes.values():
+        await search_index.ensure_built()
+    await total_record_rollup_controller.ensure_built()
@@ -0,0 +1,192 @@
+import asyncio
+import json
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from tortoise import timezone
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F
+
+from app.log import logger
+from app.models.admin import Job
+from app.models.enums import JobStatus
+from app.settings import settings
+
+JobHandler = Callable[[Any], Awaitable[Any]]
+
+
+class JobQueue:
+    """
+    基于数据库的持久化任务队列，重启后未完成的任务会继续执行
+    - 按 priority 降序、run_at 升序领取任务
+    - 领取时用 attempts 做乐观锁，多个消费者（或多个进程）不会重复领取
+    - 领取后 run_at 推迟 visibility_timeout 秒，执行期间定时心跳续期；消费者异常退出时任务超时后可被重新领取
+    - 状态更新都带上领取时的 attempts，任务被重新领取后旧的执行结果不会覆盖新的状态
+    - 失败按指数退避重试，超过 max_attempts 后标记为失败
+    """
+
+    def __init__(self, consumers: int, poll_interval: float, visibility_timeout: float, retry_backoff: float) -> None:
+        self.consumers = consumers
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.retry_backoff = retry_backoff
+        self.handlers: dict[str, JobHandler] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def register(self, name: str) -> Callable[[JobHandler], JobHandler]:
+        """注册任务处理函数，处理函数接收 payload，返回值作为任务结果保存"""
+
+        def decorator(func: JobHandler) -> JobHandler:
+            self.handlers[name] = func
+            return func
+
+        return decorator
+
+    async def submit(
+        self,
+        name: str,
+        payload: Any = None,
+        priority: int = 0,
+        max_attempts: int = 3,
+        idempotency_key: Optional[str] = None,
+        delay: float = 0,
+        user_id: Optional[int] = None,
+        retry_failed: bool = False,
+    ) -> Job:
+        """
+        提交任务，idempotency_key 相同的任务只会创建一次；user_id 为提交任务的用户，只有本人和超级用户能查看
+        retry_failed=True 时相同幂等键的任务已失败则重新执行，再给 max_attempts 次机会
+        """
+        if name not in self.handlers:
+            raise ValueError(f"Job handler not registered: {name}")
+        if idempotency_key:
+            job = await Job.filter(idempotency_key=idempotency_key).first()
+            if job and retry_failed and job.status == JobStatus.FAILED:
+                # attempts 不清零，旧的执行者按 attempts 做的状态更新仍然无效；带状态条件，并发提交时只重置一次
+                await Job.filter(id=job.id, status=JobStatus.FAILED).update(
+                    status=JobStatus.PENDING,
+                    max_attempts=F("attempts") + max_attempts,
+                    run_at=timezone.now() + timedelta(seconds=delay),
+                )
+                await job.refresh_from_db()
+            if job:
+                return job
+        try:
+            return await Job.create(
+                name=name,
+                payload=payload,
+                priority=priority,
+                max_attempts=max_attempts,
+                idempotency_key=idempotency_key,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                user_id=user_id,
+            )
+        except IntegrityError:
+            # 并发提交相同幂等键
+            return await Job.get(idempotency_key=idempotency_key)
+
+    async def claim(self) -> Optional[Job]:
+        """领取一个可执行的任务，没有时返回None"""
+        now = timezone.now()
+        candidates = (
+            await Job.filter(status__in=[JobStatus.PENDING, JobStatus.RUNNING], run_at__lte=now)
+            .order_by("-priority", "run_at", "id")
+            .limit(self.consumers)
+        )
+        for job in candidates:
+            claimed = await Job.filter(id=job.id, attempts=job.attempts, status=job.status).update(
+                status=JobStatus.RUNNING,
+                attempts=F("attempts") + 1,
+                run_at=now + timedelta(seconds=self.visibility_timeout),
+            )
+            if not claimed:
+                continue
+            if job.attempts >= job.max_attempts:
+                # 最后一次执行超时未完成
+                await Job.filter(id=job.id, attempts=job.attempts + 1).update(
+                    status=JobStatus.FAILED, error="visibility timeout exceeded"
+                )
+                continue
+            await job.refresh_from_db()
+            return job
+        return None
+
+    def _owned(self, job: Job):
+        """本次领取仍然有效时才能更新的任务行"""
+        return Job.filter(id=job.id, attempts=job.attempts, status=JobStatus.RUNNING)
+
+    async def _heartbeat(self, job: Job) -> None:
+        """执行期间每 1/3 个可见性超时续期一次，长任务不会因超时被重复领取"""
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            renewed = await self._owned(job).update(run_at=timezone.now() + timedelta(seconds=self.visibility_timeout))
+            if not renewed:
+                logger.warning(f"Job {job.id} {job.name} lost its claim (attempt {job.attempts})")
+                return
+
+    async def _execute(self, handler: JobHandler, job: Job) -> Any:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            return await handler(job.payload)
+        finally:
+            heartbeat.cancel()
+
+    async def process(self, job: Job) -> None:
+        handler = self.handlers.get(job.name)
+        try:
+            if handler is None:
+                raise ValueError(f"Job handler not registered: {job.name}")
+            result = await self._execute(handler, job)
+        except Exception as e:
+            logger.error(f"Job {job.id} {job.name} failed (attempt {job.attempts}/{job.max_attempts}): {repr(e)}")
+            if job.attempts >= job.max_attempts:
+                await self._owned(job).update(status=JobStatus.FAILED, error=repr(e))
+            else:
+                backoff = self.retry_backoff * 2 ** (job.attempts - 1)
+                await self._owned(job).update(
+                    status=JobStatus.PENDING, error=repr(e), run_at=timezone.now() + timedelta(seconds=backoff)
+                )
+            return
+        if isinstance(result, str):
+            # JSONField 会把字符串当作已序列化的 JSON 文本
+            result = json.dumps(result)
+        if not await self._owned(job).update(status=JobStatus.SUCCEEDED, result=result, error=None):
+            logger.warning(f"Job {job.id} {job.name} finished after its claim expired, result discarded")
+
+    async def run_once(self) -> bool:
+        """领取并执行一个任务，没有可执行任务时返回False"""
+        job = await self.claim()
+        if job is None:
+            return False
+        await self.process(job)
+        return True
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                if not await self.run_once():
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"JobQueue consumer error: {repr(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.consumers)]
+
+    async def stop(self) -> None:
+        """停止消费者，执行中的任务在可见性超时后会被重新领取"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+job_queue = JobQueue(
+    consumers=getattr(settings, "JOB_CONSUMERS", 2),
+    poll_interval=getattr(settings, "JOB_POLL_INTERVAL", 1.0),
+    visibility_timeout=getattr(settings, "JOB_VISIBILITY_TIMEOUT", 300),
+    retry_backoff=getattr(settings, "JOB_RETRY_BACKOFF", 5),
+)
@@ -1,19 +1,17 @@
 import json
-import re
-from datetime import datetime
-from typing import Any, AsyncGenerator
-
-from fastapi import FastAPI
-from fastapi.responses import Response
-from fastapi.routing import APIRoute
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+import time
+from typing import Any, Optional
+from urllib.parse import parse_qsl
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
 from starlette.requests import Request
-from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.audit import AuditLevel, AuditPolicy, AuditPolicyMatcher, audit_log_writer
+from app.core.cache import UserSnapshot
 from app.core.dependency import AuthControl
-from app.models.admin import AuditLog, User
-
-from .bgtask import BgTasks
+from app.core.routing import RouteIndex
 
 
 class SimpleBaseMiddleware:
@@ -38,108 +36,145 @@ class SimpleBaseMiddleware:
         return None
 
 
-class BackGroundTaskMiddleware(SimpleBaseMiddleware):
-    async def before_request(self, request):
-        await BgTasks.init_bg_tasks_obj()
-
-    async def after_request(self, request):
-        await BgTasks.execute_tasks()
-
+class HttpAuditLogMiddleware:
+    """
+    审计日志中间件（纯ASGI实现）
+    请求体和响应体在传输过程中旁路截取，只保留不超过 max_body_size 的前缀用于记录
+    """
 
-class HttpAuditLogMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, methods: list[str], exclude_paths: list[str]):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        methods: list[str],
+        exclude_paths: list[str],
+        policies: Optional[dict[str, AuditPolicy]] = None,
+    ) -> None:
+        self.app = app
         self.methods = methods
         self.exclude_paths = exclude_paths
+        self.policy_matcher = AuditPolicyMatcher(exclude_paths, policies or {})
         self.audit_log_paths = ["/api/v1/auditlog/list"]
-        self.max_body_size = 1024 * 1024  # 1MB 响应体大小限制
+        self.max_body_size = 1024 * 1024  # 1MB 请求体/响应体记录大小限制
+
+    def get_policy(self, scope: Scope) -> AuditPolicy:
+        route_index: RouteIndex = scope["app"].state.route_index
+        route_info = route_index.resolve(scope["method"], scope["path"])
+        route_policy = route_info.audit_policy if route_info else None
+        return self.policy_matcher.match(scope["method"], scope["path"], route_policy)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+        policy = self.get_policy(scope)
+        if policy.level == AuditLevel.OFF or not policy.sampled():
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        request_body = _BodyCapture(self.max_body_size, enabled=policy.level >= AuditLevel.ARGS)
+        response_body = _BodyCapture(self.max_body_size, enabled=policy.level >= AuditLevel.FULL)
+        response_start: dict = {}
+        form_fields = None
+        if request_body.enabled:
+            form_fields = _MultipartFields.from_headers(Headers(scope=scope), self.max_body_size)
+            # multipart 请求体边传输边解析，不再缓存原始内容（通常是文件）
+            request_body.enabled = form_fields is None
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.feed(message.get("body", b""))
+                if form_fields is not None:
+                    form_fields.feed(message.get("body", b""))
+            return message
 
-    async def get_request_args(self, request: Request) -> dict:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+                # 非JSON响应不截取响应体
+                response_body.enabled = response_body.enabled and _is_json(Headers(raw=message.get("headers", [])))
+            elif message["type"] == "http.response.body":
+                response_body.feed(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive_wrapper, send_wrapper)
+        process_time = int((time.perf_counter() - start_time) * 1000)
+
+        request = Request(scope)
+        data: dict = await self.get_request_log(request=request, status=response_start.get("status", 500))
+        data["response_time"] = process_time
+        if policy.level >= AuditLevel.ARGS:
+            data["request_args"] = self.get_request_args(request, request_body, form_fields)
+        if policy.level >= AuditLevel.FULL:
+            data["response_body"] = self.get_response_body(request, response_body)
+        await audit_log_writer.put(data)
+
+    def get_request_args(
+        self, request: Request, body: "_BodyCapture", form_fields: Optional["_MultipartFields"] = None
+    ) -> dict:
         args = {}
         # 获取查询参数
         for key, value in request.query_params.items():
             args[key] = value
 
+        # multipart 表单：文本字段记录值，文件字段记录文件名
+        if form_fields is not None:
+            args.update(form_fields.fields)
+
         # 获取请求体
-        if request.method in ["POST", "PUT", "PATCH"]:
+        raw = body.data
+        if raw and not body.truncated:
+            content_type = request.headers.get("content-type", "")
             try:
-                body = await request.json()
-                args.update(body)
-            except json.JSONDecodeError:
-                try:
-                    body = await request.form()
-                    args.update(body)
-                except Exception:
-                    pass
+                if _is_json(request.headers):
+                    parsed = json.loads(raw)
+                    if isinstance(parsed, dict):
+                        args.update(parsed)
+                elif content_type.startswith("application/x-www-form-urlencoded"):
+                    args.update(parse_qsl(raw.decode("latin-1"), keep_blank_values=True))
+            except (ValueError, UnicodeDecodeError):
+                pass
 
         return args
 
-    async def get_response_body(self, request: Request, response: Response) -> Any:
-        # 检查Content-Length
-        content_length = response.headers.get("content-length")
-        if content_length and int(content_length) > self.max_body_size:
+    def get_response_body(self, request: Request, body: "_BodyCapture") -> Any:
+        if not body.enabled:
+            return None
+        if body.truncated:
             return {"code": 0, "msg": "Response too large to log", "data": None}
-
-        if hasattr(response, "body"):
-            body = response.body
-        else:
-            body_chunks = []
-            async for chunk in response.body_iterator:
-                if not isinstance(chunk, bytes):
-                    chunk = chunk.encode(response.charset)
-                body_chunks.append(chunk)
-
-            response.body_iterator = self._async_iter(body_chunks)
-            body = b"".join(body_chunks)
+        try:
+            data = json.loads(body.data)
+        except ValueError:
+            return None
 
         if any(request.url.path.startswith(path) for path in self.audit_log_paths):
-            try:
-                data = self.lenient_json(body)
-                # 只保留基本信息，去除详细的响应内容
-                if isinstance(data, dict):
-                    data.pop("response_body", None)
-                    if "data" in data and isinstance(data["data"], list):
-                        for item in data["data"]:
+            # 只保留基本信息，去除详细的响应内容
+            if isinstance(data, dict):
+                data.pop("response_body", None)
+                if "data" in data and isinstance(data["data"], list):
+                    for item in data["data"]:
+                        if isinstance(item, dict):
                             item.pop("response_body", None)
-                return data
-            except Exception:
-                return None
-
-        return self.lenient_json(body)
-
-    def lenient_json(self, v: Any) -> Any:
-        if isinstance(v, (str, bytes)):
-            try:
-                return json.loads(v)
-            except (ValueError, TypeError):
-                pass
-        return v
-
-    async def _async_iter(self, items: list[bytes]) -> AsyncGenerator[bytes, None]:
-        for item in items:
-            yield item
+        return data
 
-    async def get_request_log(self, request: Request, response: Response) -> dict:
+    async def get_request_log(self, request: Request, status: int) -> dict:
         """
-        根据request和response对象获取对应的日志记录数据
+        根据request和响应状态码获取对应的日志记录数据
         """
-        data: dict = {"path": request.url.path, "status": response.status_code, "method": request.method}
+        data: dict = {"path": request.url.path, "status": status, "method": request.method}
         # 路由信息
-        app: FastAPI = request.app
-        for route in app.routes:
-            if (
-                isinstance(route, APIRoute)
-                and route.path_regex.match(request.url.path)
-                and request.method in route.methods
-            ):
-                data["module"] = ",".join(route.tags)
-                data["summary"] = route.summary
+        route_index: RouteIndex = request.app.state.route_index
+        route_info = route_index.resolve(request.method, request.url.path, request.scope.get("endpoint"))
+        if route_info:
+            data["module"], data["summary"] = route_info.tags, route_info.summary
         # 获取用户信息
         try:
+            # 优先使用路由依赖已解析的用户，没有执行鉴权依赖时才根据token解析
+            user_obj: UserSnapshot | None = getattr(request.state, "user", None)
             token = request.headers.get("token")
-            user_obj = None
-            if token:
-                user_obj: User = await AuthControl.is_authed(token)
+            if user_obj is None and token:
+                user_obj = await AuthControl.get_user_by_token(token)
             data["user_id"] = user_obj.id if user_obj else 0
             data["username"] = user_obj.username if user_obj else ""
         except Exception:
@@ -147,29 +182,111 @@ class HttpAuditLogMiddleware(BaseHTTPMiddleware):
             data["username"] = ""
         return data
 
-    async def before_request(self, request: Request):
-        request_args = await self.get_request_args(request)
-        request.state.request_args = request_args
-
-    async def after_request(self, request: Request, response: Response, process_time: int):
-        if request.method in self.methods:
-            for path in self.exclude_paths:
-                if re.search(path, request.url.path, re.I) is not None:
-                    return
-            data: dict = await self.get_request_log(request=request, response=response)
-            data["response_time"] = process_time
-
-            data["request_args"] = request.state.request_args
-            data["response_body"] = await self.get_response_body(request, response)
-            await AuditLog.create(**data)
-
-        return response
-
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        start_time: datetime = datetime.now()
-        await self.before_request(request)
-        response = await call_next(request)
-        end_time: datetime = datetime.now()
-        process_time = int((end_time.timestamp() - start_time.timestamp()) * 1000)
-        await self.after_request(request, response, process_time)
-        return response
+
+class _BodyCapture:
+    """截取消息体前缀，超过上限后只记录截断标记"""
+
+    __slots__ = ("limit", "enabled", "truncated", "_chunks", "_size")
+
+    def __init__(self, limit: int, enabled: bool = True) -> None:
+        self.limit = limit
+        self.enabled = enabled
+        self.truncated = False
+        self._chunks: list[bytes] = []
+        self._size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        if not self.enabled or self.truncated or not chunk:
+            return
+        self._size += len(chunk)
+        if self._size > self.limit:
+            self.truncated = True
+            self._chunks.clear()
+        else:
+            self._chunks.append(chunk)
+
+    @property
+    def data(self) -> bytes:
+        return b"".join(self._chunks)
+
+
+class _MultipartFields:
+    """
+    流式解析 multipart 请求体，记录各部分的字段名：文本字段记录值，文件字段记录文件名
+    不缓存文件内容，请求体超过上限时也能记录全部字段名；文本值合计超过上限后不再记录
+    """
+
+    def __init__(self, boundary: bytes, limit: int) -> None:
+        self.limit = limit
+        self.fields: dict[str, Optional[str]] = {}
+        self._size = 0
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._name = ""
+        self._filename: Optional[str] = None
+        self._value = bytearray()
+        self._failed = False
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    @classmethod
+    def from_headers(cls, headers: Headers, limit: int) -> Optional["_MultipartFields"]:
+        """请求为 multipart/form-data 时返回解析器，否则返回None"""
+        content_type, params = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+            return None
+        return cls(params[b"boundary"], limit)
+
+    def feed(self, chunk: bytes) -> None:
+        if self._failed or not chunk:
+            return
+        try:
+            self._parser.write(chunk)
+        except Exception:
+            # 格式错误时保留已解析的字段
+            self._failed = True
+
+    def _on_part_begin(self) -> None:
+        self._name, self._filename = "", None
+        self._value.clear()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(bytes(self._header_value))
+            self._name = options.get(b"name", b"").decode("utf-8", "replace")
+            if b"filename" in options:
+                self._filename = options[b"filename"].decode("utf-8", "replace")
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._filename is None and self._size < self.limit:
+            chunk = data[start:end][: self.limit - self._size]
+            self._size += len(chunk)
+            self._value += chunk
+
+    def _on_part_end(self) -> None:
+        if self._filename is not None:
+            self.fields[self._name] = self._filename
+        else:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+
+
+def _is_json(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return content_type.startswith("application/json") or "+json" in content_type
@@ -0,0 +1,82 @@
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+
+from fastapi.routing import APIRoute
+from starlette.routing import BaseRoute
+
+
+class RouteInfo(NamedTuple):
+    tags: str
+    summary: Optional[str]
+    audit_policy: Any = None  # 路由通过 audit_policy 装饰器声明的审计策略
+
+
+class _Node:
+    __slots__ = ("children", "param", "info")
+
+    def __init__(self) -> None:
+        self.children: dict[str, "_Node"] = {}
+        self.param: Optional["_Node"] = None
+        self.info: Optional[RouteInfo] = None
+
+
+class RouteIndex:
+    """
+    路由索引，启动时构建一次，按 method + path 解析路由的 tags/summary/审计策略
+    优先使用 scope 中已匹配的 endpoint；否则静态路径查字典，带参数路径按方法分区的前缀树匹配
+    """
+
+    def __init__(self, routes: Iterable[BaseRoute]) -> None:
+        self._endpoints: dict[tuple[Callable, str], RouteInfo] = {}
+        self._static: dict[tuple[str, str], RouteInfo] = {}
+        self._trie: dict[str, _Node] = {}
+        self._regex: dict[str, list] = {}
+        for route in routes:
+            if not isinstance(route, APIRoute):
+                continue
+            info = RouteInfo(",".join(route.tags), route.summary, getattr(route.endpoint, "__audit_policy__", None))
+            for method in route.methods:
+                self._endpoints.setdefault((route.endpoint, method), info)
+                if not route.param_convertors:
+                    self._static.setdefault((method, route.path), info)
+                elif any(convertor.regex == ".*" for convertor in route.param_convertors.values()):
+                    # {name:path} 可跨越多段，无法放入前缀树
+                    self._regex.setdefault(method, []).append((route.path_regex, info))
+                else:
+                    node = self._trie.setdefault(method, _Node())
+                    for segment in route.path_format.strip("/").split("/"):
+                        if segment.startswith("{") and segment.endswith("}"):
+                            node.param = node.param or _Node()
+                            node = node.param
+                        else:
+                            node = node.children.setdefault(segment, _Node())
+                    node.info = node.info or info
+
+    def resolve(self, method: str, path: str, endpoint: Optional[Callable] = None) -> Optional[RouteInfo]:
+        if endpoint is not None:
+            info = self._endpoints.get((endpoint, method))
+            if info is not None:
+                return info
+        info = self._static.get((method, path))
+        if info is not None:
+            return info
+        root = self._trie.get(method)
+        if root is not None:
+            info = self._match(root, path.strip("/").split("/"), 0)
+            if info is not None:
+                return info
+        for path_regex, info in self._regex.get(method, []):
+            if path_regex.match(path):
+                return info
+        return None
+
+    def _match(self, node: _Node, segments: list[str], i: int) -> Optional[RouteInfo]:
+        if i == len(segments):
+            return node.info
+        child = node.children.get(segments[i])
+        if child is not None:
+            info = self._match(child, segments, i + 1)
+            if info is not None:
+                return info
+        if node.param is not None and segments[i]:
+            return self._match(node.param, segments, i + 1)
+        return None
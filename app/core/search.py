@@ -0,0 +1,288 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence, Type
+
+from tortoise.expressions import F, Q, Subquery
+from tortoise.functions import Count, Max
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from app.core.jobs import job_queue
+from app.log import logger
+from app.models.admin import SearchIndexState, SearchNgram
+from app.settings import settings
+
+# 表名 -> 索引，用于回填任务按表名查找
+search_indexes: dict[str, "NgramIndex"] = {}
+
+
+class NgramIndex:
+    """
+    子串搜索的 n-gram 倒排索引，代替无法使用 B-tree 索引的 __contains（LIKE '%...%'）
+    - 写入时把 fields 中的字段按 n 个字符切片（小写）存入 search_ngram 表，由 CRUDBase 增删改时同步
+    - 查询时先用搜索词的全部片段求交集得到候选ID，再在原表上用 ID + __contains 复核
+    - search_index_state 记录已索引的记录数和最大ID，CRUDBase 增删时在同一事务内更新；
+      与原表的 COUNT、MAX(id) 一致时才使用索引（检查结果缓存 coverage_ttl 秒），
+      不一致（如批量导入、直接执行 SQL）时退回 __contains 并提交同步任务补齐缺失的记录
+    - 候选上限取 max_candidates 与原表记录数 * max_candidate_ratio 中较小的值，记录数超过上限的片段区分度太低，
+      不参与求交集（只探测第 上限+1 条索引行，结果缓存 gram_stats_ttl 秒）；
+      搜索词短于 n、全部片段都是这样的片段时也退回 __contains，不再聚合索引行
+    - 绕过 CRUDBase 直接修改已索引字段不会改变记录数和最大ID，无法检测，需要调用 rebuild
+    """
+
+    def __init__(
+        self,
+        model: Type[Model],
+        fields: Sequence[str],
+        n: int = 2,
+        max_candidates: int = 5000,
+        max_candidate_ratio: float = 0.01,
+        coverage_ttl: float = 10,
+        batch_size: int = 1000,
+        gram_stats_ttl: float = 300,
+        gram_stats_size: int = 10000,
+    ) -> None:
+        self.model = model
+        self.table_name = model._meta.db_table
+        self.fields = tuple(fields)
+        self.n = n
+        self.max_candidates = max_candidates
+        self.max_candidate_ratio = max_candidate_ratio
+        self.coverage_ttl = coverage_ttl
+        self.batch_size = batch_size
+        self.gram_stats_ttl = gram_stats_ttl
+        self.gram_stats_size = gram_stats_size
+        # (field, gram) -> (过期时间, 记录数是否超过候选上限)
+        self._broad_grams: OrderedDict[tuple[str, str], tuple[float, bool]] = OrderedDict()
+        self._ready = False
+        self._checked_at = float("-inf")
+        self._base_count = 0
+        self.hits = 0
+        self.fallbacks = 0
+        search_indexes[self.table_name] = self
+
+    def grams(self, text: str | None) -> set[str]:
+        text = (text or "").lower()
+        return {text[i : i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def _rows(self, obj: Model) -> list[SearchNgram]:
+        return [
+            SearchNgram(table_name=self.table_name, field=field, gram=gram, record_id=obj.pk)
+            for field in self.fields
+            for gram in self.grams(getattr(obj, field))
+        ]
+
+    def _state(self):
+        return SearchIndexState.filter(table_name=self.table_name)
+
+    async def index(self, obj: Model, created: bool = False) -> None:
+        """写入或更新一条记录的索引，需与原表写入在同一事务中调用；created=True 时计入覆盖状态"""
+        await SearchNgram.filter(table_name=self.table_name, record_id=obj.pk).delete()
+        await SearchNgram.bulk_create(self._rows(obj))
+        if created:
+            await self._state().update(indexed_count=F("indexed_count") + 1)
+            await self._state().filter(indexed_max_id__lt=obj.pk).update(indexed_max_id=obj.pk)
+
+    async def remove(self, id: int) -> None:
+        await SearchNgram.filter(table_name=self.table_name, record_id=id).delete()
+        # 大于 indexed_max_id 的记录尚未计入覆盖状态
+        await self._state().filter(indexed_max_id__gte=id).update(indexed_count=F("indexed_count") - 1)
+
+    async def _base_stats(self) -> tuple[int, int]:
+        rows = (
+            await self.model.all()
+            .annotate(base_count=Count("id"), base_max_id=Max("id"))
+            .values("base_count", "base_max_id")
+        )
+        return rows[0]["base_count"], rows[0]["base_max_id"] or 0
+
+    async def _index_missing(self, last_id: int) -> tuple[int, int]:
+        """为 ID 大于 last_id 且没有索引行的记录建立索引，返回 (补齐的记录数, 遍历到的最大ID)"""
+        indexed = 0
+        while True:
+            objs = (
+                await self.model.filter(id__gt=last_id).order_by("id").limit(self.batch_size).only("id", *self.fields)
+            )
+            if not objs:
+                return indexed, last_id
+            ids = [obj.pk for obj in objs]
+            present = set(
+                await SearchNgram.filter(table_name=self.table_name, record_id__in=ids)
+                .distinct()
+                .values_list("record_id", flat=True)
+            )
+            missing = [row for obj in objs if obj.pk not in present for row in self._rows(obj)]
+            await SearchNgram.bulk_create(missing, batch_size=self.batch_size)
+            indexed += sum(1 for obj in objs if obj.pk not in present)
+            last_id = ids[-1]
+
+    async def _mark_covered(self, last_id: int) -> None:
+        """
+        遍历期间新写入的记录补齐后，把覆盖状态设为原表当前的记录数和最大ID
+        锁住状态行，并发的 CRUDBase 写入会等待本事务提交后再累加，不会丢失计数（SQLite 不支持行锁，
+        极端情况下计数偏差会在下一次检查时再次触发同步）
+        """
+        async with in_transaction():
+            state = await SearchIndexState.select_for_update().filter(table_name=self.table_name).first()
+            if state is None:
+                state = await SearchIndexState.create(table_name=self.table_name)
+            await self._index_missing(last_id)
+            state.indexed_count, state.indexed_max_id = await self._base_stats()
+            await state.save(update_fields=["indexed_count", "indexed_max_id"])
+        self._base_count = state.indexed_count
+
+    async def sync(self) -> int:
+        """
+        补齐缺失的索引，返回补齐的记录数
+        ID 不超过 indexed_max_id 的记录数与状态一致时，只检查更大的ID（如批量导入的新记录），否则检查全部记录
+        """
+        state = await self._state().first()
+        last_id = 0
+        if state is not None and await self.model.filter(id__lte=state.indexed_max_id).count() == state.indexed_count:
+            last_id = state.indexed_max_id
+        indexed, scanned_to = await self._index_missing(last_id)
+        await self._mark_covered(scanned_to)
+        self._ready, self._checked_at = True, time.monotonic()
+        logger.info(f"SearchNgram {self.table_name} synced from id {last_id}, {indexed} records indexed")
+        return indexed
+
+    async def rebuild(self) -> int:
+        """删除并重建全部记录的索引，返回处理的记录数；用于字段被直接修改等无法自动检测的情况"""
+        await self._state().delete()
+        self._ready = False
+        await SearchNgram.filter(table_name=self.table_name).delete()
+        indexed, scanned_to = await self._index_missing(0)
+        await self._mark_covered(scanned_to)
+        logger.info(f"SearchNgram {self.table_name} rebuilt, {indexed} records")
+        return indexed
+
+    async def ensure_built(self) -> None:
+        """启动时检查覆盖情况，索引不完整时提交同步任务"""
+        self._checked_at = float("-inf")
+        await self.is_ready()
+
+    async def submit_sync(self, base_count: Optional[int] = None, base_max_id: Optional[int] = None) -> None:
+        """
+        提交同步任务，幂等键包含原表的记录数和最大ID，原表不变时只提交一次
+        相同幂等键的任务失败时重新执行
+        """
+        if base_count is None or base_max_id is None:
+            base_count, base_max_id = await self._base_stats()
+        await job_queue.submit(
+            "search_ngram_sync",
+            {"table_name": self.table_name},
+            idempotency_key=f"search_ngram_sync:{self.table_name}:{self.n}:{base_count}:{base_max_id}",
+            retry_failed=True,
+        )
+
+    async def is_ready(self) -> bool:
+        """索引是否覆盖原表全部记录，不覆盖时提交同步任务"""
+        now = time.monotonic()
+        if now - self._checked_at < self.coverage_ttl:
+            return self._ready
+        # 状态行与原表统计在同一条语句中读取，是同一时刻的数据
+        base = self.model.all()
+        row = (
+            await self._state()
+            .annotate(
+                base_count=Subquery(base.annotate(value=Count("id")).values("value")),
+                base_max_id=Subquery(base.annotate(value=Max("id")).values("value")),
+            )
+            .first()
+            .values("indexed_count", "indexed_max_id", "base_count", "base_max_id")
+        )
+        if row is not None:
+            row["base_max_id"] = row["base_max_id"] or 0
+            self._base_count = row["base_count"]
+        ready = row is not None and (row["indexed_count"], row["indexed_max_id"]) == (
+            row["base_count"],
+            row["base_max_id"],
+        )
+        self._ready, self._checked_at = ready, now
+        if not ready:
+            logger.warning(f"SearchNgram {self.table_name} does not cover all records, falling back to LIKE")
+            if row is None:
+                await self.submit_sync()
+            else:
+                await self.submit_sync(row["base_count"], row["base_max_id"])
+        return ready
+
+    @property
+    def candidate_limit(self) -> int:
+        """候选ID上限，原表较小时扫表比按ID过滤更快，上限随记录数降低"""
+        return max(1, min(self.max_candidates, int(self._base_count * self.max_candidate_ratio)))
+
+    async def is_broad(self, field: str, gram: str) -> bool:
+        """片段的记录数是否超过候选上限，最多读取 上限+1 条索引行"""
+        key, now = (field, gram), time.monotonic()
+        cached = self._broad_grams.get(key)
+        if cached is not None and cached[0] > now:
+            self._broad_grams.move_to_end(key)
+            return cached[1]
+        broad = bool(
+            await SearchNgram.filter(table_name=self.table_name, field=field, gram=gram)
+            .offset(self.candidate_limit)
+            .limit(1)
+            .values_list("record_id", flat=True)
+        )
+        self._broad_grams[key] = (now + self.gram_stats_ttl, broad)
+        self._broad_grams.move_to_end(key)
+        while len(self._broad_grams) > self.gram_stats_size:
+            self._broad_grams.popitem(last=False)
+        return broad
+
+    def candidates(self, field: str, grams: set[str]):
+        """包含全部片段的记录ID，最多 candidate_limit + 1 个"""
+        return (
+            SearchNgram.filter(table_name=self.table_name, field=field, gram__in=grams)
+            .annotate(gram_count=Count("gram", distinct=True))
+            .group_by("record_id")
+            .filter(gram_count=len(grams))
+            .limit(self.candidate_limit + 1)
+            .values_list("record_id", flat=True)
+        )
+
+    async def contains(self, field: str, term: str) -> Q:
+        """返回与 Q(field__contains=term) 结果相同的条件，可用索引时转换为按候选ID查询"""
+        grams = self.grams(term)
+        if not grams or not await self.is_ready():
+            self.fallbacks += 1
+            return Q(**{f"{field}__contains": term})
+        # 只用区分度高的片段求交集，候选ID不超过其中任一片段的记录数；其余片段由 __contains 复核
+        grams = {gram for gram in grams if not await self.is_broad(field, gram)}
+        if not grams:
+            # 搜索词区分度太低，按ID过滤不比扫表快
+            self.fallbacks += 1
+            return Q(**{f"{field}__contains": term})
+        ids = await self.candidates(field, grams)
+        if len(ids) > self.candidate_limit:
+            # 片段统计缓存过期，实际候选过多
+            self.fallbacks += 1
+            return Q(**{f"{field}__contains": term})
+        self.hits += 1
+        return Q(id__in=sorted(ids)) & Q(**{f"{field}__contains": term})
+
+    def stats(self) -> dict:
+        return {"table": self.table_name, "ready": self._ready, "hits": self.hits, "fallbacks": self.fallbacks}
+
+
+@job_queue.register("search_ngram_sync")
+async def sync_search_ngram(payload: dict) -> int:
+    return await search_indexes[payload["table_name"]].sync()
+
+
+@job_queue.register("search_ngram_rebuild")
+async def rebuild_search_ngram(payload: dict) -> int:
+    return await search_indexes[payload["table_name"]].rebuild()
+
+
+def ngram_index(model: Type[Model], fields: Sequence[str]) -> NgramIndex:
+    return NgramIndex(
+        model,
+        fields,
+        n=getattr(settings, "SEARCH_NGRAM_SIZE", 2),
+        max_candidates=getattr(settings, "SEARCH_MAX_CANDIDATES", 5000),
+        max_candidate_ratio=getattr(settings, "SEARCH_MAX_CANDIDATE_RATIO", 0.01),
+        coverage_ttl=getattr(settings, "SEARCH_COVERAGE_TTL", 10),
+        gram_stats_ttl=getattr(settings, "SEARCH_GRAM_STATS_TTL", 300),
+    )
@@ -0,0 +1,46 @@
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, List, Optional
+
+from tortoise.transactions import in_transaction
+
+# 当前 atomic 事务中登记的提交后回调，不在事务中时为 None
+_on_commit: ContextVar[Optional[List[Callable[[], None]]]] = ContextVar("on_commit", default=None)
+
+
+def on_commit(callback: Callable[[], None]) -> None:
+    """
+    在当前 atomic 事务提交后执行 callback（如缓存失效），事务回滚时丢弃；不在事务中时立即执行
+    事务内失效会让并发请求在提交前读到旧数据并按新版本号缓存，必须等提交后再失效
+    """
+    callbacks = _on_commit.get()
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+def atomic(connection_name: Optional[str] = None):
+    """代替 tortoise.transactions.atomic，最外层事务提交后执行期间通过 on_commit 登记的回调"""
+
+    def wrapper(func):
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            if _on_commit.get() is not None:
+                # 嵌套事务，回调由最外层事务提交后执行
+                async with in_transaction(connection_name):
+                    return await func(*args, **kwargs)
+            callbacks: List[Callable[[], None]] = []
+            token = _on_commit.set(callbacks)
+            try:
+                async with in_transaction(connection_name):
+                    result = await func(*args, **kwargs)
+            finally:
+                _on_commit.reset(token)
+            for callback in callbacks:
+                callback()
+            return result
+
+        return wrapped
+
+    return wrapper
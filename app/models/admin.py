@@ -3,7 +3,7 @@ from tortoise import fields
 from app.schemas.menus import MenuType
 
 from .base import BaseModel, TimestampMixin
-from .enums import MethodType
+from .enums import JobStatus, MethodType, RollupDimension
 
 
 class User(BaseModel, TimestampMixin):
@@ -77,16 +77,27 @@ class DeptClosure(BaseModel, TimestampMixin):
 
 
 class AuditLog(BaseModel, TimestampMixin):
-    user_id = fields.IntField(description="用户ID", index=True)
-    username = fields.CharField(max_length=64, default="", description="用户名称", index=True)
-    module = fields.CharField(max_length=64, default="", description="功能模块", index=True)
-    summary = fields.CharField(max_length=128, default="", description="请求描述", index=True)
-    method = fields.CharField(max_length=10, default="", description="请求方法", index=True)
-    path = fields.CharField(max_length=255, default="", description="请求路径", index=True)
-    status = fields.IntField(default=-1, description="状态码", index=True)
-    response_time = fields.IntField(default=0, description="响应时间(单位ms)", index=True)
+    user_id = fields.IntField(description="用户ID")
+    username = fields.CharField(max_length=64, default="", description="用户名称")
+    module = fields.CharField(max_length=64, default="", description="功能模块")
+    summary = fields.CharField(max_length=128, default="", description="请求描述")
+    method = fields.CharField(max_length=10, default="", description="请求方法")
+    path = fields.CharField(max_length=255, default="", description="请求路径")
+    status = fields.IntField(default=-1, description="状态码")
+    response_time = fields.IntField(default=0, description="响应时间(单位ms)")
     request_args = fields.JSONField(null=True, description="请求参数")
     response_body = fields.JSONField(null=True, description="返回数据")
+    # 覆盖 TimestampMixin 的单列索引：created_at 已由 (created_at, id) 联合索引覆盖，日志写入后不会更新
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        # 只保留 (created_at, id) 游标排序和 status 精确过滤可用的联合索引，减少写入时的索引维护
+        # username、module 等按 icontains（LIKE '%...%'）过滤，B-tree 索引无法使用，不建索引
+        indexes = (
+            ("created_at", "id"),
+            ("status", "created_at"),
+        )
 
 
 class TransactionRecord(BaseModel, TimestampMixin):
@@ -122,6 +133,63 @@ class TotalRecord(BaseModel, TimestampMixin):
         table = "total_record"
 
 
+class TotalRecordDailyRollup(BaseModel, TimestampMixin):
+    day = fields.DateField(description="日期")
+    dimension = fields.CharEnumField(RollupDimension, description="统计维度")
+    value = fields.CharField(max_length=100, default="", description="维度取值，all 维度为空")
+    count = fields.IntField(default=0, description="记录数")
+    expected_expenditure = fields.IntField(default=0, description="预期支出合计")
+    income = fields.IntField(default=0, description="收入合计")
+    completed_count = fields.IntField(default=0, description="已完成记录数")
+
+    class Meta:
+        table = "total_record_daily_rollup"
+        unique_together = (("day", "dimension", "value"),)
+        indexes = (("dimension", "day"),)
+
+
+class RollupState(BaseModel):
+    """
+    汇总表的构建状态：rebuild 在重建的同一事务内写入 built_at，为空时汇总表不可用
+    重建期间持有该行的锁，增量更新前也先锁定该行，重建不会覆盖并发写入
+    """
+
+    name = fields.CharField(max_length=50, unique=True, description="汇总表名")
+    built_at = fields.DatetimeField(null=True, description="最近一次重建完成时间")
+
+    class Meta:
+        table = "rollup_state"
+
+
+class SearchNgram(BaseModel):
+    """子串搜索的 n-gram 倒排索引，由 app.core.search.NgramIndex 维护"""
+
+    table_name = fields.CharField(max_length=50, description="表名")
+    field = fields.CharField(max_length=50, description="字段名")
+    gram = fields.CharField(max_length=8, description="n-gram")
+    record_id = fields.BigIntField(description="记录ID")
+
+    class Meta:
+        table = "search_ngram"
+        unique_together = (("table_name", "field", "gram", "record_id"),)
+        # 按记录删除时使用；不以 table_name 开头，否则候选查询会为 GROUP BY record_id 扫描整张表的索引行
+        indexes = (("record_id", "table_name"),)
+
+
+class SearchIndexState(BaseModel):
+    """
+    子串搜索索引的覆盖状态：已索引的记录数和最大ID，与原表一致时索引才可用
+    经 CRUDBase 增删时在同一事务内更新，由回填任务初始化和修正
+    """
+
+    table_name = fields.CharField(max_length=50, unique=True, description="表名")
+    indexed_count = fields.BigIntField(default=0, description="已索引记录数")
+    indexed_max_id = fields.BigIntField(default=0, description="已索引的最大记录ID")
+
+    class Meta:
+        table = "search_index_state"
+
+
 class FieldWorkRecord(BaseModel, TimestampMixin):
     # ID 字段由 BaseModel 中的 pk 自动生成
     name = fields.CharField(max_length=50, description="外勤名称", index=True)
@@ -143,3 +211,21 @@ class DutyStaff(BaseModel, TimestampMixin):
 
     class Meta:
         table = "duty_staff"
+
+
+class Job(BaseModel, TimestampMixin):
+    name = fields.CharField(max_length=100, description="任务名称", index=True)
+    payload = fields.JSONField(null=True, description="任务参数")
+    status = fields.CharEnumField(JobStatus, default=JobStatus.PENDING, description="任务状态")
+    priority = fields.IntField(default=0, description="优先级，越大越先执行")
+    attempts = fields.IntField(default=0, description="已尝试次数")
+    max_attempts = fields.IntField(default=3, description="最大尝试次数")
+    run_at = fields.DatetimeField(description="下次可执行时间，执行中时为可见性超时时间")
+    idempotency_key = fields.CharField(max_length=128, null=True, unique=True, description="幂等键")
+    result = fields.JSONField(null=True, description="执行结果")
+    error = fields.TextField(null=True, description="错误信息")
+    user_id = fields.IntField(null=True, description="提交任务的用户ID，系统任务为空", index=True)
+
+    class Meta:
+        table = "job"
+        indexes = (("status", "run_at", "priority"),)
@@ -1,25 +1,84 @@
 import asyncio
 from datetime import datetime
+from typing import Any, Callable, Iterable
 
 from tortoise import fields, models
 
 from app.settings import settings
 
 
+def _format_datetime(value: datetime) -> str:
+    if settings.DATETIME_FORMAT == "%Y-%m-%d %H:%M:%S":
+        # 默认格式与 isoformat 前19位相同，isoformat 比 strftime 快约一倍
+        return value.isoformat(" ", "seconds")[:19]
+    return value.strftime(settings.DATETIME_FORMAT)
+
+
+class ModelSerializer:
+    """
+    按模型预先计算的同步序列化器，每个模型 + 排除字段组合只构建一次
+    构建时确定字段列表和每个字段的转换函数，模型实例按属性取值，.values() 字典按键查转换函数
+    时间字段格式化为 DATETIME_FORMAT，Decimal 转为 float
+    """
+
+    def __init__(self, model: type[models.Model], exclude: frozenset[str] = frozenset()) -> None:
+        self.model = model
+        self.exclude = exclude
+        self.fields: tuple[str, ...] = tuple(name for name in model._meta.fields_db_projection if name not in exclude)
+        self.converters: dict[str, Callable[[Any], Any]] = {}
+        for name in self.fields:
+            field = model._meta.fields_map[name]
+            if isinstance(field, fields.DatetimeField):
+                self.converters[name] = _format_datetime
+            elif isinstance(field, fields.DecimalField):
+                self.converters[name] = float
+        self._items: tuple[tuple[str, Callable[[Any], Any] | None], ...] = tuple(
+            (name, self.converters.get(name)) for name in self.fields
+        )
+
+    def _serialize_obj(self, obj: models.Model) -> dict:
+        return {
+            name: converter(value) if (value := getattr(obj, name)) is not None and converter is not None else value
+            for name, converter in self._items
+        }
+
+    def _serialize_dict(self, row: dict) -> dict:
+        converters = self.converters
+        return {
+            key: converters[key](value) if value is not None and key in converters else value
+            for key, value in row.items()
+            if key not in self.exclude
+        }
+
+    def __call__(self, obj: models.Model | dict) -> dict:
+        if isinstance(obj, dict):
+            return self._serialize_dict(obj)
+        return self._serialize_obj(obj)
+
+    def many(self, objs: Iterable[models.Model | dict]) -> list[dict]:
+        return [self(obj) for obj in objs]
+
+
+_serializers: dict[tuple[type, frozenset[str]], ModelSerializer] = {}
+
+
 class BaseModel(models.Model):
     id = fields.BigIntField(pk=True, index=True)
 
+    @classmethod
+    def serializer(cls, exclude: Iterable[str] = ()) -> ModelSerializer:
+        """获取（首次调用时生成）本模型的序列化器"""
+        key = (cls, frozenset(exclude))
+        serializer = _serializers.get(key)
+        if serializer is None:
+            serializer = _serializers[key] = ModelSerializer(cls, key[1])
+        return serializer
+
     async def to_dict(self, m2m: bool = False, exclude_fields: list[str] | None = None):
         if exclude_fields is None:
             exclude_fields = []
 
-        d = {}
-        for field in self._meta.db_fields:
-            if field not in exclude_fields:
-                value = getattr(self, field)
-                if isinstance(value, datetime):
-                    value = value.strftime(settings.DATETIME_FORMAT)
-                d[field] = value
+        d = self.serializer(exclude_fields)(self)
 
         if m2m:
             tasks = [
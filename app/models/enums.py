@@ -17,3 +17,22 @@ class MethodType(StrEnum):
     PUT = "PUT"
     DELETE = "DELETE"
     PATCH = "PATCH"
+
+
+class JobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class RollupDimension(StrEnum):
+    ALL = "all"
+    BUSINESS = "business"
+    FIELD_STAFF = "field_staff"
+    COMPANY = "company"
+
+
+class ExportFormat(StrEnum):
+    CSV = "csv"
+    XLSX = "xlsx"
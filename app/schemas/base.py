@@ -1,9 +1,36 @@
+from datetime import date, datetime
+from decimal import Decimal
 from typing import Any, Optional
 
+import orjson
 from fastapi.responses import JSONResponse
 
+from app.settings import settings
 
-class Success(JSONResponse):
+
+def _orjson_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return obj.strftime(settings.DATETIME_FORMAT)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    使用 orjson 编码，输出与 JSONResponse 的紧凑格式一致
+    datetime 按 DATETIME_FORMAT 格式化，Decimal 转为 float，handler 可直接传入原始值
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        )
+
+
+class Success(ORJSONResponse):
     def __init__(
         self,
         code: int = 200,
@@ -16,7 +43,7 @@ class Success(JSONResponse):
         super().__init__(content=content, status_code=code)
 
 
-class Fail(JSONResponse):
+class Fail(ORJSONResponse):
     def __init__(
         self,
         code: int = 400,
@@ -29,7 +56,7 @@ class Fail(JSONResponse):
         super().__init__(content=content, status_code=code)
 
 
-class SuccessExtra(JSONResponse):
+class SuccessExtra(ORJSONResponse):
     def __init__(
         self,
         code: int = 200,
@@ -1,9 +1,62 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from passlib import pwd
 from passlib.context import CryptContext
 
+from app.settings import settings
+
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 
+class PasswordExecutor:
+    """
+    密码哈希专用线程池，避免argon2计算阻塞事件循环
+    线程池在 start 中创建、stop 中关闭，同一进程内可多次启动 lifespan
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.max_pending = 0
+        self.completed = 0
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password")
+
+    async def run(self, func, *args):
+        # 未启动（如未经过lifespan）时按需创建线程池
+        self.start()
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "queued": max(self.pending - self.max_workers, 0),
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+        }
+
+    def stop(self) -> None:
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+
+password_executor = PasswordExecutor(max_workers=getattr(settings, "PASSWORD_HASH_WORKERS", 2))
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -12,5 +65,13 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_executor.run(get_password_hash, password)
+
+
 def generate_password() -> str:
     return pwd.genword()
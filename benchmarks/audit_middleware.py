@@ -0,0 +1,162 @@
+"""
+审计中间件吞吐基准：/api/v1/total/list 上对比
+- 无审计中间件
+- 改造前的 BaseHTTPMiddleware 实现（整包缓冲响应体再重建 body_iterator）
+- 当前的纯 ASGI HttpAuditLogMiddleware（旁路截取）
+/total/list 的路由策略是 METADATA + 1% 采样，基准中两种中间件都按 FULL 全量记录，保证写入的日志数量和内容一致
+运行：python -m benchmarks.audit_middleware [--rows 1000] [--page-size 50] [--requests 500] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from app.api.v1.totals import totals_router
+from app.core.audit import AuditLevel, AuditPolicy, audit_log_writer
+from app.core.middlewares import HttpAuditLogMiddleware
+from app.core.routing import RouteIndex
+from app.models.admin import AuditLog, TotalRecord
+
+from .common import percentile, sqlite_db
+
+AUDIT_KWARGS = {"methods": ["GET", "POST", "PUT", "DELETE"], "exclude_paths": ["/docs", "/openapi.json"]}
+
+
+class LegacyAuditLogMiddleware(BaseHTTPMiddleware):
+    """改造前实现的关键路径：call_next 额外任务 + 内存流，读出整个响应体后重建迭代器并 json.loads"""
+
+    def __init__(self, app, methods: list[str], exclude_paths: list[str]):
+        super().__init__(app)
+        self.methods = methods
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = datetime.now()
+        request_args = dict(request.query_params)
+        response = await call_next(request)
+        process_time = int((datetime.now().timestamp() - start_time.timestamp()) * 1000)
+        chunks = [chunk async for chunk in response.body_iterator]
+
+        async def replay():
+            for chunk in chunks:
+                yield chunk
+
+        response.body_iterator = replay()
+        body = b"".join(chunks)
+        route_info = request.app.state.route_index.resolve(request.method, request.url.path)
+        await audit_log_writer.put(
+            {
+                "path": request.url.path,
+                "method": request.method,
+                "status": response.status_code,
+                "module": route_info.tags if route_info else "",
+                "summary": route_info.summary if route_info else "",
+                "user_id": 0,
+                "username": "",
+                "response_time": process_time,
+                "request_args": request_args,
+                "response_body": json.loads(body),
+            }
+        )
+        return response
+
+
+class FullAuditLogMiddleware(HttpAuditLogMiddleware):
+    """忽略路由上的采样策略，每个请求都记录请求参数和响应体，与 LegacyAuditLogMiddleware 相同"""
+
+    policy = AuditPolicy(level=AuditLevel.FULL, sample_rate=1)
+
+    def get_policy(self, scope) -> AuditPolicy:
+        return self.policy
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+    app.include_router(totals_router, prefix="/api/v1/total")
+    if middleware is not None:
+        app.add_middleware(middleware, **AUDIT_KWARGS)
+    app.state.route_index = RouteIndex(app.routes)
+    return app
+
+
+async def seed(rows: int) -> None:
+    await TotalRecord.bulk_create(
+        [
+            TotalRecord(
+                date=datetime(2024, 5, 1 + i % 28),
+                plate=f"P{i}",
+                region="region",
+                company="company",
+                field_staff="staff",
+                internal_staff="staff",
+                platform="platform",
+                business="business",
+                expected_expenditure=i,
+                income=i,
+                destination="destination",
+                remark="remark" * 10,
+            )
+            for i in range(rows)
+        ]
+    )
+
+
+async def run(app: FastAPI, url: str, requests: int) -> tuple[float, list[float]]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(20):
+            assert (await client.get(url)).status_code == 200
+        samples = []
+        start = time.perf_counter()
+        for _ in range(requests):
+            t = time.perf_counter()
+            await client.get(url)
+            samples.append((time.perf_counter() - t) * 1000)
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, samples
+
+
+async def main(rows: int, page_size: int, requests: int, rounds: int) -> None:
+    async with sqlite_db():
+        await seed(rows)
+        audit_log_writer.start()
+        url = f"/api/v1/total/list?page=1&page_size={page_size}"
+        print(f"rows={rows} page_size={page_size} requests={requests} rounds={rounds}")
+        apps = {
+            "no audit middleware": build_app(None),
+            "BaseHTTPMiddleware (legacy)": build_app(LegacyAuditLogMiddleware),
+            "pure ASGI (current)": build_app(FullAuditLogMiddleware),
+        }
+        results: dict[str, list] = {name: [] for name in apps}
+        queued: dict[str, int] = {name: 0 for name in apps}
+        # 多轮轮换执行顺序，减少后台写日志和缓存预热带来的偏差，每项取吞吐最高的一轮
+        for i in range(rounds):
+            names = list(apps)[i % len(apps) :] + list(apps)[: i % len(apps)]
+            for name in names:
+                before = audit_log_writer.queued
+                results[name].append(await run(apps[name], url, requests))
+                queued[name] += audit_log_writer.queued - before
+        for name, runs in results.items():
+            throughput, samples = max(runs, key=lambda item: item[0])
+            print(
+                f"{name:<28} {throughput:8.1f} req/s  p50={percentile(samples, 0.5):7.3f}ms"
+                f"  p99={percentile(samples, 0.99):7.3f}ms  logs={queued[name]}"
+            )
+        await audit_log_writer.stop()
+        print(f"audit logs written: {await AuditLog.all().count()}", audit_log_writer.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.page_size, args.requests, args.rounds))
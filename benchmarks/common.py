@@ -0,0 +1,52 @@
+import os
+import statistics
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Optional
+
+from tortoise import Tortoise
+
+
+@asynccontextmanager
+async def sqlite_db(path: Optional[str] = None):
+    """在临时 SQLite 文件（或指定路径）上初始化全部模型，退出时关闭连接"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        await Tortoise.init(
+            db_url=f"sqlite://{path or os.path.join(tmp_dir, 'bench.sqlite3')}",
+            modules={"models": ["app.models"]},
+        )
+        await Tortoise.generate_schemas(safe=True)
+        try:
+            yield
+        finally:
+            await Tortoise.close_connections()
+
+
+async def measure(func: Callable[[], Awaitable], repeat: int, warmup: int = 3) -> List[float]:
+    """重复执行 func，返回每次耗时（毫秒）"""
+    for _ in range(warmup):
+        await func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def report(name: str, samples: List[float]) -> dict:
+    """打印一行统计结果：平均、p50、p99（毫秒）"""
+    row = {
+        "name": name,
+        "mean": statistics.fmean(samples),
+        "p50": percentile(samples, 0.5),
+        "p99": percentile(samples, 0.99),
+    }
+    print(f"{name:<40} mean={row['mean']:9.3f}ms  p50={row['p50']:9.3f}ms  p99={row['p99']:9.3f}ms")
+    return row
@@ -0,0 +1,82 @@
+"""
+翻页基准：TotalRecordController.list 在 OFFSET 翻页与游标翻页下，第 1 页到第 10000 页的单页耗时
+游标取自上一页最后一条记录，与客户端逐页翻到该页时拿到的 next_cursor 相同
+运行：python -m benchmarks.cursor_pagination [--page-size 20] [--pages 1 10 100 1000 10000] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from app.controllers.total import total_record_controller
+from app.core.crud import encode_cursor
+from app.models.admin import TotalRecord
+
+from .common import measure, report, sqlite_db
+
+
+async def seed(rows: int) -> None:
+    start = datetime(2024, 1, 1)
+    for offset in range(0, rows, 10000):
+        await TotalRecord.bulk_create(
+            [
+                TotalRecord(
+                    date=start + timedelta(minutes=i),
+                    plate=f"P{i}",
+                    region="region",
+                    company="company",
+                    field_staff="staff",
+                    internal_staff="staff",
+                    platform="platform",
+                    business="business",
+                    expected_expenditure=i,
+                    income=i,
+                    destination="destination",
+                    remark="remark",
+                    # 每秒多条，覆盖 created_at 相同时按 id 继续翻页的情况
+                    created_at=start + timedelta(seconds=i // 4),
+                )
+                for i in range(offset, min(rows, offset + 10000))
+            ]
+        )
+
+
+async def cursor_for_page(page: int, page_size: int) -> str:
+    """第 page 页的游标，即第 page-1 页最后一条记录的 (created_at, id)；第 1 页为空字符串"""
+    if page == 1:
+        return ""
+    last = await TotalRecord.all().order_by("-created_at", "-id").offset((page - 1) * page_size - 1).first()
+    return encode_cursor(last.created_at, last.id)
+
+
+async def main(page_size: int, pages: list[int], repeat: int) -> None:
+    rows = max(pages) * page_size
+    async with sqlite_db():
+        start = time.perf_counter()
+        await seed(rows)
+        print(f"rows={rows} page_size={page_size} seeded in {time.perf_counter() - start:.1f}s")
+        for page in pages:
+            cursor = await cursor_for_page(page, page_size)
+            _, by_offset = await total_record_controller.list(page, page_size, order=["-id"], with_total=False)
+            _, by_cursor = await total_record_controller.list(page, page_size, with_total=False, cursor=cursor)
+            # created_at 与 id 同序递增，两种方式取到的是同一页
+            assert [obj.id for obj in by_offset] == [obj.id for obj in by_cursor]
+
+            async def offset_page():
+                await total_record_controller.list(page, page_size, order=["-id"], with_total=False)
+
+            async def cursor_page():
+                await total_record_controller.list(page, page_size, with_total=False, cursor=cursor)
+
+            report(f"page {page:>5} offset", await measure(offset_page, repeat))
+            report(f"page {page:>5} cursor", await measure(cursor_page, repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.page_size, args.pages, args.repeat))
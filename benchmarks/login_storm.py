@@ -0,0 +1,82 @@
+"""
+登录风暴基准：并发登录（argon2 校验）期间，无关请求（一次简单查询）的延迟
+对比在事件循环中同步校验（改造前）与 verify_password_async（密码线程池）
+运行：python -m benchmarks.login_storm [--logins 60] [--concurrency 20]
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.models.admin import User
+from app.utils.password import (
+    get_password_hash,
+    password_executor,
+    verify_password,
+    verify_password_async,
+)
+
+from .common import report, sqlite_db
+
+
+async def login_inline(hashed: str) -> None:
+    """改造前：在协程中直接调用 passlib"""
+    await User.filter(username="bench").first()
+    assert verify_password("123456", hashed)
+
+
+async def login_executor(hashed: str) -> None:
+    await User.filter(username="bench").first()
+    assert await verify_password_async("123456", hashed)
+
+
+async def unrelated_requests(stop: asyncio.Event, samples: list[float]) -> None:
+    """每 5ms 发起一次与登录无关的查询，记录端到端耗时"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await User.filter(id=1).first()
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.005)
+
+
+async def storm(login, hashed: str, logins: int, concurrency: int) -> list[float]:
+    samples: list[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(unrelated_requests(stop, samples))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await login(hashed)
+
+    start = time.perf_counter()
+    if login is not None:
+        await asyncio.gather(*(one() for _ in range(logins)))
+    else:
+        await asyncio.sleep(1)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    if login is not None:
+        print(f"  {logins} logins in {elapsed:.2f}s ({logins / elapsed:.1f}/s)")
+    return samples
+
+
+async def main(logins: int, concurrency: int) -> None:
+    async with sqlite_db():
+        hashed = get_password_hash("123456")
+        await User.create(username="bench", password=hashed)
+        print(f"logins={logins} concurrency={concurrency} password_workers={password_executor.max_workers}")
+        report("unrelated query, idle", await storm(None, hashed, logins, concurrency))
+        report("unrelated query, inline verify", await storm(login_inline, hashed, logins, concurrency))
+        report("unrelated query, executor verify", await storm(login_executor, hashed, logins, concurrency))
+        print(password_executor.stats())
+    password_executor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency))
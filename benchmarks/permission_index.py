@@ -0,0 +1,71 @@
+"""
+权限校验基准：原有逐角色查询 apis 的方式 vs PermissionIndex
+运行：python -m benchmarks.permission_index [--roles 3] [--apis 200] [--repeat 500]
+"""
+
+import argparse
+import asyncio
+
+from app.core.cache import permission_index
+from app.models.admin import Api, Role, User
+from app.models.enums import MethodType
+
+from .common import measure, report, sqlite_db
+
+
+async def legacy_has_permission(user: User, method: str, path: str) -> bool:
+    """改造前 PermissionControl.has_permission 的查询方式：每次请求 1 + N 次查询"""
+    roles = await user.roles
+    apis = [await role.apis for role in roles]
+    permission_apis = list(set((api.method, api.path) for api in sum(apis, [])))
+    return (method, path) in permission_apis
+
+
+async def seed(role_count: int, api_count: int) -> User:
+    apis = [
+        Api(path=f"/api/v1/bench/{i}", method=MethodType.GET, summary=f"bench {i}", tags="bench")
+        for i in range(api_count)
+    ]
+    await Api.bulk_create(apis)
+    apis = await Api.all()
+    user = await User.create(username="bench", password="x")
+    for i in range(role_count):
+        role = await Role.create(name=f"bench{i}")
+        await role.apis.add(*apis[i::role_count])
+        await user.roles.add(role)
+    return user
+
+
+async def main(role_count: int, api_count: int, repeat: int) -> None:
+    async with sqlite_db():
+        user = await seed(role_count, api_count)
+        role_ids = [role.id for role in await user.roles]
+        method, path = "GET", f"/api/v1/bench/{api_count - 1}"
+        print(f"roles={role_count} apis={api_count} repeat={repeat}")
+
+        assert await legacy_has_permission(user, method, path)
+        report("legacy (per-request queries)", await measure(lambda: legacy_has_permission(user, method, path), repeat))
+
+        await permission_index.build()
+        assert await permission_index.has_permission(role_ids, method, path)
+        report(
+            "PermissionIndex (cached)",
+            await measure(lambda: permission_index.has_permission(role_ids, method, path), repeat),
+        )
+
+        # 每次都失效后重新加载，即角色变更后第一次校验的代价
+        async def reload():
+            permission_index.invalidate()
+            return await permission_index.has_permission(role_ids, method, path)
+
+        report("PermissionIndex (after invalidate)", await measure(reload, repeat))
+        print(permission_index.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--roles", type=int, default=3)
+    parser.add_argument("--apis", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.roles, args.apis, args.repeat))
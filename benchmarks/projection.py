@@ -0,0 +1,106 @@
+"""
+列投影基准：/total/list/yy、/total/list/ob 取一页数据
+- 改造前：取完整 TotalRecord 对象，逐条 await to_dict() 后在 Python 中丢弃不需要的列
+- 当前：CRUDBase.list(fields=...)，.values() 只查询需要的列，不实例化模型
+分别统计单页耗时、tracemalloc 峰值内存、从数据库读取的列值字节数
+运行：python -m benchmarks.projection [--rows 20000] [--page-sizes 100 1000] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import tracemalloc
+from datetime import datetime, timedelta
+
+from tortoise import Tortoise
+
+from app.controllers.total import (
+    TOTAL_OB_FIELDS,
+    TOTAL_YY_FIELDS,
+    total_record_controller,
+)
+from app.models.admin import TotalRecord
+
+from .common import measure, report, sqlite_db
+
+
+async def seed(rows: int) -> None:
+    start = datetime(2024, 1, 1)
+    for offset in range(0, rows, 10000):
+        await TotalRecord.bulk_create(
+            [
+                TotalRecord(
+                    date=start + timedelta(minutes=i),
+                    plate=f"P{i}",
+                    region="region" * 3,
+                    company="company" * 3,
+                    field_staff="staff",
+                    internal_staff="staff",
+                    platform="platform",
+                    business="business",
+                    account=f"account{i}",
+                    password=f"password{i}",
+                    expected_expenditure=i,
+                    income=i,
+                    destination="destination" * 3,
+                    remark="remark" * 20,
+                    handover_time=start,
+                    docking_time=start,
+                )
+                for i in range(offset, min(rows, offset + 10000))
+            ]
+        )
+
+
+async def legacy_page(page_size: int, fields) -> list[dict]:
+    _, objs = await total_record_controller.list(1, page_size, with_total=False)
+    return [{key: value for key, value in (await obj.to_dict()).items() if key in fields} for obj in objs]
+
+
+async def projected_page(page_size: int, fields) -> list[dict]:
+    _, rows = await total_record_controller.list(1, page_size, with_total=False, fields=fields)
+    return rows
+
+
+async def fetched_bytes(page_size: int, fields) -> int:
+    """该页从数据库读取的列值总字节数（按文本长度计）"""
+    query = total_record_controller.model.all().order_by("-created_at").limit(page_size)
+    query = query.values(*fields) if fields else query
+    sql = query.sql(params_inline=True)
+    _, rows = await Tortoise.get_connection("default").execute_query(sql)
+    return sum(len(str(value)) for row in rows for value in row if value is not None)
+
+
+async def peak_memory(func) -> int:
+    tracemalloc.start()
+    await func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+async def main(rows: int, page_sizes: list[int], repeat: int) -> None:
+    async with sqlite_db():
+        await seed(rows)
+        print(f"rows={rows}")
+        for endpoint, fields in (("yy", TOTAL_YY_FIELDS), ("ob", TOTAL_OB_FIELDS)):
+            for page_size in page_sizes:
+                assert await legacy_page(page_size, fields) == await projected_page(page_size, fields)
+                full_bytes = await fetched_bytes(page_size, None)
+                projected_bytes = await fetched_bytes(page_size, fields)
+                for name, func, read in (
+                    ("objects + to_dict", legacy_page, full_bytes),
+                    ("fields projection", projected_page, projected_bytes),
+                ):
+                    label = f"/list/{endpoint} {page_size:>5} rows {name}"
+                    report(label, await measure(lambda: func(page_size, fields), repeat))
+                    peak = await peak_memory(lambda: func(page_size, fields))
+                    print(f"{'':<40} peak={peak / 1024:9.1f}KiB  read={read / 1024:9.1f}KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.page_sizes, args.repeat))
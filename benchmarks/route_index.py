@@ -0,0 +1,75 @@
+"""
+路由解析基准：改造前逐个 path_regex.match 扫描全部路由 vs RouteIndex
+运行：python -m benchmarks.route_index [--sizes 50 500 5000] [--lookups 20000]
+"""
+
+import argparse
+import random
+import time
+
+from fastapi import APIRouter
+from fastapi.routing import APIRoute
+
+from app.core.routing import RouteIndex
+
+
+def build_routes(count: int) -> list[APIRoute]:
+    """一半静态路径，一半带路径参数，模拟 /api/v1/<模块>/<动作> 的分布"""
+    router = APIRouter()
+
+    async def endpoint():
+        return None
+
+    for i in range(count):
+        module = f"module{i // 10}"
+        if i % 2:
+            router.add_api_route(f"/api/v1/{module}/item{i}/{{id}}", endpoint, methods=["GET"], tags=[module])
+        else:
+            router.add_api_route(f"/api/v1/{module}/list{i}", endpoint, methods=["GET"], tags=[module])
+    return [route for route in router.routes if isinstance(route, APIRoute)]
+
+
+def sample_path(route: APIRoute) -> str:
+    return route.path_format.replace("{id}", "42")
+
+
+def legacy_resolve(routes: list[APIRoute], method: str, path: str):
+    """改造前 get_request_log 的写法：扫描全部路由且不提前退出"""
+    info = None
+    for route in routes:
+        if isinstance(route, APIRoute) and route.path_regex.match(path) and method in route.methods:
+            info = (",".join(route.tags), route.summary)
+    return info
+
+
+def per_lookup_us(func, lookups: list) -> float:
+    start = time.perf_counter()
+    for args in lookups:
+        func(*args)
+    return (time.perf_counter() - start) / len(lookups) * 1e6
+
+
+def main(sizes: list[int], lookup_count: int) -> None:
+    print(f"{'routes':>7} {'legacy scan':>14} {'index path':>14} {'index endpoint':>15}")
+    for size in sizes:
+        routes = build_routes(size)
+        index = RouteIndex(routes)
+        picked = [random.choice(routes) for _ in range(lookup_count)]
+        by_path = [("GET", sample_path(route)) for route in picked]
+        by_endpoint = [("GET", sample_path(route), route.endpoint) for route in picked]
+        # 扫描太慢，大规模时减少次数
+        legacy_lookups = by_path[: max(100, lookup_count * 50 // size)]
+        for args in by_path[:100]:
+            assert index.resolve(*args) is not None
+        legacy = per_lookup_us(lambda m, p: legacy_resolve(routes, m, p), legacy_lookups)
+        indexed = per_lookup_us(index.resolve, by_path)
+        endpoint = per_lookup_us(index.resolve, by_endpoint)
+        print(f"{size:>7} {legacy:>12.2f}us {indexed:>12.2f}us {endpoint:>13.2f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.sizes, args.lookups)
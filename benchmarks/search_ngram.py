@@ -0,0 +1,136 @@
+"""
+子串搜索基准：TotalRecord 在 10万/100万/500万 行时，__contains（LIKE '%...%'）与 n-gram 索引的查询耗时
+- 先绕过 CRUDBase 批量写入记录（与批量导入相同，索引不覆盖），再计时 NgramIndex.sync 补齐索引
+- 对区分度高的搜索词（车牌、外勤）和区分度低的搜索词（片段记录数超过候选上限时不聚合索引行，直接退回 LIKE）
+  分别测量第一页列表和 COUNT；n-gram 一栏包含探测片段记录数和从索引取候选ID的耗时
+运行：python -m benchmarks.search_ngram [--rows 100000 1000000 5000000] [--repeat 10] [--db-dir DIR]
+--db-dir 指定时数据库保存为 DIR/search_ngram_<rows>.sqlite3，再次运行时跳过已完成的写入和同步，只重新测量查询
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from tortoise.expressions import Q
+
+from app.controllers.total import total_record_controller
+from app.models.admin import SearchNgram, TotalRecord
+
+from .common import measure, report, sqlite_db
+
+PROVINCES = "京津沪渝冀豫云辽黑湘皖鲁新苏浙赣鄂桂甘晋蒙陕吉闽贵粤青藏川宁琼"
+LETTERS = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗"
+GIVEN_NAMES = "伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超兰霞平刚桂"
+CITIES = ["北京", "上海", "广州", "深圳", "成都", "杭州", "武汉", "西安", "南京", "重庆"]
+TRADES = ["物流", "运输", "汽车服务", "租赁", "货运代理", "供应链"]
+
+
+def person(rng: random.Random) -> str:
+    return rng.choice(SURNAMES) + "".join(rng.choices(GIVEN_NAMES, k=rng.randint(1, 2)))
+
+
+def plate(rng: random.Random) -> str:
+    return rng.choice(PROVINCES) + rng.choice(LETTERS) + "".join(rng.choices(LETTERS[:10] + "0123456789", k=5))
+
+
+async def seed(rows: int, rng: random.Random) -> None:
+    companies = [f"{rng.choice(CITIES)}{person(rng)}{rng.choice(TRADES)}有限公司" for _ in range(500)]
+    businesses = [person(rng) for _ in range(50)]
+    field_staff = [person(rng) for _ in range(200)]
+    start = datetime(2024, 1, 1)
+    for offset in range(0, rows, 10000):
+        await TotalRecord.bulk_create(
+            [
+                TotalRecord(
+                    date=start + timedelta(minutes=i),
+                    plate=plate(rng),
+                    region="region",
+                    company=rng.choice(companies),
+                    field_staff=rng.choice(field_staff),
+                    internal_staff="staff",
+                    platform="platform",
+                    business=rng.choice(businesses),
+                    expected_expenditure=i % 1000,
+                    income=i % 1000,
+                    destination="destination",
+                )
+                for i in range(offset, min(rows, offset + 10000))
+            ]
+        )
+
+
+async def terms(rng: random.Random) -> list[tuple[str, str, str]]:
+    """(说明, 字段, 搜索词)，取自已写入的记录"""
+    sample = await TotalRecord.filter(id=rng.randint(1, await TotalRecord.all().count())).first()
+    return [
+        ("plate full", "plate", sample.plate),
+        ("plate suffix", "plate", sample.plate[-4:]),
+        ("field_staff", "field_staff", sample.field_staff),
+        ("company city (broad)", "company", sample.company[:2]),
+        ("business surname (broad)", "business", sample.business[:1] + sample.business[1:2]),
+    ]
+
+
+async def run(rows: int, repeat: int, db_dir: Optional[str]) -> None:
+    rng = random.Random(rows)
+    index = total_record_controller.search_index
+    async with sqlite_db(os.path.join(db_dir, f"search_ngram_{rows}.sqlite3") if db_dir else None):
+        if await TotalRecord.all().count() != rows:
+            await TotalRecord.all().delete()
+            start = time.perf_counter()
+            await seed(rows, rng)
+            print(f"rows={rows} seeded in {time.perf_counter() - start:.1f}s")
+        # 每个行数使用不同的数据库，重新检查覆盖情况
+        await index.ensure_built()
+        if not index.stats()["ready"]:
+            start = time.perf_counter()
+            await index.sync()
+            print(f"rows={rows} sync {time.perf_counter() - start:.1f}s")
+        grams = await SearchNgram.filter(table_name=index.table_name).count()
+        print(f"rows={rows} {grams} n-gram rows")
+        assert await index.is_ready()
+
+        for name, field, term in await terms(rng):
+            like = Q(**{f"{field}__contains": term})
+            hits = index.hits
+            q = await index.contains(field, term)
+            matched = await TotalRecord.filter(like).count()
+            assert await TotalRecord.filter(q).count() == matched
+            mode = "index" if index.hits > hits else "fallback"
+            print(f"{name}: {field} contains {term!r}, {matched} rows, n-gram {mode}")
+
+            async def like_page():
+                await TotalRecord.filter(like).order_by("-id").limit(20)
+
+            async def like_count():
+                await TotalRecord.filter(like).count()
+
+            async def ngram_page():
+                await TotalRecord.filter(await index.contains(field, term)).order_by("-id").limit(20)
+
+            async def ngram_count():
+                await TotalRecord.filter(await index.contains(field, term)).count()
+
+            report(f"  {rows} page  like", await measure(like_page, repeat))
+            report(f"  {rows} page  n-gram", await measure(ngram_page, repeat))
+            report(f"  {rows} count like", await measure(like_count, repeat))
+            report(f"  {rows} count n-gram", await measure(ngram_count, repeat))
+
+
+async def main(rows: list[int], repeat: int, db_dir: Optional[str]) -> None:
+    for count in rows:
+        await run(count, repeat, db_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--db-dir", help="保存并复用基准数据库的目录")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat, args.db_dir))
@@ -0,0 +1,94 @@
+"""
+序列化基准：10k 条 TotalRecord
+- 改造前：[await obj.to_dict() for obj in objs]，每行一个协程，遍历 db_fields 做 getattr/isinstance/strftime
+- 当前：Model.serializer().many()，分别作用于模型实例和 .values() 字典
+运行：python -m benchmarks.serializer [--rows 10000] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from app.models.admin import TotalRecord
+from app.settings import settings
+
+from .common import measure, report, sqlite_db
+
+
+async def legacy_to_dict(obj, exclude_fields: list[str] | None = None) -> dict:
+    """改造前 BaseModel.to_dict 的实现（不含 m2m）"""
+    if exclude_fields is None:
+        exclude_fields = []
+    d = {}
+    for field in obj._meta.db_fields:
+        if field not in exclude_fields:
+            value = getattr(obj, field)
+            if isinstance(value, datetime):
+                value = value.strftime(settings.DATETIME_FORMAT)
+            d[field] = value
+    return d
+
+
+async def seed(rows: int) -> None:
+    start = datetime(2024, 1, 1)
+    await TotalRecord.bulk_create(
+        [
+            TotalRecord(
+                date=start + timedelta(minutes=i),
+                plate=f"P{i}",
+                region="region",
+                company="company",
+                field_staff="staff",
+                internal_staff="staff",
+                platform="platform",
+                business="business",
+                expected_expenditure=i,
+                income=i,
+                destination="destination",
+                remark="remark",
+                handover_time=start,
+            )
+            for i in range(rows)
+        ],
+        batch_size=5000,
+    )
+
+
+async def main(rows: int, repeat: int) -> None:
+    async with sqlite_db():
+        await seed(rows)
+        objs = await TotalRecord.all()
+        values = await TotalRecord.all().values()
+        serializer = TotalRecord.serializer()
+        legacy = [await legacy_to_dict(obj) for obj in objs]
+        assert legacy == serializer.many(objs) == serializer.many(values)
+        print(f"rows={len(objs)} fields={len(serializer.fields)}")
+
+        async def old():
+            [await legacy_to_dict(obj) for obj in objs]
+
+        async def new_objects():
+            serializer.many(objs)
+
+        async def new_values():
+            serializer.many(values)
+
+        async def new_exclude():
+            TotalRecord.serializer(["income"]).many(values)
+
+        base = report("await to_dict() per row (legacy)", await measure(old, repeat))
+        for name, func in (
+            ("serializer, model instances", new_objects),
+            (".values() dicts", new_values),
+            (".values() dicts, exclude income", new_exclude),
+        ):
+            row = report(name, await measure(func, repeat))
+            print(f"{'':<40} {base['mean'] / row['mean']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
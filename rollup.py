@@ -0,0 +1,11 @@
+import argparse
+import asyncio
+
+from app.controllers.total_rollup import main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="总表按天汇总维护：rebuild 从原始记录重建，check 校验汇总与原始记录是否一致"
+    )
+    parser.add_argument("command", choices=["rebuild", "check"])
+    asyncio.run(main(parser.parse_args().command))
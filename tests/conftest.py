@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+
+import pytest
+from tortoise import Tortoise
+
+from app.core.cache import permission_index, reference_cache, user_cache
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """每个用例使用独立的内存 SQLite 数据库"""
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+    await Tortoise.generate_schemas()
+    # 进程内缓存按 ID 缓存数据，换数据库后全部失效
+    user_cache.invalidate()
+    permission_index.invalidate()
+    for model in Tortoise.apps["models"].values():
+        reference_cache.invalidate(model)
+    yield
+    await Tortoise.close_connections()
+
+
+@pytest.fixture
+def explain(db):
+    """返回查询集在 SQLite 上的 EXPLAIN QUERY PLAN 明细（按绑定参数执行，与实际查询计划一致）"""
+
+    async def explain(queryset) -> str:
+        queryset.sql()
+        sql, params = queryset.query.get_parameterized_sql()
+        _, rows = await Tortoise.get_connection("default").execute_query(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "\n".join(row["detail"] for row in rows)
+
+    return explain
+
+
+@pytest.fixture
+def count_queries(db, monkeypatch):
+    """包装数据库客户端的 execute_query / execute_query_dict（.values() 查询），统计 with 块内执行的 SQL 条数"""
+    client_class = type(Tortoise.get_connection("default"))
+    methods = {name: getattr(client_class, name) for name in ("execute_query", "execute_query_dict")}
+
+    def counting(method, queries):
+        async def wrapped(self, query, values=None):
+            queries.append(query)
+            return await method(self, query, values)
+
+        return wrapped
+
+    @contextmanager
+    def count_queries():
+        queries = []
+        for name, method in methods.items():
+            monkeypatch.setattr(client_class, name, counting(method, queries))
+        try:
+            yield queries
+        finally:
+            for name, method in methods.items():
+                monkeypatch.setattr(client_class, name, method)
+
+    return count_queries
@@ -0,0 +1,158 @@
+import json
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from tortoise import timezone
+
+from app.api.v1.auditlog.auditlog import get_audit_log_list
+from app.core.audit import AuditLogWriter, audit_log_archiver
+from app.models.admin import AuditLog
+
+pytestmark = pytest.mark.anyio
+
+
+async def list_logs(**params) -> dict:
+    query = {
+        "page": 1,
+        "page_size": 10,
+        "username": "",
+        "module": "",
+        "method": "",
+        "summary": "",
+        "status": None,
+        "start_time": "",
+        "end_time": "",
+        "cursor": None,
+        "with_total": True,
+    }
+    query.update(params)
+    return json.loads((await get_audit_log_list(**query)).body)
+
+
+@pytest.fixture
+async def logs(db, tmp_path, monkeypatch):
+    """40 天内每天一条日志，超过 30 天保留期的 10 条已归档"""
+    monkeypatch.setattr(audit_log_archiver, "retention_days", 30)
+    monkeypatch.setattr(audit_log_archiver, "archive_dir", str(tmp_path))
+    now = timezone.now()
+    for day in range(40):
+        log = await AuditLog.create(user_id=1, username="admin" if day % 2 else "guest", status=200)
+        await AuditLog.filter(id=log.id).update(created_at=now - timedelta(days=day, hours=1))
+    assert await audit_log_archiver.archive() == 10
+    assert await AuditLog.all().count() == 30
+    return now
+
+
+def time_param(value) -> str:
+    return timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S") if timezone.is_aware(value) else str(value)
+
+
+async def test_list_without_time_range_reads_hot_table_only(logs):
+    response = await list_logs()
+    assert response["total"] == 30
+
+
+async def test_list_before_retention_merges_archive(logs):
+    start = time_param(logs - timedelta(days=45))
+    response = await list_logs(start_time=start, page_size=12, page=3)
+    assert response["total"] == 40
+    ids = [item["id"] for item in response["data"]]
+    # 第三页跨过保留期边界：热表最后 6 条之后接着归档记录
+    assert ids == list(range(25, 37)), ids
+
+    response = await list_logs(start_time=start, username="adm")
+    assert response["total"] == 20
+    assert all(item["username"] == "admin" for item in response["data"])
+
+
+async def test_cursor_pages_cover_hot_and_archived_logs(logs):
+    end = time_param(logs - timedelta(days=20))
+    seen, cursor = [], None
+    while True:
+        response = await list_logs(end_time=end, page_size=7, cursor=cursor)
+        seen += [item["id"] for item in response["data"]]
+        cursor = response["next_cursor"]
+        if not response["has_more"]:
+            break
+    assert seen == list(range(21, 41))
+    assert response["total"] == 20
+
+
+def entry(i: int) -> dict:
+    return {"user_id": 1, "username": f"user{i}", "path": "/api/v1/total/list", "method": "GET", "status": 200}
+
+
+async def test_writer_flushes_queued_logs_on_stop(db):
+    writer = AuditLogWriter(max_size=100, batch_size=3, flush_interval=60)
+    writer.start()
+    for i in range(7):
+        await writer.put(entry(i))
+    # 请求只入队，不等待写入
+    assert writer.stats()["pending"] == 7
+    await writer.stop()
+    assert sorted(await AuditLog.all().values_list("username", flat=True)) == [f"user{i}" for i in range(7)]
+    assert writer.stats() == {"pending": 0, "queued": 7, "flushed": 7, "dropped": 0, "failed": 0}
+
+
+@pytest.mark.parametrize("overflow, written, dropped", [("drop", 2, 3), ("inline", 5, 0)])
+async def test_writer_overflow(db, overflow, written, dropped):
+    writer = AuditLogWriter(max_size=2, batch_size=100, flush_interval=60, overflow=overflow)
+    writer.start()
+    for i in range(5):
+        await writer.put(entry(i))
+    await writer.stop()
+    assert await AuditLog.all().count() == written
+    assert writer.dropped == dropped
+
+
+@pytest.fixture
+async def archived_months(db, tmp_path, monkeypatch):
+    """120 天内每天一条日志，超过 30 天保留期的 90 条按月归档到多个文件"""
+    monkeypatch.setattr(audit_log_archiver, "retention_days", 30)
+    monkeypatch.setattr(audit_log_archiver, "archive_dir", str(tmp_path))
+    now = timezone.now()
+    for day in range(120):
+        log = await AuditLog.create(user_id=1, username="admin", status=200)
+        await AuditLog.filter(id=log.id).update(created_at=now - timedelta(days=day, hours=1))
+    assert await audit_log_archiver.archive() == 90
+    return now
+
+
+async def test_archive_pages_stop_reading_once_page_is_filled(archived_months, monkeypatch):
+    start = time_param(archived_months - timedelta(days=130))
+    files = audit_log_archiver.archive_files(archived_months - timedelta(days=130), None)
+    assert len(files) >= 3
+    opened = []
+    iter_file = audit_log_archiver._iter_file
+
+    def spy(path):
+        opened.append(path)
+        return iter_file(path)
+
+    monkeypatch.setattr(audit_log_archiver, "_iter_file", spy)
+    seen, cursor, pages = [], None, 0
+    while True:
+        opened.clear()
+        response = await list_logs(start_time=start, page_size=10, cursor=cursor, with_total=False)
+        pages += 1
+        if pages == 4:
+            # 第四页（热表之后的第一页归档记录）只需读最新的归档文件，不再解压更早的月份
+            assert len(opened) < len(files), opened
+        seen += [item["id"] for item in response["data"]]
+        cursor = response["next_cursor"]
+        if not response["has_more"]:
+            break
+    assert seen == list(range(1, 121))
+    assert pages == 12
+
+    response = await list_logs(start_time=start, page_size=10, page=5)
+    assert [item["id"] for item in response["data"]] == list(range(41, 51))
+    assert response["total"] == 120
+
+
+async def test_archive_range_is_capped(archived_months, monkeypatch):
+    monkeypatch.setattr(audit_log_archiver, "max_months", 1)
+    with pytest.raises(HTTPException) as e:
+        await list_logs(start_time=time_param(archived_months - timedelta(days=130)))
+    assert e.value.status_code == 400
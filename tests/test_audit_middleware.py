@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from starlette.datastructures import Headers
+from starlette.requests import Request
+
+from app.api import api_router
+from app.core.audit import (
+    DEFAULT_AUDIT_POLICY,
+    AuditLevel,
+    AuditPolicy,
+    AuditPolicyMatcher,
+)
+from app.core.dependency import AuthControl
+from app.core.middlewares import HttpAuditLogMiddleware, _BodyCapture, _MultipartFields
+from app.core.routing import RouteIndex
+from app.models.admin import AuditLog, User
+from app.schemas.login import JWTPayload
+from app.utils.jwt import create_access_token
+
+BOUNDARY = "----boundary"
+LIMIT = 1024
+
+
+def multipart_body(file_size: int) -> bytes:
+    parts = [
+        b'Content-Disposition: form-data; name="remark"\r\n\r\n\xe5\xa4\x87\xe6\xb3\xa8',
+        b'Content-Disposition: form-data; name="file"; filename="totals.xlsx"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n" + b"x" * file_size,
+        b'Content-Disposition: form-data; name="page"\r\n\r\n2',
+    ]
+    body = b"".join(f"--{BOUNDARY}\r\n".encode() + part + b"\r\n" for part in parts)
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def request_args(content_type: str, body: bytes, query: bytes = b"") -> dict:
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/v1/total/import",
+        "query_string": query,
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    capture = _BodyCapture(LIMIT)
+    form_fields = _MultipartFields.from_headers(Headers(scope=scope), LIMIT)
+    capture.enabled = form_fields is None
+    # 按传输分块喂入，模拟 receive 收到多条 http.request 消息
+    for start in range(0, len(body), 100):
+        capture.feed(body[start : start + 100])
+        if form_fields is not None:
+            form_fields.feed(body[start : start + 100])
+    middleware = HttpAuditLogMiddleware(app=None, methods=["POST"], exclude_paths=[])
+    return middleware.get_request_args(Request(scope), capture, form_fields)
+
+
+def test_urlencoded_form_args():
+    body = urlencode({"username": "张三", "page": "1"}).encode()
+    args = request_args("application/x-www-form-urlencoded", body, query=b"debug=1")
+    assert args == {"debug": "1", "username": "张三", "page": "1"}
+
+
+def test_multipart_records_field_names_and_file_names():
+    args = request_args(f"multipart/form-data; boundary={BOUNDARY}", multipart_body(10))
+    assert args == {"remark": "备注", "file": "totals.xlsx", "page": "2"}
+
+
+def test_multipart_larger_than_capture_limit_keeps_all_fields():
+    args = request_args(f"multipart/form-data; boundary={BOUNDARY}", multipart_body(LIMIT * 10))
+    assert args == {"remark": "备注", "file": "totals.xlsx", "page": "2"}
+
+
+def test_json_args():
+    args = request_args("application/json", b'{"id": 1, "name": "n"}')
+    assert args == {"id": 1, "name": "n"}
+
+
+def test_prefix_policy_stops_at_path_segment_boundary():
+    sampled = AuditPolicy(level=AuditLevel.METADATA, sample_rate=0.01)
+    matcher = AuditPolicyMatcher([], {"/api/v1/total/list": sampled})
+    assert matcher.match("GET", "/api/v1/total/list") is sampled
+    assert matcher.match("GET", "/api/v1/total/list/") is sampled
+    assert matcher.match("GET", "/api/v1/total/list/yy") is sampled
+    assert matcher.match("GET", "/api/v1/total/listX") is DEFAULT_AUDIT_POLICY
+    assert matcher.match("GET", "/api/v1/total/list_all") is DEFAULT_AUDIT_POLICY
+
+
+def test_only_total_list_is_sampled():
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+    app.state.route_index = RouteIndex(app.routes)
+    middleware = HttpAuditLogMiddleware(app=None, methods=["GET"], exclude_paths=[])
+
+    def policy(path: str) -> AuditPolicy:
+        return middleware.get_policy({"app": SimpleNamespace(state=app.state), "method": "GET", "path": path})
+
+    assert (policy("/api/v1/total/list").level, policy("/api/v1/total/list").sample_rate) == (AuditLevel.METADATA, 0.01)
+    for sibling in ("/api/v1/total/list/yy", "/api/v1/total/list/ob", "/api/v1/total/list/bs"):
+        assert policy(sibling) is DEFAULT_AUDIT_POLICY, sibling
+
+
+def audited_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+    app.state.route_index = RouteIndex(app.routes)
+    app.add_middleware(HttpAuditLogMiddleware, methods=["GET"], exclude_paths=[])
+    return app
+
+
+@pytest.mark.anyio
+async def test_audit_log_reuses_user_resolved_by_auth_dependency(db, monkeypatch):
+    user = await User.create(username="alice", password="x")
+    token = create_access_token(
+        data=JWTPayload(user_id=user.id, username="alice", is_superuser=False, exp=datetime.now() + timedelta(hours=1))
+    )
+    calls = []
+    get_user_by_token = AuthControl.get_user_by_token.__func__
+
+    async def counting(cls, token):
+        calls.append(token)
+        return await get_user_by_token(cls, token)
+
+    monkeypatch.setattr(AuthControl, "get_user_by_token", classmethod(counting))
+    async with AsyncClient(transport=ASGITransport(app=audited_app()), base_url="http://test") as client:
+        response = await client.get("/api/v1/base/userinfo", headers={"token": token})
+        assert response.status_code == 200, response.text
+        # 鉴权依赖解析一次，中间件直接使用 request.state.user
+        assert len(calls) == 1
+        log = await AuditLog.get(path="/api/v1/base/userinfo")
+        assert (log.user_id, log.username) == (user.id, "alice")
+
+        # 没有鉴权依赖的路由，中间件自行解析 token
+        await client.get("/api/v1/base/missing", headers={"token": token})
+        assert len(calls) == 2
+        log = await AuditLog.get(path="/api/v1/base/missing")
+        assert (log.user_id, log.username, log.status) == (user.id, "alice", 404)
@@ -0,0 +1,63 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from app.core.bgtask import BgTasks
+
+pytestmark = pytest.mark.anyio
+
+REQUEST_ID: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="")
+
+
+@pytest.fixture
+async def pool(monkeypatch):
+    monkeypatch.setattr(BgTasks, "concurrency", 1)
+    monkeypatch.setattr(BgTasks, "max_size", 1)
+    for name in ("running", "completed", "failed", "max_depth"):
+        monkeypatch.setattr(BgTasks, name, 0)
+    await BgTasks.start()
+    yield BgTasks
+    await BgTasks.stop()
+
+
+async def test_add_task_waits_for_space_when_queue_is_full(pool):
+    release = asyncio.Event()
+    done = []
+
+    async def job(name: str):
+        await release.wait()
+        done.append(name)
+
+    await pool.add_task(job, "first")
+    await asyncio.sleep(0)  # worker 取走第一个任务并阻塞
+    await pool.add_task(job, "second")  # 占满队列
+    third = asyncio.create_task(pool.add_task(job, "third"))
+    await asyncio.sleep(0.05)
+    assert not third.done()
+    assert pool.stats()["depth"] == 1 and pool.stats()["running"] == 1
+
+    release.set()
+    await asyncio.wait_for(third, 1)
+    await pool.stop()
+    assert done == ["first", "second", "third"]
+    assert pool.stats()["completed"] == 3
+
+
+async def test_tasks_run_in_submitting_context_and_failures_do_not_stop_worker(pool):
+    seen = []
+
+    async def record():
+        seen.append(REQUEST_ID.get())
+
+    def fail():
+        raise RuntimeError("boom")
+
+    REQUEST_ID.set("r1")
+    await pool.add_task(record)
+    await pool.add_task(fail)
+    REQUEST_ID.set("r2")
+    await pool.add_task(record)
+    await pool.stop()
+    assert seen == ["r1", "r2"]
+    assert (pool.completed, pool.failed) == (2, 1)
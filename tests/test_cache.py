@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from app.api.v1.menus.menus import list_menu
+from app.api.v1.roles.roles import list_role
+from app.controllers.api import api_controller
+from app.controllers.menu import menu_controller
+from app.controllers.role import role_controller
+from app.core.cache import permission_index, reference_cache
+from app.core.transactions import atomic
+from app.models.admin import Api, Role
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def role(db) -> Role:
+    role = await Role.create(name="viewer")
+    await Api.create(path="/api/v1/user/list", method="GET", summary="查看用户列表", tags="用户模块")
+    await Api.create(path="/api/v1/user/create", method="POST", summary="创建用户", tags="用户模块")
+    await role_controller.update_roles(role, [], [{"path": "/api/v1/user/list", "method": "GET"}])
+    return role
+
+
+async def test_permission_index_serves_repeated_checks_from_memory(role, count_queries):
+    assert await permission_index.has_permission([role.id], "GET", "/api/v1/user/list")
+    with count_queries() as queries:
+        assert await permission_index.has_permission([role.id], "GET", "/api/v1/user/list")
+        assert not await permission_index.has_permission([role.id], "POST", "/api/v1/user/create")
+        assert not await permission_index.has_permission([role.id], "GET", "/api/v1/user/get")
+    assert queries == []
+
+
+async def test_permission_index_follows_role_and_api_changes(role):
+    assert not await permission_index.has_permission([role.id], "POST", "/api/v1/user/create")
+    await role_controller.update_roles(role, [], [{"path": "/api/v1/user/create", "method": "POST"}])
+    assert await permission_index.has_permission([role.id], "POST", "/api/v1/user/create")
+    assert not await permission_index.has_permission([role.id], "GET", "/api/v1/user/list")
+
+    # 修改 API 路径后旧路径不再有权限
+    api = await Api.get(path="/api/v1/user/create", method="POST")
+    await api_controller.update(api.id, {"path": "/api/v1/user/add"})
+    assert not await permission_index.has_permission([role.id], "POST", "/api/v1/user/create")
+    assert await permission_index.has_permission([role.id], "POST", "/api/v1/user/add")
+
+    await role_controller.remove(role.id)
+    assert not await permission_index.has_permission([role.id], "POST", "/api/v1/user/add")
+
+
+async def menu_names() -> list:
+    response = await list_menu(page=1, page_size=10)
+    return [menu["name"] for menu in json.loads(response.body)["data"]]
+
+
+async def role_names() -> list:
+    response = await list_role(page=1, page_size=10, role_name="")
+    return [item["name"] for item in json.loads(response.body)["data"]]
+
+
+async def test_reference_reads_are_fresh_after_updates(role, count_queries):
+    menu = await menu_controller.create(
+        {"name": "系统管理", "path": "/system", "parent_id": 0, "menu_type": "catalog", "component": "Layout"}
+    )
+    assert await menu_names() == ["系统管理"]
+    assert await role_names() == ["viewer"]
+    with count_queries() as queries:
+        assert await menu_names() == ["系统管理"]
+        assert await role_names() == ["viewer"]
+    assert queries == []
+
+    await menu_controller.update(menu.id, {"name": "系统设置"})
+    await role_controller.update(role.id, {"name": "auditor"})
+    assert await menu_names() == ["系统设置"]
+    assert await role_names() == ["auditor"]
+
+
+def menu_generation() -> int:
+    return reference_cache.stats()["models"]["Menu"]["generation"]
+
+
+async def test_reference_cache_is_invalidated_after_commit(db):
+    menu = await menu_controller.create(
+        {"name": "系统管理", "path": "/system", "parent_id": 0, "menu_type": "catalog", "component": "Layout"}
+    )
+    generation = menu_generation()
+
+    @atomic()
+    async def rename(name: str, fail: bool = False):
+        before = menu_generation()
+        await menu_controller.update(menu.id, {"name": name})
+        # 事务未提交，其他请求仍读到旧数据，此时失效会让旧数据以新代数缓存
+        assert menu_generation() == before
+        if fail:
+            raise RuntimeError("rollback")
+
+    await rename("系统设置")
+    assert menu_generation() == generation + 1
+    assert await menu_names() == ["系统设置"]
+    # 回滚时不失效，已缓存的菜单树仍然有效
+    with pytest.raises(RuntimeError):
+        await rename("回滚", fail=True)
+    assert menu_generation() == generation + 1
+    assert await menu_names() == ["系统设置"]
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+from app.api.v1.totals.totals import total_search
+from app.api.v1.transactions.transactions import transaction_search
+from app.core.crud import date_prefix_range, date_range_filter
+from app.models.admin import TotalRecord, TransactionRecord
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize(
+    "prefix, expected",
+    [
+        ("2024", (datetime(2024, 1, 1), datetime(2025, 1, 1))),
+        ("2024-05", (datetime(2024, 5, 1), datetime(2024, 6, 1))),
+        ("2024-12", (datetime(2024, 12, 1), datetime(2025, 1, 1))),
+        ("2024-02-29", (datetime(2024, 2, 29), datetime(2024, 3, 1))),
+        ("2024-05-01 08", (datetime(2024, 5, 1, 8), datetime(2024, 5, 1, 9))),
+        ("2024-05-01T08:30", (datetime(2024, 5, 1, 8, 30), datetime(2024, 5, 1, 8, 31))),
+        ("2024-05-01 08:30:15", (datetime(2024, 5, 1, 8, 30, 15), datetime(2024, 5, 1, 8, 30, 16))),
+        ("05-01", None),
+    ],
+)
+def test_date_prefix_range(prefix, expected):
+    assert date_prefix_range(prefix) == expected
+
+
+async def test_legacy_date_prefix_returns_same_rows(db):
+    for day in (30, 31):
+        for hour in (0, 23):
+            await TransactionRecord.create(payment_time=datetime(2024, 5, day, hour), payment_amount=1, recipient="r")
+    await TransactionRecord.create(payment_time=datetime(2024, 6, 1), payment_amount=1, recipient="r")
+    for prefix in ("2024", "2024-05", "2024-05-31", "2024-05-31 23"):
+        legacy = TransactionRecord.filter(payment_time__contains=prefix)
+        ranged = TransactionRecord.filter(date_range_filter("payment_time", prefix))
+        expected = await legacy.order_by("id").values_list("id", flat=True)
+        actual = await ranged.order_by("id").values_list("id", flat=True)
+        assert actual and actual == expected, prefix
+
+
+async def test_total_list_date_uses_index(explain):
+    q = await total_search("2024-05", None, None, None, None, None, None)
+    query = TotalRecord.filter(q)
+    page_plan = await explain(query.order_by("-created_at").offset(20).limit(10))
+    count_plan = await explain(query.count())
+    for plan in (page_plan, count_plan):
+        assert "SEARCH total_record USING" in plan and "INDEX idx_total_recor_date" in plan, plan
+        assert "SCAN total_record" not in plan, plan
+
+
+async def test_total_list_date_range_uses_index(explain):
+    q = await total_search(None, datetime(2024, 5, 1), datetime(2024, 5, 8), None, None, None, None)
+    plan = await explain(TotalRecord.filter(q).order_by("-created_at").limit(10))
+    assert "INDEX idx_total_recor_date" in plan and "SCAN total_record" not in plan, plan
+
+
+async def test_transaction_payment_time_uses_index(explain):
+    q = await transaction_search(datetime(2024, 5, 1), None, None, None, None)
+    query = TransactionRecord.filter(q)
+    for plan in (await explain(query.order_by("payment_time", "id").limit(10)), await explain(query.count())):
+        assert "INDEX idx_transaction_payment" in plan and "SCAN transaction_record" not in plan, plan
+
+
+async def test_legacy_contains_scans(explain):
+    # 对照：改造前的 LIKE '%...%' 无法使用索引范围，只能扫描
+    plan = await explain(TotalRecord.filter(date__contains="2024-05").count())
+    assert "SCAN total_record" in plan and "SEARCH" not in plan, plan
@@ -0,0 +1,104 @@
+import csv
+import io
+import zipfile
+from datetime import datetime
+from xml.etree import ElementTree
+
+import pytest
+from tortoise.expressions import Q
+
+from app.api.v1.totals.totals import export_totals
+from app.controllers.total import total_record_controller
+from app.core.export import export_response
+from app.models.admin import TotalRecord
+from app.models.enums import ExportFormat
+
+pytestmark = pytest.mark.anyio
+
+NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+@pytest.fixture
+async def records(db):
+    await TotalRecord.bulk_create(
+        [
+            TotalRecord(
+                date=datetime(2024, 5, 1 + i % 3, 12),
+                plate=f"P{i}",
+                region="region",
+                company="公司 & <co>",
+                field_staff="staff",
+                internal_staff="staff",
+                platform="platform",
+                password="secret",
+                business="business",
+                expected_expenditure=i,
+                income=i * 2,
+                destination="destination",
+                remark=None if i % 2 else "备注\x01",
+                is_completed=i % 2 == 0,
+            )
+            for i in range(10)
+        ]
+    )
+
+
+async def body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+async def export_body(format: ExportFormat, **params) -> bytes:
+    query = {"date": None, "date_from": None, "date_to": None, "plate": None, "business": None}
+    query.update(field_staff=None, company=None, **params)
+    return await body(await export_totals(format=format, **query))
+
+
+async def test_csv_export(records):
+    text = (await export_body(ExportFormat.CSV, date_from=datetime(2024, 5, 2))).decode()
+    assert text.startswith("﻿")
+    rows = list(csv.reader(io.StringIO(text[1:])))
+    assert "车牌" in rows[0] and "密码" not in rows[0] and "created_at" not in rows[0]
+    assert len(rows) == 1 + 6
+    row = dict(zip(rows[0], rows[1]))
+    assert row["日期"].startswith("2024-05-0") and row["公司"] == "公司 & <co>"
+    assert row["是否完成"] in ("是", "否")
+
+
+async def test_export_reads_one_query_per_batch(records, count_queries):
+    with count_queries() as queries:
+        response = export_response(total_record_controller, Q(), ExportFormat.CSV, "total_record", batch_size=3)
+        chunks = [chunk async for chunk in response.body_iterator]
+    # 10 行分 4 批，最后一次查询返回空
+    assert len(queries) == 5
+    assert len(chunks) == 1 + 4
+
+
+def sheet_rows(workbook: zipfile.ZipFile, index: int) -> list[list[str]]:
+    root = ElementTree.fromstring(workbook.read(f"xl/worksheets/sheet{index}.xml"))
+    return [["".join(cell.itertext()) for cell in row.findall("s:c", NS)] for row in root.find("s:sheetData", NS)]
+
+
+async def test_xlsx_export_is_a_valid_workbook(records, monkeypatch):
+    # 每个工作表最多 4 行（含表头），10 行数据分到 4 个工作表
+    monkeypatch.setattr("app.core.export.XLSX_MAX_ROWS", 4)
+    data = await export_body(ExportFormat.XLSX)
+    workbook = zipfile.ZipFile(io.BytesIO(data))
+    assert workbook.testzip() is None
+    names = set(workbook.namelist())
+    assert {"[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/_rels/workbook.xml.rels"} <= names
+    sheets = ElementTree.fromstring(workbook.read("xl/workbook.xml")).findall("s:sheets/s:sheet", NS)
+    assert len(sheets) == 4
+    rows = [sheet_rows(workbook, i) for i in range(1, 5)]
+    assert [len(sheet) for sheet in rows] == [4, 4, 4, 2]
+    assert all(sheet[0] == rows[0][0] for sheet in rows)
+    header = rows[0][0]
+    data_rows = [dict(zip(header, row)) for sheet in rows for row in sheet[1:]]
+    assert [row["车牌"] for row in data_rows] == [f"P{i}" for i in range(10)]
+    assert data_rows[0]["公司"] == "公司 & <co>" and data_rows[0]["备注"] == "备注"
+
+    openpyxl = pytest.importorskip("openpyxl")
+    book = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+    assert book.sheetnames == ["Sheet1", "Sheet2", "Sheet3", "Sheet4"]
+    first = list(book["Sheet1"].iter_rows(values_only=True))
+    assert first[1][list(first[0]).index("预期支出")] == 0
+    assert first[1][list(first[0]).index("是否完成")] is True
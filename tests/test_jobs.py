@@ -0,0 +1,175 @@
+import asyncio
+import json
+
+import pytest
+from tortoise.exceptions import DoesNotExist
+
+from app.api.v1.jobs.jobs import get_job
+from app.core.cache import UserSnapshot
+from app.core.jobs import JobQueue
+from app.models.admin import Job
+from app.models.enums import JobStatus
+
+pytestmark = pytest.mark.anyio
+
+VISIBILITY_TIMEOUT = 0.3
+RETRY_BACKOFF = 0.1
+
+
+@pytest.fixture
+def queue(db):
+    queue = JobQueue(
+        consumers=1, poll_interval=0.01, visibility_timeout=VISIBILITY_TIMEOUT, retry_backoff=RETRY_BACKOFF
+    )
+    calls = []
+
+    @queue.register("echo")
+    async def echo(payload):
+        calls.append(payload)
+        return payload
+
+    queue.calls = calls
+    return queue
+
+
+async def test_submit_with_idempotency_key_creates_one_job(queue):
+    first = await queue.submit("echo", {"n": 1}, idempotency_key="same")
+    second = await queue.submit("echo", {"n": 2}, idempotency_key="same")
+    assert first.id == second.id
+    assert await Job.all().count() == 1
+    assert (await Job.get(id=first.id)).payload == {"n": 1}
+
+
+async def test_submit_unknown_handler_raises(queue):
+    with pytest.raises(ValueError):
+        await queue.submit("missing")
+
+
+async def test_priority_then_run_at_order(queue):
+    low = await queue.submit("echo", {"name": "low"})
+    high = await queue.submit("echo", {"name": "high"}, priority=10)
+    await queue.run_once()
+    await queue.run_once()
+    assert [payload["name"] for payload in queue.calls] == ["high", "low"]
+    assert {job.status for job in await Job.filter(id__in=[low.id, high.id])} == {JobStatus.SUCCEEDED}
+
+
+async def test_retry_with_exponential_backoff(queue):
+    failures = []
+
+    @queue.register("flaky")
+    async def flaky(payload):
+        if len(failures) < 2:
+            failures.append(1)
+            raise RuntimeError("boom")
+        return "ok"
+
+    job = await queue.submit("flaky", max_attempts=3)
+
+    assert await queue.run_once()
+    job = await Job.get(id=job.id)
+    assert job.status == JobStatus.PENDING and job.attempts == 1 and "boom" in job.error
+    # 退避期间不可领取
+    assert not await queue.run_once()
+    await asyncio.sleep(RETRY_BACKOFF * 1.5)
+    assert await queue.run_once()
+    job = await Job.get(id=job.id)
+    assert job.status == JobStatus.PENDING and job.attempts == 2
+    # 第二次失败退避时间翻倍
+    await asyncio.sleep(RETRY_BACKOFF * 1.2)
+    assert not await queue.run_once()
+    await asyncio.sleep(RETRY_BACKOFF * 1.2)
+    assert await queue.run_once()
+    job = await Job.get(id=job.id)
+    assert job.status == JobStatus.SUCCEEDED and job.attempts == 3 and job.result == "ok" and job.error is None
+
+
+async def test_failed_after_max_attempts(queue):
+    @queue.register("broken")
+    async def broken(payload):
+        raise RuntimeError("always")
+
+    job = await queue.submit("broken", max_attempts=2)
+    assert await queue.run_once()
+    await asyncio.sleep(RETRY_BACKOFF * 1.5)
+    assert await queue.run_once()
+    job = await Job.get(id=job.id)
+    assert job.status == JobStatus.FAILED and job.attempts == 2 and "always" in job.error
+    assert not await queue.run_once()
+
+
+async def test_abandoned_job_is_reclaimed_after_visibility_timeout(queue):
+    job = await queue.submit("echo", {"n": 1})
+    # 领取后不执行，模拟消费者异常退出
+    claimed = await queue.claim()
+    assert claimed.id == job.id and claimed.attempts == 1
+    assert await queue.claim() is None
+    await asyncio.sleep(VISIBILITY_TIMEOUT * 1.2)
+    reclaimed = await queue.claim()
+    assert reclaimed.id == job.id and reclaimed.attempts == 2
+    await queue.process(reclaimed)
+    assert (await Job.get(id=job.id)).status == JobStatus.SUCCEEDED
+
+
+async def test_abandoned_last_attempt_is_failed(queue):
+    job = await queue.submit("echo", max_attempts=1)
+    assert await queue.claim() is not None
+    await asyncio.sleep(VISIBILITY_TIMEOUT * 1.2)
+    assert await queue.claim() is None
+    job = await Job.get(id=job.id)
+    assert job.status == JobStatus.FAILED and job.error == "visibility timeout exceeded"
+
+
+async def test_stale_run_cannot_overwrite_newer_claim(queue):
+    job = await queue.submit("echo", {"n": 1}, max_attempts=1)
+    stale = await queue.claim()
+    await asyncio.sleep(VISIBILITY_TIMEOUT * 1.2)
+    # 重新领取时已超过最大次数，任务被标记为失败
+    assert await queue.claim() is None
+    # 超时前领取的执行稍后完成，不能把 FAILED 覆盖为 SUCCEEDED
+    await queue.process(stale)
+    job = await Job.get(id=job.id)
+    assert job.status == JobStatus.FAILED and job.error == "visibility timeout exceeded"
+
+
+async def test_heartbeat_keeps_long_job_claimed(queue):
+    @queue.register("slow")
+    async def slow(payload):
+        await asyncio.sleep(VISIBILITY_TIMEOUT * 3)
+        return "done"
+
+    job = await queue.submit("slow", max_attempts=1)
+    running = asyncio.create_task(queue.run_once())
+    # 执行时间超过可见性超时，其他消费者仍然领取不到
+    for _ in range(10):
+        await asyncio.sleep(VISIBILITY_TIMEOUT / 3)
+        assert await queue.claim() is None
+    assert await running
+    job = await Job.get(id=job.id)
+    assert job.status == JobStatus.SUCCEEDED and job.attempts == 1 and job.result == "done"
+
+
+async def test_get_job_only_returns_own_jobs_to_regular_users(queue):
+    own = await queue.submit("echo", {"n": 1}, user_id=2)
+    other = await queue.submit("echo", {"n": 2}, user_id=3)
+    system = await queue.submit("echo", {"n": 3})
+    user = UserSnapshot(id=2, username="user", is_superuser=False, is_active=True, role_ids=(1,))
+    admin = UserSnapshot(id=1, username="admin", is_superuser=True, is_active=True, role_ids=())
+    assert json.loads((await get_job(id=own.id, current_user=user)).body)["data"]["id"] == own.id
+    for job in (other, system):
+        with pytest.raises(DoesNotExist):
+            await get_job(id=job.id, current_user=user)
+        assert json.loads((await get_job(id=job.id, current_user=admin)).body)["data"]["id"] == job.id
+
+
+async def test_submit_retry_failed_requeues_failed_job(queue):
+    job = await queue.submit("echo", {"n": 1}, idempotency_key="key", max_attempts=2)
+    await Job.filter(id=job.id).update(status=JobStatus.FAILED, attempts=2, error="boom")
+    # 默认仍返回失败的任务
+    assert (await queue.submit("echo", idempotency_key="key")).status == JobStatus.FAILED
+    again = await queue.submit("echo", idempotency_key="key", max_attempts=2, retry_failed=True)
+    assert again.id == job.id
+    assert (again.status, again.attempts, again.max_attempts) == (JobStatus.PENDING, 2, 4)
+    assert await queue.run_once()
+    assert (await Job.get(id=job.id)).status == JobStatus.SUCCEEDED
+    assert queue.calls == [{"n": 1}]
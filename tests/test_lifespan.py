@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from tortoise import Tortoise
+
+import app as application
+from app.core.audit import audit_log_writer
+from app.core.cache import permission_index, user_cache
+from app.core.init_app import init_superuser
+from app.models.admin import AuditLog
+
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    """lifespan 使用临时文件数据库，两次启动之间数据保留"""
+    db_url = f"sqlite://{tmp_path}/db.sqlite3"
+
+    async def init_data():
+        await Tortoise.init(db_url=db_url, modules={"models": ["app.models"]})
+        await Tortoise.generate_schemas(safe=True)
+        await init_superuser()
+
+    monkeypatch.setattr(application, "init_data", init_data)
+    user_cache.invalidate()
+    permission_index.invalidate()
+    return db_url
+
+
+async def audit_log_count(db_url: str) -> int:
+    await Tortoise.init(db_url=db_url, modules={"models": ["app.models"]})
+    try:
+        return await AuditLog.all().count()
+    finally:
+        await Tortoise.close_connections()
+
+
+def test_app_restarts_in_same_process(db_url):
+    failed = audit_log_writer.failed
+    # 每个 TestClient 的 lifespan 运行在各自的事件循环中
+    for _ in range(2):
+        with TestClient(application.app) as client:
+            response = client.post("/api/v1/base/access_token", json={"username": "admin", "password": "123456"})
+            assert response.status_code == 200, response.text
+            headers = {"token": response.json()["data"]["access_token"]}
+            response = client.get("/api/v1/base/userinfo", headers=headers)
+            assert response.status_code == 200, response.text
+    assert audit_log_writer.failed == failed
+    assert asyncio.run(audit_log_count(db_url)) == 2
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+from tortoise.expressions import Q
+
+from app.controllers.total import total_record_controller
+from app.core.crud import encode_cursor, keyset_filter
+from app.models.admin import TotalRecord
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed(rows: int) -> None:
+    start = datetime(2024, 1, 1)
+    await TotalRecord.bulk_create(
+        [
+            TotalRecord(
+                date=start,
+                plate=f"P{i}",
+                region="region",
+                company="company",
+                field_staff="staff",
+                internal_staff="staff",
+                platform="platform",
+                business="business",
+                expected_expenditure=i,
+                income=i,
+                destination="destination",
+                # 每 3 条 created_at 相同
+                created_at=start + timedelta(seconds=i // 3),
+            )
+            for i in range(rows)
+        ]
+    )
+
+
+async def test_cursor_walk_returns_every_row_once(db):
+    await seed(50)
+    ids, cursor, pages = [], "", 0
+    while cursor is not None:
+        _, objs = await total_record_controller.list(1, 7, with_total=False, cursor=cursor)
+        ids.extend(obj.id for obj in objs)
+        cursor = total_record_controller.next_cursor(objs, 7)
+        pages += 1
+    assert pages == 8
+    assert ids == sorted((await TotalRecord.all().values_list("id", flat=True)), reverse=True)
+
+
+async def test_cursor_walk_with_fields(db):
+    await seed(10)
+    _, first = await total_record_controller.list(1, 4, with_total=False, cursor="", fields=["plate"])
+    cursor = total_record_controller.next_cursor(first, 4)
+    _, second = await total_record_controller.list(1, 4, with_total=False, cursor=cursor, fields=["plate"])
+    # 辅助字段已移除
+    assert first[0] == {"plate": "P9"}
+    assert [row["plate"] for row in first + second] == [f"P{i}" for i in range(9, 1, -1)]
+
+
+async def test_keyset_filter_uses_index_range(explain):
+    query = TotalRecord.filter(keyset_filter(encode_cursor(datetime(2024, 1, 1), 5)))
+    plan = await explain(query.order_by("-created_at", "-id").limit(20).values("id"))
+    # 只有 OR 条件时，绑定参数下会变成 SCAN 整个索引
+    assert "SEARCH total_record USING COVERING INDEX" in plan and "created_at<" in plan
+
+
+def count_statements(queries: list) -> list:
+    return [query for query in queries if "COUNT(" in query.upper()]
+
+
+async def test_list_without_total_skips_count(db, count_queries):
+    await seed(10)
+    with count_queries() as queries:
+        total, objs = await total_record_controller.list(1, 4, with_total=False)
+    assert total == -1 and len(objs) == 4
+    assert len(queries) == 1 and not count_statements(queries), queries
+    with count_queries() as queries:
+        total, objs = await total_record_controller.list(1, 4)
+    assert total == 10 and len(objs) == 4
+    assert len(queries) == 2 and len(count_statements(queries)) == 1, queries
+
+
+async def test_count_cache_is_keyed_by_filter_and_invalidated_on_write(db, count_queries):
+    # 总数缓存是进程级的，清掉其他用例留下的结果
+    total_record_controller.invalidate_cache()
+    await seed(10)
+
+    async def total(minimum: int) -> int:
+        search = Q(expected_expenditure__gte=minimum)
+        return (await total_record_controller.list(1, 4, search=search, count_cache_ttl=60))[0]
+
+    assert await total(5) == 5
+    with count_queries() as queries:
+        assert await total(5) == 5
+        # 过滤值不同，缓存键不同
+        assert await total(8) == 2
+    assert len(count_statements(queries)) == 1, queries
+
+    row = (await TotalRecord.filter(expected_expenditure=9).values())[0]
+    await total_record_controller.create(
+        {key: row[key] for key in row if key not in ("id", "created_at", "updated_at")}
+    )
+    assert await total(5) == 6
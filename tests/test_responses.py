@@ -0,0 +1,31 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+from app.schemas.base import Fail, Success, SuccessExtra
+from app.settings import settings
+
+
+def test_body_matches_json_response_for_json_values():
+    data = [{"id": 1, "name": "张三", "ratio": 0.5, "tags": ["a", "b"], "remark": None, "ok": True}]
+    response = SuccessExtra(data=data, total=1, page=2, page_size=10, count_sum=3)
+    expected = JSONResponse(
+        {"code": 200, "msg": None, "data": data, "total": 1, "page": 2, "page_size": 10, "count_sum": 3}
+    )
+    assert response.body == expected.body
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_non_json_values_are_converted():
+    moment = datetime(2024, 5, 1, 8, 30, 15, 123456)
+    response = Success(data={"at": moment, "day": date(2024, 5, 1), "amount": Decimal("1.50"), 1: "key"})
+    data = json.loads(response.body)["data"]
+    assert data == {"at": moment.strftime(settings.DATETIME_FORMAT), "day": "2024-05-01", "amount": 1.5, "1": "key"}
+
+
+def test_fail_uses_code_as_status():
+    response = Fail(code=403, msg="Permission denied")
+    assert response.status_code == 403
+    assert json.loads(response.body) == {"code": 403, "msg": "Permission denied", "data": None}
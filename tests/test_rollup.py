@@ -0,0 +1,337 @@
+import json
+from datetime import date, datetime
+
+import pytest
+
+from app.api.v1.totals.totals import check_totals_rollup, list_totals_bs
+from app.controllers import total_rollup
+from app.controllers.duty_staff import duty_staff_controller
+from app.controllers.total import total_record_controller, total_record_controller_bs
+from app.controllers.total_rollup import (
+    check_total_record_rollup,
+    rollup_day_range,
+    total_record_rollup_controller,
+)
+from app.core.jobs import job_queue
+from app.models.admin import DutyStaff, Job, TotalRecord, TotalRecordDailyRollup, User
+from app.models.enums import JobStatus, RollupDimension
+
+pytestmark = pytest.mark.anyio
+
+
+def record(day: int, business: str, field_staff: str, expected_expenditure: int, income: int = 0) -> dict:
+    return {
+        "date": datetime(2024, 5, day, 12),
+        "plate": f"P{day}",
+        "region": "region",
+        "company": "company",
+        "field_staff": field_staff,
+        "internal_staff": "staff",
+        "platform": "platform",
+        "business": business,
+        "expected_expenditure": expected_expenditure,
+        "income": income,
+        "destination": "destination",
+    }
+
+
+@pytest.fixture(autouse=True)
+def coverage_ttl(monkeypatch):
+    # 每次都重新检查汇总表是否可用
+    monkeypatch.setattr(total_rollup.total_record_rollup_controller, "coverage_ttl", 0)
+
+
+RECORDS = (
+    record(1, "alice", "fs1", 10, 1),
+    record(1, "bob", "fs1", 20, 2),
+    record(2, "alice", "fs2", 30, 3),
+    record(3, "alice2", "fs2", 40, 4),
+    record(4, "carol", "fs3", 50, 5),
+)
+
+
+@pytest.fixture
+async def records(db):
+    # 与首次部署后重建任务完成的状态一致
+    await total_record_rollup_controller.rebuild()
+    for item in RECORDS:
+        await total_record_controller.create(item)
+
+
+@pytest.fixture
+async def raw_records(db):
+    """绕过 total_record_controller 写入，汇总表没有这些记录"""
+    await TotalRecord.bulk_create([TotalRecord(**item) for item in RECORDS])
+
+
+async def rebuild_jobs() -> list:
+    return await Job.filter(name="total_record_rollup_rebuild").order_by("id")
+
+
+def test_rollup_day_range():
+    assert rollup_day_range(None, None) == (None, None)
+    assert rollup_day_range(datetime(2024, 5, 1), datetime(2024, 5, 3)) == (
+        datetime(2024, 5, 1).date(),
+        datetime(2024, 5, 2).date(),
+    )
+    assert rollup_day_range(datetime(2024, 5, 1, 8), None) is None
+    assert rollup_day_range(None, datetime(2024, 5, 3, 0, 0, 1)) is None
+
+
+async def test_apply_retries_update_when_concurrent_insert_wins(records, monkeypatch):
+    in_transaction = total_rollup.in_transaction
+    raced = []
+
+    def racing_in_transaction(*args, **kwargs):
+        if not raced:
+            raced.append(True)
+            # 模拟另一个事务在本事务 UPDATE 未命中之后、INSERT 之前插入了同一汇总行
+            return _RacingSavepoint(in_transaction(*args, **kwargs))
+        return in_transaction(*args, **kwargs)
+
+    class _RacingSavepoint:
+        def __init__(self, context):
+            self.context = context
+
+        async def __aenter__(self):
+            await TotalRecordDailyRollup.create(
+                day=datetime(2024, 5, 9).date(),
+                dimension=RollupDimension.ALL,
+                value="",
+                count=5,
+                expected_expenditure=500,
+            )
+            return await self.context.__aenter__()
+
+        async def __aexit__(self, *exc_info):
+            return await self.context.__aexit__(*exc_info)
+
+    monkeypatch.setattr(total_rollup, "in_transaction", racing_in_transaction)
+    await total_record_controller.create(record(9, "dave", "fs9", 7, 1))
+    assert raced
+    row = await TotalRecordDailyRollup.get(day=datetime(2024, 5, 9).date(), dimension=RollupDimension.ALL)
+    assert (row.count, row.expected_expenditure, row.income) == (6, 507, 1)
+    # 其余维度照常插入
+    row = await TotalRecordDailyRollup.get(dimension=RollupDimension.BUSINESS, value="dave")
+    assert (row.count, row.expected_expenditure, row.income) == (1, 7, 1)
+
+
+@pytest.mark.parametrize(
+    "date_from, date_to",
+    [
+        (None, None),
+        (datetime(2024, 5, 1), datetime(2024, 5, 3)),
+        # 边界不在零点，回退为在原始记录上聚合
+        (datetime(2024, 5, 1, 0, 0, 1), datetime(2024, 5, 3, 0, 0, 1)),
+        (datetime(2024, 5, 1, 13), None),
+    ],
+)
+async def test_business_summaries_match_raw_records(records, date_from, date_to):
+    expected = {
+        (None, None): {"count": 3, "expected_expenditure": 80, "income": 8},
+        (datetime(2024, 5, 1), datetime(2024, 5, 3)): {"count": 2, "expected_expenditure": 40, "income": 4},
+        (datetime(2024, 5, 1, 0, 0, 1), datetime(2024, 5, 3, 0, 0, 1)): {
+            "count": 2,
+            "expected_expenditure": 40,
+            "income": 4,
+        },
+        (datetime(2024, 5, 1, 13), None): {"count": 2, "expected_expenditure": 70, "income": 7},
+    }[(date_from, date_to)]
+    assert await total_record_controller_bs.summarize("alice", date_from, date_to) == expected
+
+    data = await total_record_controller_bs.summarize_by_business(["bob", "alice", "nobody"], date_from, date_to)
+    assert [item["business"] for item in data] == ["bob", "alice", "nobody"]
+    assert data[2] == {"business": "nobody", "count": 0, "expected_expenditure": 0, "income": 0}
+
+
+async def test_summaries_read_rollups_when_days_align(records):
+    # 只改汇总表，按天对齐的查询应读到修改后的值
+    await TotalRecordDailyRollup.filter(dimension=RollupDimension.BUSINESS, value="bob").update(count=99)
+    data = await total_record_controller_bs.summarize_by_business(["bob"], datetime(2024, 5, 1), None)
+    assert data[0]["count"] == 99
+    data = await total_record_controller_bs.summarize_by_business(["bob"], datetime(2024, 5, 1, 1), None)
+    assert data[0]["count"] == 1
+
+
+async def test_duty_staff_stats_from_rollups(records):
+    for name, actual in (("fs1", 100), ("fs2", 200), ("", 300)):
+        await DutyStaff.create(name=name, type="外勤人员", actual_expenditure=actual)
+    total, data, summary = await duty_staff_controller.list_with_stats(1, 10)
+    assert total == 3
+    stats = {item["name"]: (item.get("count"), item.get("expected_expenditure_sum")) for item in data}
+    assert stats == {"fs1": (2, 30), "fs2": (2, 70), "": (None, None)}
+    assert summary == {"total_count": 4, "total_expected_expenditure_sum": 100, "total_actual_expenditure": 300}
+
+
+async def test_ensure_built_submits_rebuild_once(raw_records):
+    await total_record_rollup_controller.ensure_built()
+    await total_record_rollup_controller.ensure_built()
+    jobs = await rebuild_jobs()
+    assert len(jobs) == 1
+    await total_record_rollup_controller.rebuild()
+    assert await total_record_rollup_controller.check() == []
+    assert await total_record_rollup_controller.is_ready()
+
+
+async def all_summaries() -> list:
+    return [
+        await total_record_rollup_controller.summary(dimension, date(2024, 5, 1), date(2024, 5, 3), by_day=by_day)
+        for dimension in RollupDimension
+        for by_day in (False, True)
+    ] + [
+        await total_record_rollup_controller.summary(RollupDimension.BUSINESS, value_contains="alice"),
+        await total_record_rollup_controller.summary(RollupDimension.FIELD_STAFF, values=["fs1", "fs3"]),
+        await total_record_rollup_controller.summary(RollupDimension.ALL, value=""),
+    ]
+
+
+async def test_summaries_fall_back_to_raw_records_until_built(raw_records):
+    assert not await total_record_rollup_controller.is_ready()
+    from_records = await all_summaries()
+    assert from_records[0] == [
+        {"value": "", "count": 4, "expected_expenditure": 100, "income": 10, "completed_count": 0}
+    ]
+    summary = await total_record_controller_bs.summarize("alice", datetime(2024, 5, 1), None)
+    assert summary == {"count": 3, "expected_expenditure": 80, "income": 8}
+    for name, actual in (("fs1", 100), ("fs2", 200)):
+        await DutyStaff.create(name=name, type="外勤人员", actual_expenditure=actual)
+    _, data, _ = await duty_staff_controller.list_with_stats(1, 10)
+    assert {item["name"]: item["count"] for item in data} == {"fs1": 2, "fs2": 2}
+
+    await total_record_rollup_controller.rebuild()
+    assert await total_record_rollup_controller.is_ready()
+    assert await all_summaries() == from_records
+
+
+async def test_failed_rebuild_is_resubmitted(raw_records):
+    await total_record_rollup_controller.ensure_built()
+    [job] = await rebuild_jobs()
+    await Job.filter(id=job.id).update(status=JobStatus.FAILED, attempts=job.max_attempts, error="boom")
+    # 重建失败后经控制器写入一条记录，汇总表有了数据行，但仍未重建过
+    await total_record_controller.create(record(5, "dave", "fs4", 60, 6))
+    assert await TotalRecordDailyRollup.exists()
+    data = await total_record_controller_bs.summarize_by_business(["alice", "dave"], None, None)
+    assert [item["count"] for item in data] == [2, 1]
+
+    # 没有待执行的重建任务，重新提交
+    await total_record_rollup_controller.ensure_built()
+    jobs = await rebuild_jobs()
+    assert len(jobs) == 2 and jobs[-1].status == JobStatus.PENDING
+    # 原表不变时幂等键相同，失败的任务被重新执行
+    await Job.filter(id=jobs[-1].id).update(status=JobStatus.FAILED, attempts=3, max_attempts=3)
+    await total_record_rollup_controller.ensure_built()
+    jobs = await rebuild_jobs()
+    assert len(jobs) == 2
+    assert (jobs[-1].status, jobs[-1].attempts, jobs[-1].max_attempts) == (JobStatus.PENDING, 3, 6)
+
+    await job_queue.process(await job_queue.claim())
+    assert (await Job.get(id=jobs[-1].id)).status == JobStatus.SUCCEEDED
+    assert await total_record_rollup_controller.check() == []
+    assert await total_record_rollup_controller.is_ready()
+
+
+async def test_records_written_around_the_controller_disable_rollups(records):
+    assert await total_record_rollup_controller.is_ready()
+    await TotalRecord.create(**record(2, "alice", "fs2", 70, 7))
+    assert not await total_record_rollup_controller.is_ready()
+    assert len(await rebuild_jobs()) == 1
+    summary = await total_record_controller_bs.summarize("alice", datetime(2024, 5, 1), None)
+    assert summary == {"count": 4, "expected_expenditure": 150, "income": 15}
+
+
+async def test_rebuild_and_apply_lock_state_row_first(records, count_queries):
+    with count_queries() as queries:
+        await total_record_rollup_controller.rebuild()
+    # 先写状态行，再读取原始记录
+    lock = next(i for i, query in enumerate(queries) if query.startswith('UPDATE "rollup_state"'))
+    read = next(i for i, query in enumerate(queries) if 'FROM "total_record"' in query)
+    assert lock < read, queries
+    with count_queries() as queries:
+        await total_record_controller.create(record(6, "erin", "fs5", 1))
+    rollup_queries = [query for query in queries if '"rollup_state"' in query or "total_record_daily_rollup" in query]
+    assert '"rollup_state"' in rollup_queries[0], rollup_queries
+
+
+async def test_check_runs_as_a_job(records):
+    await TotalRecordDailyRollup.filter(dimension=RollupDimension.BUSINESS, value="bob").update(count=99)
+    response = json.loads((await check_totals_rollup()).body)
+    job = await Job.get(id=response["data"]["job_id"])
+    assert job.name == "total_record_rollup_check" and job.status == JobStatus.PENDING
+    result = await check_total_record_rollup()
+    assert result["count"] == 1
+    assert result["mismatches"][0]["day"] == "2024-05-01" and result["mismatches"][0]["dimension"] == "business"
+    json.dumps(result)
+
+
+async def test_check_reuses_unfinished_job(records):
+    first = json.loads((await check_totals_rollup()).body)["data"]["job_id"]
+    assert json.loads((await check_totals_rollup()).body)["data"]["job_id"] == first
+    await Job.filter(id=first).update(status=JobStatus.RUNNING)
+    assert json.loads((await check_totals_rollup()).body)["data"]["job_id"] == first
+    # 上次校验完成后再提交，重新校验
+    await Job.filter(id=first).update(status=JobStatus.SUCCEEDED)
+    assert json.loads((await check_totals_rollup()).body)["data"]["job_id"] != first
+    assert await Job.filter(name="total_record_rollup_check").count() == 2
+
+
+async def test_fallback_summary_groups_in_sql(raw_records, monkeypatch, count_queries):
+    # 批大小小于记录数，逐批读取原始记录需要多次查询
+    monkeypatch.setattr(total_record_rollup_controller, "batch_size", 2)
+    assert not await total_record_rollup_controller.is_ready()
+    # 可用性检查结果缓存，只统计 summary 本身的查询
+    monkeypatch.setattr(total_record_rollup_controller, "coverage_ttl", 60)
+    for dimension in RollupDimension:
+        for by_day in (False, True):
+            with count_queries() as queries:
+                await total_record_rollup_controller.summary(dimension, date(2024, 5, 1), None, by_day=by_day)
+            assert len(queries) == 1, queries
+            if dimension != RollupDimension.ALL or by_day:
+                assert "GROUP BY" in queries[0], queries
+
+
+@pytest.mark.parametrize("ready", [True, False])
+async def test_duty_staff_stats_query_count(db, monkeypatch, count_queries, ready):
+    if ready:
+        await total_record_rollup_controller.rebuild()
+        for item in RECORDS:
+            await total_record_controller.create(item)
+    else:
+        await TotalRecord.bulk_create([TotalRecord(**item) for item in RECORDS])
+    for index in range(20):
+        await DutyStaff.create(name=f"fs{index}", type="外勤人员", actual_expenditure=index)
+    assert await total_record_rollup_controller.is_ready() == ready
+    monkeypatch.setattr(total_record_rollup_controller, "coverage_ttl", 60)
+    with count_queries() as queries:
+        total, data, summary = await duty_staff_controller.list_with_stats(1, 10)
+    assert len(queries) == 3, queries
+    assert total == 20 and summary["total_count"] == 5
+
+
+async def list_bs(**params) -> dict:
+    query = {"page": 1, "page_size": 50, "business": None, "date_from": None, "date_to": None, **params}
+    return json.loads((await list_totals_bs(**query)).body)
+
+
+@pytest.mark.parametrize("date_from", [datetime(2024, 5, 1), datetime(2024, 5, 1, 1)])
+async def test_list_bs_aggregates_in_one_query(records, count_queries, monkeypatch, date_from):
+    # dept_id=5 为业务员
+    for name in ("alice", "bob", "carol", "nobody"):
+        await User.create(username=name, password="x", dept_id=5)
+    await User.create(username="alice2", password="x", dept_id=1)
+    await total_record_rollup_controller.is_ready()
+    monkeypatch.setattr(total_record_rollup_controller, "coverage_ttl", 60)
+
+    counts = []
+    for extra in (0, 20):
+        for i in range(extra):
+            await User.create(username=f"extra{len(counts)}_{i}", password="x", dept_id=5)
+        with count_queries() as queries:
+            response = await list_bs(date_from=date_from)
+        counts.append(len(queries))
+    # 当前页用户一次，汇总一次，与业务员人数无关；不统计用户总数
+    assert counts == [2, 2]
+    by_business = {item["business"]: item for item in response["data"]}
+    assert "alice2" not in by_business
+    assert by_business["alice"] == {"business": "alice", "count": 2, "expected_expenditure": 40, "income": 4}
+    assert by_business["nobody"]["count"] == 0
+    assert (response["count_sum"], response["expected_expenditure_sum"], response["income_sum"]) == (4, 110, 11)
@@ -0,0 +1,187 @@
+from datetime import datetime
+
+import pytest
+
+from app.controllers.transaction import api_controller as transaction_controller
+from app.models.admin import Job, SearchIndexState, SearchNgram, TransactionRecord
+
+pytestmark = pytest.mark.anyio
+
+RECIPIENTS = ["张三丰", "张无忌", "李四", "王五", "Alice Zhang", "Bob"]
+
+
+@pytest.fixture
+def index(db, monkeypatch):
+    index = transaction_controller.search_index
+    # 每次都重新检查覆盖情况
+    monkeypatch.setattr(index, "coverage_ttl", 0)
+    monkeypatch.setattr(index, "batch_size", 4)
+    # 片段统计不跨用例缓存
+    monkeypatch.setattr(index, "gram_stats_ttl", 0)
+    # 用例只有几条记录，候选上限不随记录数降低
+    monkeypatch.setattr(index, "max_candidate_ratio", 1)
+    index.hits = index.fallbacks = 0
+    return index
+
+
+async def create(recipient: str) -> TransactionRecord:
+    return await transaction_controller.create(
+        {"payment_time": datetime(2024, 5, 1), "payment_amount": 1, "recipient": recipient}
+    )
+
+
+async def bulk_insert(recipients) -> None:
+    """绕过 CRUDBase 直接写入，不会更新搜索索引"""
+    await TransactionRecord.bulk_create(
+        [TransactionRecord(payment_time=datetime(2024, 5, 2), payment_amount=2, recipient=name) for name in recipients]
+    )
+
+
+async def search(term: str) -> list[int]:
+    q = await transaction_controller.contains_filter("recipient", term)
+    return sorted(await TransactionRecord.filter(q).values_list("id", flat=True))
+
+
+async def expected(term: str) -> list[int]:
+    return sorted(await TransactionRecord.filter(recipient__contains=term).values_list("id", flat=True))
+
+
+async def sync_jobs() -> int:
+    return await Job.filter(name="search_ngram_sync").count()
+
+
+async def test_empty_table_is_covered_after_first_sync(index):
+    assert not await index.is_ready()
+    assert await sync_jobs() == 1
+    assert await index.sync() == 0
+    state = await SearchIndexState.get(table_name="transaction_record")
+    assert (state.indexed_count, state.indexed_max_id) == (0, 0)
+    assert await index.is_ready()
+
+
+async def test_crud_writes_keep_index_covered(index):
+    await index.sync()
+    records = [await create(name) for name in RECIPIENTS]
+    assert await index.is_ready()
+    assert await search("张三") == await expected("张三") != []
+    assert await search("zhang") == await expected("zhang") != []
+    assert index.hits == 2 and index.fallbacks == 0
+
+    await transaction_controller.update(records[0].id, {"recipient": "赵六"})
+    await transaction_controller.remove(records[1].id)
+    assert await index.is_ready()
+    assert await search("张三") == await expected("张三") == []
+    assert await search("张无") == await expected("张无") == []
+    assert await search("赵六") == [records[0].id]
+
+
+async def test_bulk_insert_falls_back_and_backfills_new_ids_only(index):
+    await index.sync()
+    for name in RECIPIENTS:
+        await create(name)
+    indexed_rows = await SearchNgram.filter(table_name="transaction_record").count()
+    await bulk_insert(["张小凡", "陆雪琪", "碧瑶张"] * 3)
+
+    # 索引缺少新写入的记录，退回 LIKE，结果仍然完整
+    assert not await index.is_ready()
+    assert await search("张小") == await expected("张小") != []
+    assert index.fallbacks == 1 and await sync_jobs() == 1
+    # 原表不变时不重复提交
+    await index.is_ready()
+    assert await sync_jobs() == 1
+
+    # 已索引部分与状态一致，只补齐新ID
+    assert await index.sync() == 9
+    assert await SearchNgram.filter(table_name="transaction_record").count() > indexed_rows
+    assert await index.is_ready()
+    assert await search("张小") == await expected("张小")
+    assert await search("瑶张") == await expected("瑶张") != []
+    assert index.hits == 2
+
+
+async def test_gap_below_indexed_max_id_triggers_full_sweep(index):
+    await index.sync()
+    await bulk_insert(["张小凡"])
+    # CRUD 写入推进了 indexed_max_id，直接写入的记录在它之下
+    await create("张三丰")
+    assert not await index.is_ready()
+    assert await index.sync() == 1
+    assert await index.is_ready()
+    assert await search("张小") == await expected("张小")
+
+
+async def test_raw_delete_is_detected(index):
+    await index.sync()
+    records = [await create(name) for name in RECIPIENTS]
+    await TransactionRecord.filter(id=records[0].id).delete()
+    assert not await index.is_ready()
+    assert await index.sync() == 0
+    assert await index.is_ready()
+    assert await search("张无") == await expected("张无") != []
+
+
+async def test_rebuild_picks_up_direct_field_updates(index):
+    await index.sync()
+    record = await create("张三丰")
+    # 直接修改字段不改变记录数和最大ID，无法自动检测
+    await TransactionRecord.filter(id=record.id).update(recipient="李四")
+    assert await index.is_ready()
+    assert await search("李四") == []
+    assert await index.rebuild() == 1
+    assert await search("李四") == [record.id]
+
+
+async def test_candidates_use_gram_index(index, explain):
+    plan = await explain(index.candidates("recipient", index.grams("张三丰")))
+    assert "(table_name=? AND field=? AND gram=?)" in plan, plan
+
+
+async def test_broad_grams_are_skipped_before_aggregation(index, monkeypatch, count_queries):
+    monkeypatch.setattr(index, "max_candidates", 3)
+    monkeypatch.setattr(index, "gram_stats_ttl", 60)
+    candidates = []
+    index_candidates = index.candidates
+
+    def record_candidates(field, grams):
+        candidates.append(grams)
+        return index_candidates(field, grams)
+
+    monkeypatch.setattr(index, "candidates", record_candidates)
+    await index.sync()
+    for name in ("张三丰", "张三", "张三李", "张三王", "张三丰二"):
+        await create(name)
+
+    # "张三" 有 5 条记录，超过候选上限，只用 "三丰" 求交集
+    assert await search("张三丰") == await expected("张三丰") != []
+    assert candidates == [{"三丰"}] and index.hits == 1
+    # 全部片段区分度都太低，不聚合索引行，直接退回 LIKE；片段统计已缓存，不再查询索引表
+    with count_queries() as queries:
+        assert await search("张三") == await expected("张三")
+    assert len(candidates) == 1 and index.fallbacks == 1
+    assert not [query for query in queries if 'FROM "search_ngram"' in query], queries
+
+
+async def test_search_with_broad_grams_matches_contains(index, monkeypatch):
+    monkeypatch.setattr(index, "max_candidates", 3)
+    await index.sync()
+    for name in ("张三丰", "张三", "张三李", "张三王", "张三丰二", "三丰张"):
+        await create(name)
+    for term in ("张三丰", "三丰", "张三", "丰二", "三丰张"):
+        assert await search(term) == await expected(term), term
+
+
+async def test_candidate_limit_scales_with_table_size(index, monkeypatch):
+    monkeypatch.setattr(index, "max_candidate_ratio", 0.5)
+    await index.sync()
+    for name in ("张三丰", "张三", "李四", "王五"):
+        await create(name)
+    await index.is_ready()
+    assert index.candidate_limit == 2
+    # "张三" 有 2 条记录，未超过上限；"三丰" 只有 1 条
+    assert await search("张三丰") == await expected("张三丰")
+    assert index.hits == 1
+    await create("张三李")
+    await index.is_ready()
+    # 原表 5 条记录，上限仍为 2，"张三" 已有 3 条记录，区分度太低
+    assert await search("张三") == await expected("张三")
+    assert index.fallbacks == 1
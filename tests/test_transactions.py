@@ -0,0 +1,87 @@
+import pytest
+
+from app.controllers.dept import dept_controller
+from app.core.cache import reference_cache
+from app.core.transactions import atomic, on_commit
+from app.models.admin import Dept
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # 缓存是进程级的，每个用例使用新的数据库
+    reference_cache.invalidate(Dept)
+
+
+def generation() -> int:
+    return reference_cache._generations.get("Dept", 0)
+
+
+async def load_names() -> list[str]:
+    async def loader():
+        return [dept.name for dept in await Dept.filter(is_deleted=False).order_by("id")]
+
+    return await dept_controller.cached("names", loader)
+
+
+async def test_invalidate_outside_transaction_is_immediate(db):
+    before = generation()
+    await dept_controller.create({"name": "a"})
+    assert generation() == before + 1
+
+
+async def test_invalidate_waits_for_commit(db):
+    assert await load_names() == []
+    before = generation()
+
+    @atomic()
+    async def create():
+        await dept_controller.create({"name": "a"})
+        # 提交前缓存不失效，事务外的读取仍命中旧值，不会按新代数缓存未提交前的数据
+        assert generation() == before
+        await dept_controller.create({"name": "b"})
+
+    await create()
+    assert generation() == before + 2
+    assert await load_names() == ["a", "b"]
+
+
+async def test_rollback_discards_invalidation(db):
+    before = generation()
+
+    @atomic()
+    async def create():
+        await dept_controller.create({"name": "a"})
+        raise RuntimeError("rollback")
+
+    with pytest.raises(RuntimeError):
+        await create()
+    assert generation() == before
+    assert await Dept.all().count() == 0
+
+
+async def test_nested_atomic_runs_callbacks_after_outermost_commit(db):
+    calls = []
+
+    @atomic()
+    async def inner():
+        on_commit(lambda: calls.append("inner"))
+
+    @atomic()
+    async def outer():
+        await inner()
+        assert calls == []
+        on_commit(lambda: calls.append("outer"))
+
+    await outer()
+    assert calls == ["inner", "outer"]
+
+
+async def test_dept_delete_invalidates_after_commit(db):
+    dept = await dept_controller.create({"name": "a"})
+    assert await load_names() == ["a"]
+    before = generation()
+    await dept_controller.delete_dept(dept.id)
+    assert generation() == before + 1
+    assert await load_names() == []
@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.api import api_router
+from app.api.v1.users.users import list_user
+from app.models.admin import Api, Dept, Menu, Role, User
+from app.schemas.login import JWTPayload
+from app.utils.jwt import create_access_token
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def users(db):
+    depts = [await Dept.create(name=f"dept{i}") for i in range(3)]
+    roles = [await Role.create(name=f"role{i}") for i in range(3)]
+    for i in range(60):
+        # 最后几个用户的部门已被删除
+        dept_id = depts[i % 3].id if i < 55 else 999
+        user = await User.create(username=f"user{i}", password="x", dept_id=dept_id)
+        await user.roles.add(roles[i % 3], roles[(i + 1) % 3])
+
+
+async def list_page(page_size: int, **kwargs) -> dict:
+    params = {"page": 1, "with_total": True, "cursor": None, "username": None, "email": None, "dept_id": None}
+    response = await list_user(**{**params, "page_size": page_size, **kwargs})
+    return response.body
+
+
+@pytest.mark.parametrize("with_total, expected", [(True, 4), (False, 3)])
+async def test_user_list_query_count_is_constant(users, count_queries, with_total, expected):
+    counts = {}
+    for page_size in (5, 20, 50):
+        with count_queries() as queries:
+            await list_page(page_size, with_total=with_total)
+        counts[page_size] = len(queries)
+    # count（可选）、当前页、角色、部门各一次，与每页行数无关
+    assert set(counts.values()) == {expected}, counts
+
+
+async def test_user_list_related_data(users):
+    data = json.loads(await list_page(60))["data"]
+    by_name = {item["username"]: item for item in data}
+    assert "password" not in by_name["user0"]
+    assert by_name["user0"]["dept"]["name"] == "dept0"
+    assert sorted(role["name"] for role in by_name["user0"]["roles"]) == ["role0", "role1"]
+    assert by_name["user59"]["dept"] == {}
+
+
+@pytest.fixture
+async def client(db):
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def token(user: User) -> dict:
+    payload = JWTPayload(
+        user_id=user.id, username=user.username, is_superuser=user.is_superuser, exp=datetime.now() + timedelta(hours=1)
+    )
+    return {"token": create_access_token(data=payload)}
+
+
+async def test_base_endpoints_through_auth_dependency(client):
+    menu = await Menu.create(
+        name="系统管理", path="/system", order=1, parent_id=0, menu_type="catalog", component="Layout"
+    )
+    child = await Menu.create(
+        name="用户管理", path="user", order=1, parent_id=menu.id, menu_type="menu", component="/system/user"
+    )
+    api = await Api.create(path="/api/v1/user/list", method="GET", summary="查看用户列表", tags="用户模块")
+    role = await Role.create(name="viewer")
+    await role.menus.add(menu, child)
+    await role.apis.add(api)
+    user = await User.create(username="alice", password="x")
+    await user.roles.add(role)
+    headers = token(user)
+
+    response = await client.get("/api/v1/base/userinfo", headers=headers)
+    assert response.status_code == 200, response.text
+    info = response.json()["data"]
+    assert info["username"] == "alice" and "password" not in info
+
+    response = await client.get("/api/v1/base/usermenu", headers=headers)
+    assert response.status_code == 200, response.text
+    [catalog] = response.json()["data"]
+    assert catalog["name"] == "系统管理" and [item["name"] for item in catalog["children"]] == ["用户管理"]
+
+    response = await client.get("/api/v1/base/userapi", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["data"] == ["get/api/v1/user/list"]
+
+    response = await client.get("/api/v1/base/userinfo", headers={"token": "invalid"})
+    assert response.status_code == 401